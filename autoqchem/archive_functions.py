@@ -0,0 +1,295 @@
+import io
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class gaussian_archive(object):
+    """Writer of a compressed tar archive holding the input files of many jobs together with a manifest."""
+
+    def __init__(self, archive_path):
+        """Open the archive for writing. Files are streamed into the archive as they are added, \
+        nothing is kept in memory apart from the manifest.
+
+        :param archive_path: local path of the archive, e.g. 'campaign.tar.gz'
+        :type archive_path: str
+        """
+
+        self.archive_path = archive_path
+        self.manifest = []
+        self._tar = tarfile.open(archive_path, "w:gz")
+
+    def add_file(self, name, content) -> None:
+        """Add a single file to the archive.
+
+        :param name: name of the file in the archive
+        :type name: str
+        :param content: content of the file
+        :type content: str or bytes
+        """
+
+        if isinstance(content, str):
+            content = content.encode()
+
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        info.mtime = time.time()
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(content))
+
+    def add_job(self, base_name, files, **metadata) -> None:
+        """Add input files of a single job to the archive and record the job in the manifest.
+
+        :param base_name: base name of the job files
+        :type base_name: str
+        :param files: dictionary of file extension -> file content, e.g. {'gjf': ..., 'sh': ...}
+        :type files: dict
+        :param metadata: extra job information stored in the manifest, e.g. can, conformation
+        """
+
+        names = []
+        for ext, content in files.items():
+            name = f"{base_name}.{ext}"
+            self.add_file(name, content)
+            names.append(name)
+
+        self.manifest.append({'base_name': base_name, 'files': names, **metadata})
+
+    def close(self) -> None:
+        """Write the manifest and close the archive."""
+
+        if self._tar.closed:
+            return
+        self.add_file(get_manifest_name(self.archive_path), json.dumps(self.manifest, indent=1))
+        self._tar.close()
+        logger.info(f"Created archive {self.archive_path} with input files of {len(self.manifest)} jobs.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def get_manifest_name(archive_path) -> str:
+    """Name of the manifest file inside an archive, derived from the archive name so that manifests \
+    of several archives unpacked into the same directory do not overwrite each other.
+
+    :param archive_path: path of the archive
+    :return: str
+    """
+
+    return f"{os.path.basename(archive_path).split('.')[0]}.manifest.json"
+
+
+def read_archive_manifest(archive_path) -> list:
+    """Read the manifest of an archive.
+
+    :param archive_path: local path of the archive
+    :return: list of job records
+    """
+
+    with tarfile.open(archive_path, "r:gz") as tar:
+        return json.load(tar.extractfile(get_manifest_name(archive_path)))
+
+
+def extract_from_archive(archive_path, names, directory) -> None:
+    """Extract selected files from an archive into a local directory.
+
+    :param archive_path: local path of the archive
+    :param names: names of the files to extract
+    :param directory: target directory
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    names = set(names)
+    with tarfile.open(archive_path, "r:gz") as tar:
+        for member in tar:
+            if member.name in names:
+                tar.extract(member, directory)
+                names.remove(member.name)
+                if not names:
+                    break
+
+    if names:
+        raise FileNotFoundError(f"Files {sorted(names)} not found in archive {archive_path}.")
+
+
+def read_from_archive(archive_path, names) -> dict:
+    """Read the contents of selected text files of an archive without extracting them.
+
+    :param archive_path: local path of the archive
+    :param names: names of the files to read
+    :return: dict of file name -> file content
+    """
+
+    names = set(names)
+    contents = {}
+    with tarfile.open(archive_path, "r:gz") as tar:
+        for member in tar:
+            if member.name in names:
+                contents[member.name] = tar.extractfile(member).read().decode()
+                if len(contents) == len(names):
+                    break
+
+    missing = names - set(contents)
+    if missing:
+        raise FileNotFoundError(f"Files {sorted(missing)} not found in archive {archive_path}.")
+    return contents
+
+
+def read_job_files(jobs, ext) -> dict:
+    """Read input files of jobs with a given extension, from the local directory of the jobs or from their \
+    archive, each archive is read in one pass.
+
+    :param jobs: dictionary of jobs
+    :type jobs: dict
+    :param ext: file extension, e.g. 'gjf' or 'sh'
+    :type ext: str
+    :return: dict of job name -> file content
+    """
+
+    contents = {}
+    archives = {}
+    for name, job in jobs.items():
+        if job.archive is None:
+            with open(f"{job.directory}/{job.base_name}.{ext}") as f:
+                contents[name] = f.read()
+        else:
+            archives.setdefault(job.archive, []).append(name)
+
+    for archive_path, names in archives.items():
+        files = read_from_archive(archive_path, [f"{jobs[name].base_name}.{ext}" for name in names])
+        for name in names:
+            contents[name] = files[f"{jobs[name].base_name}.{ext}"]
+
+    return {name: contents[name] for name in jobs}
+
+
+def upload_archive(connection, archive_path, remote_dir) -> None:
+    """Ship an archive to the remote host in one transfer and unpack it there.
+
+    :param connection: fabric.Connection to the remote host
+    :param archive_path: local path of the archive
+    :param remote_dir: remote directory to unpack the archive into
+    """
+
+    remote_archive = f"{remote_dir}/{os.path.basename(archive_path)}"
+    connection.put(archive_path, remote_archive)
+    connection.run(f"tar -xzf {remote_archive} -C {remote_dir} && rm -f {remote_archive}", hide=True)
+    logger.info(f"Uploaded and unpacked archive {os.path.basename(archive_path)} in {remote_dir}.")
+
+
+def upload_files(connection, files, remote_dir) -> None:
+    """Ship local files to the remote host as one compressed archive, which is unpacked in the remote directory.
+
+    :param connection: fabric.Connection to the remote host
+    :param files: local paths of the files, they are unpacked under their base names
+    :type files: list
+    :param remote_dir: remote directory
+    :type remote_dir: str
+    """
+
+    if not files:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive_path = os.path.join(tmp_dir, f"upload_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.tar.gz")
+        with tarfile.open(archive_path, "w:gz") as tar:
+            for file in files:
+                tar.add(file, arcname=os.path.basename(file))
+        upload_archive(connection, archive_path, remote_dir)
+
+
+def upload_job_files(connection, jobs, remote_dir, exts=("sh", "gjf")) -> None:
+    """Ship input files of jobs to the remote host as one compressed archive. Files of jobs created in bulk \
+    are copied from their archive, only the members of the given jobs are shipped, so that neither the \
+    whole archive is sent again nor the files of its other jobs are overwritten on the remote host.
+
+    :param connection: fabric.Connection to the remote host
+    :param jobs: dictionary of jobs
+    :type jobs: dict
+    :param remote_dir: remote directory
+    :type remote_dir: str
+    :param exts: extensions of the input files
+    :type exts: tuple
+    """
+
+    if not jobs:
+        return
+
+    archives = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive_path = os.path.join(tmp_dir, f"upload_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.tar.gz")
+        with tarfile.open(archive_path, "w:gz") as tar:
+            for job in jobs.values():
+                if job.archive is None:
+                    for ext in exts:
+                        tar.add(f"{job.directory}/{job.base_name}.{ext}", arcname=f"{job.base_name}.{ext}")
+                else:
+                    archives.setdefault(job.archive, set()).update(f"{job.base_name}.{ext}" for ext in exts)
+
+            # copy the members of each archive in one pass
+            for source_path, names in archives.items():
+                with tarfile.open(source_path, "r:gz") as source:
+                    for member in source:
+                        if member.name in names:
+                            tar.addfile(member, source.extractfile(member))
+                            names.remove(member.name)
+                            if not names:
+                                break
+                if names:
+                    raise FileNotFoundError(f"Files {sorted(names)} not found in archive {source_path}.")
+
+        upload_archive(connection, archive_path, remote_dir)
+
+
+def download_files(connection, remote_dir, local_dirs) -> set:
+    """Fetch files from a remote directory in one transfer. The files are archived on the remote host, \
+    the archive is fetched and its files are extracted into their local directories. Files that do not \
+    exist on the remote host are skipped. Raises an exception if the archive cannot be created, \
+    e.g. when the remote quota is exceeded.
+
+    :param connection: fabric.Connection to the remote host
+    :param remote_dir: remote directory of the files
+    :type remote_dir: str
+    :param local_dirs: dictionary of file name -> local directory to extract the file into
+    :type local_dirs: dict
+    :return: set of names of the fetched files
+    """
+
+    if not local_dirs:
+        return set()
+
+    fetched = set()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        name = f"download_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}"
+
+        # the list of files is uploaded, it may be too long for a command line
+        with open(os.path.join(tmp_dir, f"{name}.txt"), "w") as f:
+            f.write("".join(f"{file_name}\n" for file_name in local_dirs))
+        connection.put(os.path.join(tmp_dir, f"{name}.txt"), f"{remote_dir}/{name}.txt")
+        # a partial archive, e.g. when the quota is exceeded, is removed right away
+        connection.run(f"cd {remote_dir} && tar -czf {name}.tar.gz --ignore-failed-read -T {name}.txt; "
+                       f"status=$?; rm -f {name}.txt; [ $status -eq 0 ] || rm -f {name}.tar.gz; exit $status",
+                       hide=True)
+        try:
+            connection.get(f"{remote_dir}/{name}.tar.gz", local=os.path.join(tmp_dir, f"{name}.tar.gz"))
+        finally:
+            connection.run(f"rm -f {remote_dir}/{name}.tar.gz", hide=True)
+
+        with tarfile.open(os.path.join(tmp_dir, f"{name}.tar.gz"), "r:gz") as tar:
+            for member in tar:
+                if member.name in local_dirs:
+                    os.makedirs(local_dirs[member.name], exist_ok=True)
+                    tar.extract(member, local_dirs[member.name])
+                    fetched.add(member.name)
+
+    logger.info(f"Downloaded {len(fetched)} / {len(local_dirs)} files from {remote_dir}.")
+    return fetched
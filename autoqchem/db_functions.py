@@ -1,19 +1,24 @@
+from __future__ import annotations
+
 import logging
-import pybel
 import re
 
-import numpy as np
-import pandas as pd
-import pymongo
 from bson.objectid import ObjectId
-from rdkit import Chem
-from rdkit.Chem import rdFMCS
 
-from autoqchem.helper_classes import config
-from autoqchem.helper_functions import add_numbers_to_repeated_items
+from autoqchem.helper_classes import config, lazy_module
+from autoqchem.helper_functions import add_numbers_to_repeated_items, pybel
+from autoqchem.smiles_cache import pybel_molecule_from_can
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+pymongo = lazy_module("pymongo")
+Chem = lazy_module("rdkit.Chem")
+rdFMCS = lazy_module("rdkit.Chem.rdFMCS")
 
 logger = logging.getLogger(__name__)
 
+_db_indexes_created = False
+
 desc_presets = ['global', 'min_max', 'substructure', 'core', 'labeled', 'transitions']
 desc_presets_long = ['Global', 'Min Max Atomic', 'Substructure Atomic', 'Common Core Atomic', 'Labeled Atomic',
                      "Excited State Transitions"]
@@ -48,22 +53,76 @@ def db_upload_molecule(can, tags, metadata, weights, conformations, logs) -> Obj
     """Upload single molecule to DB and all child objects tags, features
     and log files for its conformations"""
 
-    db = db_connect()
-    mols_coll = db['molecules']
-    tags_coll = db['tags']
+    return db_upload_molecules([{'can': can, 'tags': tags, 'metadata': metadata, 'weights': weights,
+                                 'conformations': conformations, 'logs': logs}])[0]
+
+
+def db_upload_molecules(molecules, chunk_size=500, max_chunk_bytes=64 * 1024 ** 2) -> list:
+    """Upload molecules to DB in bulk with all child objects tags, features and log files of their conformations. \
+    The molecule ids are assigned before the upload, the documents of all molecules are written with unordered \
+    insert_many in chunks. Log files given by their paths are read as their chunk is written, so that at most \
+    one chunk of log files is held in memory. The tags are written last, molecules are found by their tags once \
+    they are complete. If a write fails the documents of all the molecules are removed again.
+
+    :param molecules: list of dicts with the can, tags, metadata, weights, conformations and either the logs \
+    (contents) or the log_files (paths) of a molecule
+    :type molecules: list
+    :param chunk_size: maximum number of documents per insert_many
+    :type chunk_size: int
+    :param max_chunk_bytes: maximum size in bytes of the log files written with one insert_many
+    :type max_chunk_bytes: int
+    :return: list of molecule ids
+    """
 
-    # create molecule record and insert it
-    mol_data = {'can': can, 'metadata': metadata}
-    ret = mols_coll.insert_one(mol_data)
-    mol_id = ret.inserted_id
+    mol_ids = [ObjectId() for _ in molecules]
+    documents = {'qchem_descriptors': [], 'log_files': _log_documents(molecules, mol_ids), 'molecules': [],
+                 'tags': []}
+    for mol_id, molecule in zip(mol_ids, molecules):
+        can = molecule['can']
+        documents['molecules'].append({'_id': mol_id, 'can': can, 'metadata': molecule['metadata']})
+        documents['tags'].extend({'tag': tag, 'molecule_id': mol_id, 'can': can} for tag in molecule['tags'])
+        for weight, conformation in zip(molecule['weights'], molecule['conformations']):
+            documents['qchem_descriptors'].append({'molecule_id': mol_id, 'weight': weight, 'can': can,
+                                                   **conformation})
 
-    # insert tag record
-    for tag in tags:
-        tags_coll.insert_one({'tag': tag, 'molecule_id': mol_id, 'can': can})
+    db = db_connect()
+    try:
+        for collection, docs in documents.items():
+            chunk, chunk_bytes = [], 0
+            for doc in docs:
+                chunk.append(doc)
+                chunk_bytes += len(doc.get('log', ""))
+                if len(chunk) >= chunk_size or chunk_bytes >= max_chunk_bytes:
+                    db[collection].insert_many(chunk, ordered=False)
+                    chunk, chunk_bytes = [], 0
+            if chunk:
+                db[collection].insert_many(chunk, ordered=False)
+    except pymongo.errors.PyMongoError:
+        for collection in ['tags', 'qchem_descriptors', 'log_files']:
+            db[collection].delete_many({'molecule_id': {'$in': mol_ids}})
+        db['molecules'].delete_many({'_id': {'$in': mol_ids}})
+        raise
+    return mol_ids
+
+
+def _log_documents(molecules, mol_ids):
+    """Generate the log file documents of molecules, log files given by their paths are read one at a time.
+
+    :param molecules: list of dicts with the can and either the logs or the log_files of a molecule
+    :type molecules: list
+    :param mol_ids: ids of the molecules
+    :type mol_ids: list
+    :return: generator of dicts
+    """
 
-    for weight, conformation, log in zip(weights, conformations, logs):
-        db_upload_conformation(mol_id, can, weight, conformation, log, check_mol_exists=False)
-    return mol_id
+    for mol_id, molecule in zip(mol_ids, molecules):
+        for i in range(len(molecule['conformations'])):
+            if 'log_files' in molecule:
+                with open(molecule['log_files'][i]) as f:
+                    log = f.read()
+            else:
+                log = molecule['logs'][i]
+            yield {'molecule_id': mol_id, 'log': log, 'can': molecule['can']}
 
 
 def db_upload_conformation(mol_id, can, weight, conformation, log, check_mol_exists=True):
@@ -141,7 +200,7 @@ def db_select_molecules(cls=None, subcls=None, type=None, subtype=None, tags=[],
 
     if substructure:
         pattern = pybel.Smarts(substructure)
-        mols_df['pybel_mol'] = mols_df['can'].map(lambda can: pybel.readstring("smi", can))
+        mols_df['pybel_mol'] = mols_df['can'].map(pybel_molecule_from_can)
         mols_df = mols_df[mols_df['pybel_mol'].map(lambda mol: bool(pattern.findall(mol)))]
         mols_df = mols_df.drop('pybel_mol', axis=1)
 
@@ -179,19 +238,84 @@ def db_check_exists(can, gaussian_config, max_num_conformers) -> tuple:
     :return: exists(bool), list of tags that are associated with the molecule if it exists
     """
 
+    existing = db_check_existing([can], gaussian_config, [max_num_conformers])
+    if (can, max_num_conformers) in existing:
+        return True, existing[(can, max_num_conformers)][1]
+    return False, []
+
+
+def db_check_existing(cans, gaussian_config, max_num_conformers) -> dict:
+    """Check which molecules are already present in the database with the same Gaussian config \
+    (theory, basis_sets, etc.) and max number of conformers. All molecules are resolved with a single \
+    indexed query, their tags with a second one.
+
+    :param cans: list of canonical smiles
+    :type cans: list
+    :param gaussian_config: gaussian config dictionary
+    :type gaussian_config: dict
+    :param max_num_conformers: list of the max number of conformers of the molecules, in the order of cans
+    :type max_num_conformers: list
+    :return: dict of (can, max_num_conformers) -> (molecule id, list of tags) of the molecules that exist
+    """
+
+    if not cans:
+        return {}
+
     db = db_connect()
-    mols_coll = db['molecules']
-    tags_coll = db['tags']
-    mol_id = mols_coll.find_one({"can": can,
-                                 "metadata.gaussian_config": gaussian_config,
-                                 "metadata.max_num_conformers": max_num_conformers},
-                                {"molecule_id": 1})
+    _db_create_indexes(db)
+    wanted = set(zip(cans, max_num_conformers))
+    mols = db['molecules'].find({"can": {"$in": list(set(cans))},
+                                 "metadata.gaussian_config": gaussian_config},
+                                {"can": 1, "metadata.max_num_conformers": 1})
+
+    mol_ids = {}
+    for mol in mols:
+        key = (mol['can'], mol['metadata']['max_num_conformers'])
+        if key in wanted:
+            mol_ids.setdefault(key, mol['_id'])
+    if not mol_ids:
+        return {}
+
+    tags = {}
+    for tag in db['tags'].find({'molecule_id': {'$in': list(mol_ids.values())}}, {'tag': 1, 'molecule_id': 1}):
+        tags.setdefault(tag['molecule_id'], set()).add(tag['tag'])
+    return {key: (mol_id, sorted(tags.get(mol_id, []))) for key, mol_id in mol_ids.items()}
+
+
+def db_add_tags(existing, tags) -> int:
+    """Attach tags to molecules that are already present in the database, tags that a molecule \
+    already has are not duplicated.
+
+    :param existing: dict of (can, max_num_conformers) -> (molecule id, list of tags), \
+    as returned by :py:meth:`~db_functions.db_check_existing`
+    :type existing: dict
+    :param tags: metadata tag or tags
+    :type tags: str or list
+    :return: int, number of tags attached
+    """
+
+    if isinstance(tags, str):
+        tags = [tags]
+    documents = [{'tag': tag, 'molecule_id': mol_id, 'can': can}
+                 for (can, _), (mol_id, mol_tags) in existing.items() for tag in tags if tag not in mol_tags]
+    if documents:
+        db_connect('tags').insert_many(documents, ordered=False)
+    return len(documents)
+
+
+def _db_create_indexes(db) -> None:
+    """Create the indexes of the lookups of molecules by canonical smiles and of tags by molecule, once \
+    per process.
+
+    :param db: database
+    :type db: pymongo.database.Database
+    """
 
-    exists, tags = False, []
-    if mol_id is not None:
-        exists = True
-        tags = tags_coll.distinct('tag', {'molecule_id': ObjectId(mol_id['_id'])})
-    return exists, tags
+    global _db_indexes_created
+    if not _db_indexes_created:
+        db['molecules'].create_index([('can', pymongo.ASCENDING)])
+        db['tags'].create_index([('molecule_id', pymongo.ASCENDING)])
+        _db_indexes_created = True
 
 
 def descriptors(cls, subcls, type, subtype, tags, presets, conf_option, substructure="") -> dict:
@@ -258,7 +382,7 @@ def descriptors(cls, subcls, type, subtype, tags, presets, conf_option, substruc
     if 'substructure' in presets and substructure:
         sub = pybel.Smarts(substructure)
         # these matches are numbered from 1, so subtract one from them
-        matches = descs_df.index.map(lambda c: sub.findall(pybel.readstring("smi", c))[0])
+        matches = descs_df.index.map(lambda c: sub.findall(pybel_molecule_from_can(c))[0])
         matches = matches.map(lambda x: (np.array(x) - 1).tolist())
 
         # fetch atom labels for this smarts using the first molecule
@@ -1,10 +1,11 @@
 import logging
 
-import numpy as np
-import pandas as pd
-from scipy.spatial.distance import cdist
+from autoqchem.helper_classes import lazy_module
+from autoqchem.helper_functions import GetVdwRad
 
-from autoqchem.molecule import GetVdwRad
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+distance = lazy_module("scipy.spatial.distance")
 
 logger = logging.getLogger(__name__)
 
@@ -41,15 +42,15 @@ def occupied_volume(geometry_df, atom_idx, r, mesh_density=30) -> float:
     ticks = np.linspace(-r, r, mesh_density)
     x, y, z = np.meshgrid(ticks, ticks, ticks)
     mesh = np.vstack((x.ravel(), y.ravel(), z.ravel())).T
-    mesh = mesh[cdist(mesh, np.array([[0., 0., 0.]]), metric='sqeuclidean').ravel() < r ** 2]
+    mesh = mesh[distance.cdist(mesh, np.array([[0., 0., 0.]]), metric='sqeuclidean').ravel() < r ** 2]
     mesh = mesh + coords.iloc[atom_idx].values
 
     # filter atoms that are certainly not in the mesh, d > R + r
-    atom_distances = cdist(coords.iloc[[atom_idx]], coords)[0]
+    atom_distances = distance.cdist(coords.iloc[[atom_idx]], coords)[0]
     mesh_overlap_indices = (atom_distances - atom_r) < r
 
     # compute distance of every atom to every point in the mesh (this is the longest operation)
-    distances_sq = pd.DataFrame(cdist(coords[mesh_overlap_indices], mesh, metric='sqeuclidean'),
+    distances_sq = pd.DataFrame(distance.cdist(coords[mesh_overlap_indices], mesh, metric='sqeuclidean'),
                                 index=atom_r[mesh_overlap_indices].index)
     # mesh cells are occupied if their distances are less then Van der Waals radius
     # the below comparison requires matching indexes in the distances_sq matrix and atom_r series
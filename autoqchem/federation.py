@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import statistics
+import time
+
+import appdirs
+
+from autoqchem.queue_manager import *
+
+logger = logging.getLogger(__name__)
+
+
+class federation(object):
+    """Federation of the queue managers of several hosts that runs a campaign across clusters. New molecules \
+    are routed to the host with the shortest estimated queue wait, estimated from the live state of the jobs \
+    in the queue of each host and from its recent throughput. Molecules whose jobs have not started yet are \
+    migrated from a host that backs up to the host with the shortest wait. The jobs stay in the job store of \
+    their manager, the federation keeps the host of every job and the throughput of the hosts in a shared store."""
+
+    def __init__(self, managers, submit_kwargs=None):
+        """Initialize the federation.
+
+        :param managers: queue managers of the hosts, e.g. [slurm_manager(user, 'della...'), lsf_manager(...)]
+        :type managers: list
+        :param submit_kwargs: (optional) keyword arguments of submit_jobs for each host, e.g. {'della...': {'array': True}}
+        :type submit_kwargs: dict
+        """
+
+        self.managers = {manager.host: manager for manager in managers}
+        self.submit_kwargs = submit_kwargs or {}
+        self.throughput_window = config['federation'].get('throughput_window', 86400)
+        self.rebalance_factor = config['federation'].get('rebalance_factor', 2.)
+        self.rebalance_min_wait = config['federation'].get('rebalance_min_wait', 1.)
+
+        # routes of the jobs and finished jobs of the hosts, shared by all federations of the user
+        self.workdir = appdirs.user_data_dir(appauthor="autoqchem", appname="federation")
+        os.makedirs(self.workdir, exist_ok=True)
+        self.db_file = os.path.join(self.workdir, "federation.db")
+        self._connection = sqlite3.connect(self.db_file)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS routes (key TEXT PRIMARY KEY, can TEXT, host TEXT);
+            CREATE INDEX IF NOT EXISTS routes_can ON routes (can);
+            CREATE TABLE IF NOT EXISTS finished (host TEXT, time REAL, n_jobs INTEGER);
+        """)
+
+    def create_jobs_for_molecules(self, molecules, archive_name=None, **kwargs) -> None:
+        """Generate jobs for molecules, each molecule is routed to the host with the shortest estimated \
+        queue wait, taking into account the molecules routed before it.
+
+        :param molecules: list of molecule objects
+        :type molecules: list
+        :param archive_name: (optional) name of the archive of the jobs created in bulk on each host, \
+        see :py:meth:`~slurm_manager.slurm_manager.create_jobs_for_molecules`, if None the jobs of each \
+        molecule are created with plain input files
+        :type archive_name: str
+        :param kwargs: Gaussian configuration of the jobs, e.g. workflow_type, theory, light_basis_set, \
+        the wall time of the jobs is estimated on each host
+        """
+
+        stats = self.get_queue_stats()
+        molecules_by_host = {}
+        for molecule in molecules:
+            n_jobs = molecule.mol.NumConformers()
+            host = min(stats, key=lambda h: (stats[h]['backlog'] + n_jobs) / stats[h]['throughput'])
+            stats[host]['backlog'] += n_jobs
+            molecules_by_host.setdefault(host, []).append(molecule)
+
+        for host, host_molecules in molecules_by_host.items():
+            manager = self.managers[host]
+            logger.info(f"Routing {len(host_molecules)} molecules to {host}.")
+            if archive_name is not None:
+                manager.create_jobs_for_molecules(host_molecules, archive_name, **kwargs)
+            else:
+                for molecule in host_molecules:
+                    manager.create_jobs_for_molecule(molecule, **kwargs)
+            self._route(host, manager.get_jobs(can=[molecule.can for molecule in host_molecules]))
+
+    def create_jobs_for_molecule(self, molecule, **kwargs) -> None:
+        """Generate jobs for a molecule on the host with the shortest estimated queue wait.
+
+        :param molecule: molecule object
+        :type molecule: molecule
+        :param kwargs: Gaussian configuration of the jobs, see \
+        :py:meth:`~federation.federation.create_jobs_for_molecules`
+        """
+
+        self.create_jobs_for_molecules([molecule], **kwargs)
+
+    def submit_jobs(self) -> None:
+        """Submit the created jobs of all hosts."""
+
+        for host, manager in self.managers.items():
+            if manager.get_jobs(_status(manager).created):
+                manager.submit_jobs(**self.submit_kwargs.get(host, {}))
+
+    def retrieve_jobs(self) -> None:
+        """Retrieve the finished jobs of all hosts and record the throughput of the hosts."""
+
+        for host, manager in self.managers.items():
+            submitted = set(manager.get_jobs(_status(manager).submitted))
+            if not submitted:
+                continue
+            manager.retrieve_jobs()
+            n_finished = len(submitted - set(manager.get_jobs(_status(manager).submitted)))
+            if n_finished:
+                self._connection.execute("INSERT INTO finished (host, time, n_jobs) VALUES (?, ?, ?)",
+                                         (host, time.time(), n_finished))
+        self._connection.commit()
+
+    def resubmit_incomplete_jobs(self, restart=False) -> None:
+        """Resubmit the incomplete jobs of all hosts, on the host they ran on.
+
+        :param restart: if True jobs are restarted from the checkpoint files of their previous submission
+        :type restart: bool
+        """
+
+        for manager in self.managers.values():
+            if manager.get_jobs(_status(manager).incomplete):
+                manager.resubmit_incomplete_jobs(restart=restart)
+
+    def upload_done_molecules_to_db(self, tags, **kwargs) -> None:
+        """Upload the done molecules of all hosts to the database, molecules are not split across hosts.
+
+        :param tags: metadata tag or tags of the uploaded molecules
+        :type tags: str or list
+        :param kwargs: keyword arguments of upload_done_molecules_to_db, e.g. RMSD_threshold
+        """
+
+        for manager in self.managers.values():
+            if manager.get_jobs(_status(manager).done):
+                manager.upload_done_molecules_to_db(tags, **kwargs)
+
+    def get_job_stats(self) -> pd.DataFrame:
+        """Job stats of all hosts.
+
+        :return: pandas.core.frame.DataFrame
+        """
+
+        return pd.concat({host: manager.get_job_stats() for host, manager in self.managers.items()}) \
+            .fillna(0).astype(int)
+
+    def get_host(self, key) -> str:
+        """Host a job has been routed to.
+
+        :param key: key of the job
+        :type key: str
+        :return: str, None if the job has not been routed by the federation
+        """
+
+        row = self._connection.execute("SELECT host FROM routes WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_queue_stats(self) -> dict:
+        """Queue statistics of the hosts, from the live state of their submitted jobs and the jobs that \
+        finished within the throughput_window of config.yml. Without finished jobs the throughput is estimated \
+        from the running jobs and their median run time, or taken as one job per hour.
+
+        :return: dict of host -> dict with the number of created, pending and running jobs, the backlog \
+        (created and pending jobs), the throughput in jobs per hour and the estimated queue wait in hours
+        """
+
+        stats = {}
+        since = time.time() - self.throughput_window
+        for host, manager in self.managers.items():
+            status = _status(manager)
+            states = _live_states(manager, manager.get_jobs(status.submitted))
+            n_created = len(manager.get_jobs(status.created))
+            n_pending = sum(state == 'pending' for state in states.values())
+            n_running = sum(state == 'running' for state in states.values())
+
+            n_finished = self._connection.execute("SELECT SUM(n_jobs) FROM finished WHERE host = ? AND time > ?",
+                                                  (host, since)).fetchone()[0]
+            if n_finished:
+                throughput = n_finished / (self.throughput_window / 3600)
+            else:
+                elapsed = [job.elapsed for job in manager.get_jobs(status.done).values() if job.elapsed]
+                throughput = max(1, n_running) / (statistics.median(elapsed) / 3600) if elapsed else 1.
+
+            stats[host] = {'created': n_created, 'pending': n_pending, 'running': n_running,
+                           'backlog': n_created + n_pending, 'throughput': throughput,
+                           'wait': (n_created + n_pending) / throughput}
+        return stats
+
+    def rebalance(self) -> None:
+        """Migrate molecules whose jobs have not started from the host with the longest estimated queue wait \
+        to the host with the shortest, if the longest wait is rebalance_factor times the shortest and at least \
+        rebalance_min_wait hours (config.yml). Enough molecules are migrated to even out the waits, their pending \
+        jobs are cancelled and their input files are recreated with the resources of the target host."""
+
+        if len(self.managers) < 2:
+            return
+
+        try:
+            stats = self.get_queue_stats()
+        except SchedulerQueryException as e:
+            logger.warning(f"Skipping rebalancing, the state of the jobs is unknown: {e}")
+            return
+        source = max(stats, key=lambda h: stats[h]['wait'])
+        target = min(stats, key=lambda h: stats[h]['wait'])
+        if stats[source]['wait'] < max(self.rebalance_min_wait, self.rebalance_factor * stats[target]['wait']):
+            logger.info(f"Queue waits are balanced, longest wait {stats[source]['wait']:.1f}h on {source}.")
+            return
+
+        # number of jobs to move so that the waits of the two hosts are equal
+        s, t = stats[source], stats[target]
+        n_move = (s['backlog'] * t['throughput'] - t['backlog'] * s['throughput']) / \
+                 (s['throughput'] + t['throughput'])
+
+        # molecules whose jobs have all not started, the molecules furthest from completion move first
+        manager = self.managers[source]
+        status = _status(manager)
+        try:
+            states = _live_states(manager, manager.get_jobs(status.submitted))
+        except SchedulerQueryException as e:
+            logger.warning(f"Skipping rebalancing, the state of the jobs is unknown: {e}")
+            return
+
+        def not_started(job):
+            return job.pack is None and (job.status.value == status.created.value or
+                                         (job.status.value == status.submitted.value and
+                                          states.get(str(job.job_id)) == 'pending'))
+
+        cans = set(job.can for job in manager.get_jobs(status.created).values()) | \
+            set(job.can for job in manager.get_jobs(status.submitted).values() if not_started(job))
+        jobs_by_can = {}
+        for key, job in manager.get_jobs(can=list(cans)).items():
+            jobs_by_can.setdefault(job.can, {})[key] = job
+        movable = {can: jobs for can, jobs in jobs_by_can.items() if all(map(not_started, jobs.values()))}
+
+        n_moved = 0
+        for can in sorted(movable, key=lambda c: -len(movable[c])):
+            if n_moved >= n_move:
+                break
+            self._migrate(movable[can], source, target)
+            n_moved += len(movable[can])
+        logger.info(f"Migrated {n_moved} jobs from {source} (wait {s['wait']:.1f}h) "
+                    f"to {target} (wait {t['wait']:.1f}h).")
+
+    def _migrate(self, jobs, source, target) -> None:
+        """Move the jobs of a molecule from a host to another, the jobs are created again on the target host \
+        with the resources and wall time of the target host.
+
+        :param jobs: dictionary of jobs of the molecule
+        :type jobs: dict
+        :param source: host the jobs are moved from
+        :type source: str
+        :param target: host the jobs are moved to
+        :type target: str
+        """
+
+        source_manager, target_manager = self.managers[source], self.managers[target]
+        _cancel_jobs(source_manager, [job for job in jobs.values()
+                                      if job.status.value == _status(source_manager).submitted.value])
+
+        queue = _queue_system(target_manager)
+        max_processors = config[queue]['max_processors']
+        max_ram = config[queue].get('max_ram', max_processors * config[queue]['ram_per_processor'])
+        model = target_manager._get_resource_model() or resource_model(queue)
+        job_class = lsf_job if queue == 'lsf' else slurm_job
+
+        for key, job in jobs.items():
+            if job.archive is not None:
+                extract_from_archive(job.archive, [f"{job.base_name}.gjf"], job.directory)
+            with open(f"{job.directory}/{job.base_name}.gjf") as f:
+                gaussian_input = f.read()
+
+            # resources within the limits of the target host
+            n_processors, ram = get_gaussian_resources(gaussian_input)
+            n_processors = min(n_processors, max_processors)
+            gaussian_input = set_gaussian_resources(gaussian_input, n_processors, min(ram, max_ram))
+            if job.n_basis and model.estimates_wall_time(job.workflow_type):
+                wall_time = format_wall_time(model.estimate_wall_time(job.n_basis, n_processors, job.workflow_type),
+                                             queue)
+            else:
+                wall_time = config[queue]['wall_time']
+
+            directory = os.path.join(target_manager.workdir, os.path.basename(job.directory))
+            os.makedirs(directory, exist_ok=True)
+            with open(f"{directory}/{job.base_name}.gjf", "w") as f:
+                f.write(gaussian_input)
+            with open(f"{directory}/{job.base_name}.sh", "w") as f:
+                if queue == 'lsf':
+                    f.write(target_manager._create_lsf_script(job.base_name, gaussian_input, wall_time))
+                else:
+                    f.write(target_manager._create_slurm_script(job.base_name, gaussian_input, wall_time))
+            convert_crlf_to_lf(f"{directory}/{job.base_name}.sh")
+
+            values = {name: getattr(job, name) for name in job_class.__dataclass_fields__}
+            values.update({'job_id': -1, 'directory': directory, 'status': _status(target_manager).created,
+                           'n_processors': min(n_processors, max_processors), 'archive': None, 'pack': None,
+                           'scheduler_state': None, 'exit_code': None, 'elapsed': None})
+            target_manager.jobs[key] = job_class(**values)
+
+        source_manager.remove_jobs(jobs)
+        target_manager._cache()
+        self._route(target, jobs)
+
+    def _route(self, host, jobs) -> None:
+        """Record the host of jobs.
+
+        :param host: host of the jobs
+        :type host: str
+        :param jobs: dictionary of jobs
+        :type jobs: dict
+        """
+
+        self._connection.executemany("INSERT OR REPLACE INTO routes (key, can, host) VALUES (?, ?, ?)",
+                                     [(key, job.can, host) for key, job in jobs.items()])
+        self._connection.commit()
+
+
+def _queue_system(manager) -> str:
+    """Name of the config.yml section of the queue system of a manager, local jobs use the slurm resources."""
+
+    return 'lsf' if isinstance(manager, lsf_manager) else 'slurm'
+
+
+def _status(manager):
+    """Status enumerator of the jobs of a manager."""
+
+    return lsf_status if isinstance(manager, lsf_manager) else slurm_status
+
+
+def _live_states(manager, jobs) -> dict:
+    """Live state of submitted jobs, queried from the scheduler of the host.
+
+    :param manager: queue manager
+    :param jobs: dictionary of submitted jobs
+    :type jobs: dict
+    :return: dict of job id -> 'pending' or 'running', jobs that have finished are missing
+    """
+
+    if not jobs:
+        return {}
+
+    if isinstance(manager, local_manager):
+        with manager._lock:
+            return {**{base_name: 'pending' for base_name in manager._queue},
+                    **{base_name: 'running' for base_name in manager._running}}
+
+    manager.connect()
+    queue = _queue_system(manager)
+    query, pending = (query_lsf_jobs, 'PEND') if queue == 'lsf' else (query_slurm_jobs, 'PENDING')
+    states = query(manager.connection, [job.job_id for job in jobs.values()],
+                   chunk_size=config[queue].get('status_chunk_size', 500))
+    return {job_id: 'pending' if state['state'] == pending else 'running'
+            for job_id, state in states.items() if state['outcome'] == 'running'}
+
+
+def _cancel_jobs(manager, jobs) -> None:
+    """Cancel pending jobs on the host of a manager, the jobs of a local manager are removed from its queue \
+    when they are removed from the manager.
+
+    :param manager: queue manager
+    :param jobs: list of pending jobs
+    :type jobs: list
+    """
+
+    if not jobs or isinstance(manager, local_manager):
+        return
+
+    manager.connect()
+    command = "bkill" if _queue_system(manager) == 'lsf' else "scancel"
+    run_batched(manager.connection, [f"{command} {' '.join(str(job.job_id) for job in jobs)}"], hide=True)
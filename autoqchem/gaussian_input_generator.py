@@ -1,5 +1,8 @@
+import re
+
 from autoqchem.helper_classes import *
 from autoqchem.helper_functions import *
+from autoqchem.resource_functions import *
 
 logger = logging.getLogger(__name__)
 
@@ -8,7 +11,7 @@ class gaussian_input_generator(object):
     """Generator of gaussian input files class"""
 
     def __init__(self, molecule, workflow_type, directory, theory, light_basis_set,
-                 heavy_basis_set, generic_basis_set, max_light_atomic_number):
+                 heavy_basis_set, generic_basis_set, max_light_atomic_number, resource_model=None):
         """Initialize input generator for a given molecule.
 
         :param molecule: molecule object
@@ -17,10 +20,21 @@ class gaussian_input_generator(object):
         :type workflow_type: str
         :param directory: local directory to store input files
         :type directory: str
+        :param resource_model: (optional) calibrated resource model, if None the 'resource_model' option \
+        of the queue system in config.yml decides how resources are assigned
+        :type resource_model: resource_model
         """
 
         self.directory = directory
         self.molecule = molecule
+        self.workflow_type = workflow_type
+        self.resource_model = resource_model
+        self.resources = None
+
+        # estimate the size of the calculation
+        atomic_numbers = [atom.GetAtomicNum() for atom in pybel.ob.OBMolAtomIter(self.molecule.mol)]
+        self.n_basis = estimate_basis_functions(atomic_numbers, light_basis_set, heavy_basis_set,
+                                                max_light_atomic_number)
         # group elements into light and heavy
         light_elements, heavy_elements = self.molecule.get_light_and_heavy_elements(max_light_atomic_number)
         self.heavy_block = ""
@@ -66,11 +80,25 @@ class gaussian_input_generator(object):
         cleanup_directory_files(self.directory, types=["gjf"])
         os.makedirs(self.directory, exist_ok=True)
 
+        for fs_conf_name, output in self.generate_gaussian_inputs(queue_system):
+            file_path = f"{self.directory}/{fs_conf_name}.gjf"
+            with open(file_path, "w") as file:
+                file.write(output)
+
+            logger.debug(f"Generated a Gaussian input file in {file_path}")
+
+    def generate_gaussian_inputs(self, queue_system):
+        """
+        Generate the contents of the gaussian input files for each conformer of the molecule without writing \
+        them to disk, e.g. for streaming them into an archive.
+
+        :type queue_system: str
+        :return: generator of (filesystem conformation name, gaussian input string) tuples
+        """
+
         # resources configuration
-        n_processors = max(1, min(config[queue_system]['max_processors'],
-                                  self.molecule.mol.NumAtoms() // config[queue_system]['atoms_per_processor']))
-        ram = n_processors * config[queue_system]['ram_per_processor']
-        resource_block = f"%nprocshared={n_processors}\n%Mem={ram}GB\n"
+        self.resources = self.get_resources(queue_system)
+        resource_block = f"%nprocshared={self.resources['n_processors']}\n%Mem={self.resources['ram']}GB\n"
 
         logger.info(f"Generating Gaussian input files for {self.molecule.mol.NumConformers()} conformations.")
 
@@ -89,18 +117,47 @@ class gaussian_input_generator(object):
             geom_np_array = geom_df[['Atom', 'X', 'Y', 'Z']].astype(str).values
             coords_block = "\n".join(map(" ".join, geom_np_array))
 
-            # create the gaussian input file
-            self._generate_file(self.tasks,
-                                conf_name,
-                                fs_conf_name,
-                                resource_block,
-                                coords_block,
-                                self.molecule.mol.GetTotalCharge(),
-                                self.molecule.mol.GetTotalSpinMultiplicity())
-
-    def _generate_file(self, tasks, name, fs_name, resource_block, coords_block, charge, multiplicity) -> None:
+            # create the gaussian input
+            yield fs_conf_name, self._generate_input(self.tasks,
+                                                     conf_name,
+                                                     fs_conf_name,
+                                                     resource_block,
+                                                     coords_block,
+                                                     self.molecule.mol.GetTotalCharge(),
+                                                     self.molecule.mol.GetTotalSpinMultiplicity())
+
+    def get_resources(self, queue_system) -> dict:
+        """Assign resources to the jobs of this molecule. With the 'basis_functions' resource model or a calibrated \
+        resource model processors, memory and wall time are estimated from the number of basis functions and the \
+        workflow type, with the 'atoms' resource model processors are assigned based on the number of atoms and \
+        the wall time is only estimated if the workflow type has been fitted to job runtimes.
+
+        :param queue_system: 'slurm' or 'lsf'
+        :type queue_system: str
+        :return: dict with n_processors, ram (in GB) and wall_time (in hours, None if not estimated)
         """
 
+        model = self.resource_model or resource_model(queue_system)
+
+        if model.use_basis_functions:
+            resources = model.estimate(self.n_basis, self.workflow_type)
+            logger.info(f"Estimated {self.n_basis} basis functions, assigning {resources['n_processors']} "
+                        f"processors, {resources['ram']}GB memory and {resources['wall_time']:.1f}h wall time.")
+            return resources
+
+        n_processors = max(1, min(config[queue_system]['max_processors'],
+                                  self.molecule.mol.NumAtoms() // config[queue_system]['atoms_per_processor']))
+        ram = n_processors * config[queue_system]['ram_per_processor']
+        wall_time = None
+        if model.estimates_wall_time(self.workflow_type):
+            wall_time = model.estimate_wall_time(self.n_basis, n_processors, self.workflow_type)
+            logger.info(f"Predicted {wall_time:.1f}h wall time of {self.workflow_type} jobs with {self.n_basis} "
+                        f"basis functions from job runtimes.")
+        return {'n_processors': n_processors, 'ram': ram, 'wall_time': wall_time}
+
+    def _generate_input(self, tasks, name, fs_name, resource_block, coords_block, charge, multiplicity) -> str:
+        """Generate the contents of a single gaussian input file.
+
         :param tasks: tuple of Gaussian tasks
         :param name:  conformation name
         :param fs_name: filesystem conformation name
@@ -110,6 +167,7 @@ class gaussian_input_generator(object):
         :param heavy_elements: list of heavy elements of the molecule
         :param charge: molecule charge
         :param multiplicity: molecule multiplicity
+        :return: gaussian input string
         """
 
         output = ""
@@ -137,8 +195,55 @@ class gaussian_input_generator(object):
 
         output += f"\n\n"
 
-        file_path = f"{self.directory}/{fs_name}.gjf"
-        with open(file_path, "w") as file:
-            file.write(output)
-
-        logger.debug(f"Generated a Gaussian input file in {file_path}")
+        return output
+
+
+def create_restart_input(gaussian_input, n_completed_tasks):
+    """Create the input of a job restarted from the checkpoint files of its previous submission. The tasks \
+    that completed are skipped, an interrupted geometry optimization is continued with opt=Restart and the \
+    first remaining task reads the geometry and wavefunction from the checkpoint of the task before it \
+    (Geom=AllCheck Guess=Read).
+
+    :param gaussian_input: contents of the Gaussian input file of the previous submission
+    :type gaussian_input: str
+    :param n_completed_tasks: number of tasks of the input that completed
+    :type n_completed_tasks: int
+    :return: tuple of the restart input and the name of the checkpoint file it needs, None if the input \
+    cannot be restarted from a checkpoint
+    """
+
+    sections = gaussian_input.split("\n--Link1--\n")
+    if not 0 <= n_completed_tasks < len(sections):
+        return None
+
+    section = sections[n_completed_tasks]
+    route = re.search("^#\s*(.*)$", section, re.MULTILINE)
+    if route is None:
+        return None
+    route = route.group(1)
+
+    old_chk = re.search("^%Oldchk=(\S+)", section, re.MULTILINE | re.IGNORECASE)
+    if old_chk is None:
+        # first task of the workflow, only an optimization can be continued from its own checkpoint
+        chk = re.search("^%Chk=(\S+)", section, re.MULTILINE | re.IGNORECASE)
+        opt = re.search("\\bopt(?:=\(([^)]*)\)|=(\w+))?", route, re.IGNORECASE)
+        if chk is None or opt is None:
+            return None
+        options = [o for o in (opt.group(1) or opt.group(2) or "").split(",") if o]
+        if 'restart' not in map(str.lower, options):
+            options.append("Restart")
+        # the route of a restarted optimization holds the opt keyword only, the rest is read from the checkpoint
+        link0 = "".join(line + "\n" for line in section[:section.index("#")].splitlines() if line.startswith("%"))
+        section = f"{link0}# opt=({','.join(options)})\n\n"
+        checkpoint = chk.group(1)
+    else:
+        for keyword in ["Geom=AllCheck", "Guess=Read"]:
+            if keyword.lower() not in route.lower():
+                section = section.replace(route, f"{route} {keyword}", 1)
+                route = f"{route} {keyword}"
+        checkpoint = old_chk.group(1)
+
+    restart_input = "\n--Link1--\n".join([section] + sections[n_completed_tasks + 1:])
+    if not restart_input.endswith("\n\n"):
+        restart_input += "\n\n"
+    return restart_input, checkpoint
@@ -68,6 +68,31 @@ class gaussian_log_extractor(object):
         except TypeError:  # no frequencies
             raise OptimizationIncompleteException()
 
+    def get_run_statistics(self) -> dict:
+        """Extract the size of the calculation and the time it took: number of atoms, number of basis functions, \
+        number of processors, total cpu time and total elapsed (wall) time of all tasks in seconds. Values that \
+        are not present in the log file are None, e.g. Gaussian 09 does not report elapsed time.
+
+        :return: dict
+        """
+
+        def total_seconds(prefix):
+            times = re.findall(f"{prefix}\s*(\d+) days\s*(\d+) hours\s*(\d+) minutes\s*({float_or_int_regex})",
+                               self.log)
+            if not times:
+                return None
+            return sum(86400 * int(d) + 3600 * int(h) + 60 * int(m) + float(s) for d, h, m, s in times)
+
+        def last_int(pattern):
+            values = re.findall(pattern, self.log)
+            return int(values[-1]) if values else None
+
+        return {'n_atoms': last_int("NAtoms=\s*(\d+)"),
+                'n_basis': last_int("NBasis=\s*(\d+)"),
+                'n_processors': last_int("(?i)%nprocshared=(\d+)"),
+                'cpu_time': total_seconds("Job cpu time:"),
+                'elapsed_time': total_seconds("Elapsed time:")}
+
     def get_descriptors(self) -> dict:
         """Extract and retrieve all descriptors as a dictionary.
 
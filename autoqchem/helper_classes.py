@@ -1,15 +1,128 @@
 import enum
+import importlib
 import os
+import time
+import types
+import weakref
+from collections.abc import Mapping
 from dataclasses import dataclass
 
 import yaml
 
-config = yaml.safe_load(open(os.path.join(os.path.dirname(__file__), "..", "config.yml")))
+
+class lazy_config(Mapping):
+    """Read-only configuration dictionary, the yaml file is parsed on first access."""
+
+    def __init__(self, config_file):
+        """Initialize the configuration without reading the file.
+
+        :param config_file: path of the yaml configuration file
+        :type config_file: str
+        """
+
+        self.config_file = config_file
+        self._data = None
+
+    def _load(self) -> dict:
+        """Parse the configuration file, if not done already.
+
+        :return: dict
+        """
+
+        if self._data is None:
+            with open(self.config_file) as f:
+                self._data = yaml.safe_load(f)
+        return self._data
+
+    def reload(self) -> None:
+        """Drop the parsed configuration, the file is parsed again on next access."""
+
+        self._data = None
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+class lazy_module(types.ModuleType):
+    """Placeholder for a module that is imported on first attribute access. Used for heavy dependencies \
+    (pandas, openbabel, rdkit, pymongo, fabric, ...) so that importing autoqchem stays fast."""
+
+    def __init__(self, name, fallback=None):
+        """Initialize the placeholder without importing the module.
+
+        :param name: name of the module to import, e.g. 'pandas' or 'openbabel.pybel'
+        :type name: str
+        :param fallback: (optional) name of the module to import if the first one is not available
+        :type fallback: str
+        """
+
+        super().__init__(name)
+        self.__dict__['_lazy_names'] = (name, fallback)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        """Import the actual module and copy its namespace into the placeholder.
+
+        :return: module
+        """
+
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            name, fallback = self.__dict__['_lazy_names']
+            try:
+                module = importlib.import_module(name)
+            except ImportError:
+                if fallback is None:
+                    raise
+                module = importlib.import_module(fallback)
+            self.__dict__.update(module.__dict__)
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+        self.__dict__[attr] = value
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+config = lazy_config(os.path.join(os.path.dirname(__file__), "..", "config.yml"))
 k_in_kcal_per_mol_K = 0.0019872041
 Hartree_in_kcal_per_mol = 627.5
 T = 298
 
 
+# objects notified of attribute changes of jobs, they implement job_changed(job, name, old_value, new_value)
+job_observers = weakref.WeakSet()
+
+
+class observable_job(object):
+    """Base class of the job dataclasses, attribute changes are reported to the job observers. \
+    The time of each status change of a job is recorded in its timings."""
+
+    def __post_init__(self):
+        if self.timings is None:
+            self.timings = {self.status.name: time.time()}
+
+    def __setattr__(self, name, value):
+        old_value = self.__dict__.get(name)
+        object.__setattr__(self, name, value)
+        for observer in list(job_observers):
+            observer.job_changed(self, name, old_value, value)
+        if name == 'status' and old_value is not None and value != old_value:
+            self.timings = {**(self.timings or {}), value.name: time.time()}
+
+
 @enum.unique
 class slurm_status(enum.IntEnum):
     """Slurm job status enumerator."""
@@ -23,7 +136,7 @@ class slurm_status(enum.IntEnum):
 
 
 @dataclass
-class slurm_job:
+class slurm_job(observable_job):
     """Dataclass for slurm job.
 
     :param can: canonical smiles
@@ -48,6 +161,32 @@ class slurm_job:
     :type n_submission: int
     :param n_success_tasks: number of successfully completed tasks
     :type n_success_tasks: int
+    :param archive: local archive holding the job input files, None if they are stored as plain files
+    :type archive: str
+    :param pack: name of the node pack the job was submitted in, None if it was submitted on its own
+    :type pack: str
+    :param scheduler_state: state reported by the scheduler when the job left the queue, e.g. 'TIMEOUT'
+    :type scheduler_state: str
+    :param exit_code: exit code of the job script reported by the scheduler
+    :type exit_code: int
+    :param elapsed: run time of the job in seconds reported by the scheduler, or by the log file
+    :type elapsed: float
+    :param n_processors: number of processors of the job
+    :type n_processors: int
+    :param n_atoms: number of atoms of the molecule
+    :type n_atoms: int
+    :param n_basis: estimated number of basis functions of the molecule
+    :type n_basis: int
+    :param workflow_type: Gaussian workflow type, e.g. 'equilibrium'
+    :type workflow_type: str
+    :param failure_reason: why the job did not complete, e.g. 'timeout', 'scf_convergence'
+    :type failure_reason: str
+    :param resubmissions: decisions taken when the job was resubmitted
+    :type resubmissions: list
+    :param timings: time of the latest change to each status (by status name), and durations in seconds \
+    of the transfer of the log file (transfer_time), the extraction of the descriptors (extraction_time) and \
+    the upload to the database (upload_time)
+    :type timings: dict
     """
 
     # molecule and gaussian config
@@ -64,6 +203,18 @@ class slurm_job:
     status: slurm_status
     n_submissions: int
     n_success_tasks: int
+    archive: str = None
+    pack: str = None
+    scheduler_state: str = None
+    exit_code: int = None
+    elapsed: float = None
+    n_processors: int = None
+    n_atoms: int = None
+    n_basis: int = None
+    workflow_type: str = None
+    failure_reason: str = None
+    resubmissions: list = None
+    timings: dict = None
 
 
 @enum.unique
@@ -79,7 +230,7 @@ class lsf_status(enum.IntEnum):
 
 
 @dataclass
-class lsf_job:
+class lsf_job(observable_job):
     """Dataclass for lsf job.
 
     :param can: canonical smiles
@@ -104,6 +255,32 @@ class lsf_job:
     :type n_submission: int
     :param n_success_tasks: number of successfully completed tasks
     :type n_success_tasks: int
+    :param archive: local archive holding the job input files, None if they are stored as plain files
+    :type archive: str
+    :param pack: name of the node pack the job was submitted in, None if it was submitted on its own
+    :type pack: str
+    :param scheduler_state: state reported by the scheduler when the job left the queue, e.g. 'TIMEOUT'
+    :type scheduler_state: str
+    :param exit_code: exit code of the job script reported by the scheduler
+    :type exit_code: int
+    :param elapsed: run time of the job in seconds reported by the scheduler, or by the log file
+    :type elapsed: float
+    :param n_processors: number of processors of the job
+    :type n_processors: int
+    :param n_atoms: number of atoms of the molecule
+    :type n_atoms: int
+    :param n_basis: estimated number of basis functions of the molecule
+    :type n_basis: int
+    :param workflow_type: Gaussian workflow type, e.g. 'equilibrium'
+    :type workflow_type: str
+    :param failure_reason: why the job did not complete, e.g. 'timeout', 'scf_convergence'
+    :type failure_reason: str
+    :param resubmissions: decisions taken when the job was resubmitted
+    :type resubmissions: list
+    :param timings: time of the latest change to each status (by status name), and durations in seconds \
+    of the transfer of the log file (transfer_time), the extraction of the descriptors (extraction_time) and \
+    the upload to the database (upload_time)
+    :type timings: dict
     """
 
     # molecule and gaussian config
@@ -119,4 +296,16 @@ class lsf_job:
     base_name: str
     status: lsf_status
     n_submissions: int
-    n_success_tasks: int
\ No newline at end of file
+    n_success_tasks: int
+    archive: str = None
+    pack: str = None
+    scheduler_state: str = None
+    exit_code: int = None
+    elapsed: float = None
+    n_processors: int = None
+    n_atoms: int = None
+    n_basis: int = None
+    workflow_type: str = None
+    failure_reason: str = None
+    resubmissions: list = None
+    timings: dict = None
@@ -1,15 +1,59 @@
+from __future__ import annotations
+
 import getpass
 import glob
 import logging
 import os
+import threading
+import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+from autoqchem.helper_classes import lazy_module
 
-import fabric
-import paramiko
+# heavy dependencies are imported on first use
+fabric = lazy_module("fabric")
+paramiko = lazy_module("paramiko")
+pybel = lazy_module("openbabel.pybel", fallback="pybel")  # openbabel 3.0.0, or openbabel 2.4
 
 logger = logging.getLogger(__name__)
 
 
+def GetSymbol(atomic_number) -> str:
+    """Get element symbol for an atomic number, works with openbabel 3.0.0 and openbabel 2.4.
+
+    :param atomic_number: atomic number
+    :return: str
+    """
+
+    if hasattr(pybel.ob, 'GetSymbol'):
+        return pybel.ob.GetSymbol(atomic_number)
+    return _element_table().GetSymbol(atomic_number)
+
+
+def GetVdwRad(atomic_number) -> float:
+    """Get Van der Waals radius for an atomic number, works with openbabel 3.0.0 and openbabel 2.4.
+
+    :param atomic_number: atomic number
+    :return: float
+    """
+
+    if hasattr(pybel.ob, 'GetVdwRad'):
+        return pybel.ob.GetVdwRad(atomic_number)
+    return _element_table().GetVdwRad(atomic_number)
+
+
+@lru_cache(maxsize=None)
+def _element_table():
+    """Element table of openbabel 2.4, created once.
+
+    :return: openbabel.OBElementTable
+    """
+
+    return pybel.ob.OBElementTable()
+
+
 def ssh_connect(host, user, keyfile=None) -> fabric.Connection:
     """Create ssh connection using fabric and paramiko, supports DUO and SSH key authentication.
 
@@ -50,6 +94,136 @@ def ssh_connect(host, user, keyfile=None) -> fabric.Connection:
     return c
 
 
+_connections = {}  # (host, user) -> fabric.Connection shared by all managers of the process
+_connections_lock = threading.Lock()
+
+
+def get_connection(host, user, keyfile=None, keepalive=60) -> fabric.Connection:
+    """Get the pooled ssh connection to a host, the connection is created with \
+    :py:meth:`~helper_functions.ssh_connect` on first use and recreated transparently when its transport has \
+    dropped. The authenticated transport is shared by all managers of the process, so that DUO authentication \
+    is needed only once per host.
+
+    :param host: remote host
+    :param user: username to authenticate on remote host
+    :param keyfile: (optional) file containing the ssh key for the connection
+    :param keepalive: interval of keepalive packets in seconds that keep the transport open, 0 to disable
+    :type keepalive: int
+    :return: fabric.Connection
+    """
+
+    with _connections_lock:
+        connection = _connections.get((host, user))
+        if connection is not None and connection.is_connected:
+            return connection
+
+        if connection is not None:
+            logger.info(f"Connection to {host} got disconnected, reconnecting.")
+            connection.close()
+        else:
+            logger.info(f"Creating connection to {host} as {user}")
+        connection = ssh_connect(host, user, keyfile)
+        if keepalive:
+            connection.transport.set_keepalive(keepalive)
+        _connections[(host, user)] = connection
+        return connection
+
+
+def close_connections() -> None:
+    """Close all pooled ssh connections."""
+
+    with _connections_lock:
+        for connection in _connections.values():
+            connection.close()
+        _connections.clear()
+
+
+def run_batched(connection, commands, remote_dir=None, max_length=200000, **kwargs) -> list:
+    """Run many small commands on the remote host in as few shell invocations as possible. The commands are \
+    joined into scripts of at most max_length characters, each script runs in one round trip and a failing \
+    command does not stop the following ones.
+
+    :param connection: fabric.Connection to the remote host
+    :param commands: shell commands
+    :type commands: list
+    :param remote_dir: (optional) directory to run the commands in
+    :type remote_dir: str
+    :param max_length: maximum length of a script in characters, below the maximum SSH packet size
+    :type max_length: int
+    :param kwargs: keyword arguments of connection.run, e.g. hide=True
+    :return: list of results of the scripts
+    """
+
+    prefix = f"cd {remote_dir} || exit 1\n" if remote_dir is not None else ""
+    batches, batch, length = [], [], len(prefix)
+    for command in commands:
+        if batch and length + len(command) + 1 > max_length:
+            batches.append(batch)
+            batch, length = [], len(prefix)
+        batch.append(command)
+        length += len(command) + 1
+    if batch:
+        batches.append(batch)
+
+    kwargs.setdefault('warn', True)
+    return [connection.run(prefix + "\n".join(batch), **kwargs) for batch in batches]
+
+
+def sftp_download_files(connection, remote_dir, local_dirs, max_workers=8, retries=3, retry_delay=1.):
+    """Download files concurrently over several SFTP channels opened on the SSH transport of a connection. \
+    Each worker thread uses its own channel, transient failures are retried with exponential backoff \
+    on a new channel. Results are yielded as soon as each download completes.
+
+    :param connection: fabric.Connection to the remote host created by ssh_connect
+    :param remote_dir: remote directory of the files
+    :type remote_dir: str
+    :param local_dirs: dictionary of file name -> local directory to download the file into
+    :type local_dirs: dict
+    :param max_workers: maximum number of concurrent downloads (SFTP channels)
+    :type max_workers: int
+    :param retries: number of retries of a failed download, missing files are not retried
+    :type retries: int
+    :param retry_delay: delay before the first retry in seconds, doubled after each retry
+    :type retry_delay: float
+    :return: generator of tuples of file name and exception, the exception is None if the download succeeded
+    """
+
+    local = threading.local()
+    channels = []
+    lock = threading.Lock()
+
+    def get_channel():
+        if getattr(local, 'sftp', None) is None:
+            local.sftp = paramiko.SFTPClient.from_transport(connection.transport)
+            with lock:
+                channels.append(local.sftp)
+        return local.sftp
+
+    def download(file_name):
+        os.makedirs(local_dirs[file_name], exist_ok=True)
+        for attempt in range(retries + 1):
+            try:
+                get_channel().get(f"{remote_dir}/{file_name}", os.path.join(local_dirs[file_name], file_name))
+                return
+            except FileNotFoundError:
+                raise
+            except (OSError, EOFError, paramiko.SSHException) as e:
+                if attempt == retries:
+                    raise
+                logger.debug(f"Download of {file_name} failed ({e}), retry {attempt + 1} of {retries}.")
+                local.sftp = None  # the channel may be broken, open a new one
+                time.sleep(retry_delay * 2 ** attempt)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(download, file_name): file_name for file_name in local_dirs}
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
+    finally:
+        for channel in channels:
+            channel.close()
+
+
 def cleanup_directory_files(dir_path, types=()) -> None:
     """Remove files with specific extension(s) from a directory.
 
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import signal
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from autoqchem.helper_classes import lsf_status, slurm_status
+
+logger = logging.getLogger(__name__)
+
+
+class job_daemon(object):
+    """Asynchronous driver of the job lifecycle of a queue manager. The daemon repeatedly submits created jobs, \
+    retrieves finished jobs, resubmits incomplete jobs and uploads done molecules to the database, polling the \
+    scheduler with an interval that backs off exponentially while nothing finishes and that is shortened when \
+    jobs are expected to finish. Remote operations (scheduler queries, transfers) run in one worker thread and \
+    uploads (descriptor extraction, database writes) in another, so that uploads overlap with polling. \
+    The connection of the manager is used by the remote operations only, the log files of done jobs are fetched \
+    in the io thread before an upload is started. \
+    All state is kept in the job store of the manager, a stopped daemon can be resumed by starting a new one."""
+
+    def __init__(self, manager, tags=None, resubmit=True, min_poll_interval=60., max_poll_interval=1800.,
+                 backoff=2., exit_when_done=True, submit_kwargs=None, resubmit_kwargs=None, upload_kwargs=None):
+        """Initialize the daemon.
+
+        :param manager: queue manager driven by the daemon
+        :type manager: slurm_manager or lsf_manager
+        :param tags: metadata tag or tags of the uploaded molecules, if None done molecules are not uploaded
+        :type tags: str or list
+        :param resubmit: if True incomplete jobs are resubmitted
+        :type resubmit: bool
+        :param min_poll_interval: shortest time between two polls of the scheduler in seconds
+        :type min_poll_interval: float
+        :param max_poll_interval: longest time between two polls of the scheduler in seconds
+        :type max_poll_interval: float
+        :param backoff: factor the poll interval grows by after each poll without finished jobs
+        :type backoff: float
+        :param exit_when_done: if True the daemon stops when there are no more jobs to drive
+        :type exit_when_done: bool
+        :param submit_kwargs: (optional) keyword arguments of submit_jobs, e.g. {'array': True}
+        :type submit_kwargs: dict
+        :param resubmit_kwargs: (optional) keyword arguments of resubmit_incomplete_jobs, e.g. {'restart': True}
+        :type resubmit_kwargs: dict
+        :param upload_kwargs: (optional) keyword arguments of upload_done_molecules_to_db, e.g. {'cls': ...}
+        :type upload_kwargs: dict
+        """
+
+        self.manager = manager
+        self.tags = tags
+        self.resubmit = resubmit
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.exit_when_done = exit_when_done
+        self.submit_kwargs = submit_kwargs or {}
+        self.resubmit_kwargs = resubmit_kwargs or {}
+        self.upload_kwargs = upload_kwargs or {}
+
+        # imported here, the manager module is loaded already when a manager is passed
+        from autoqchem.queue_manager import lsf_manager
+        self.status = lsf_status if isinstance(manager, lsf_manager) else slurm_status
+        self.poll_interval = min_poll_interval
+        self.submitted_at = {}  # job key -> time the daemon saw the job submitted
+        self.runtimes = []  # runtimes in seconds of jobs observed from submission to completion
+
+        self._stop_event = None
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autoqchem-io")
+        self._upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autoqchem-upload")
+
+    def start(self) -> None:
+        """Run the daemon until it is done or stopped (SIGINT, SIGTERM)."""
+
+        asyncio.run(self.run())
+
+    def stop(self) -> None:
+        """Request the daemon to stop after the current step, jobs are left in a consistent state in the store."""
+
+        if self._stop_event is not None:
+            self._stop_event.set()
+            logger.info("Stopping the job daemon after the current step.")
+
+    async def run(self) -> None:
+        """Drive jobs through the lifecycle until there is nothing left to do or the daemon is stopped."""
+
+        loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):  # not available on this platform or thread
+                pass
+
+        upload = None
+        logger.info(f"Job daemon started, {len(self.manager.jobs)} jobs under management.")
+        try:
+            while not self._stop_event.is_set():
+                if self.manager.get_jobs(self.status.created):
+                    await self._io(self.manager.submit_jobs, **self.submit_kwargs)
+                    self._track_submitted()
+
+                n_finished = await self._retrieve()
+
+                if self.resubmit and self._resubmittable_jobs() and not self._stop_event.is_set():
+                    await self._io(self.manager.resubmit_incomplete_jobs, **self.resubmit_kwargs)
+                    self._track_submitted()
+
+                # upload in the background, overlapping with the next polls
+                if self.tags is not None and (upload is None or upload.done()) and \
+                        self.manager.get_jobs(self.status.done):
+                    upload = await self._start_upload()
+
+                if self.exit_when_done and self._is_done():
+                    # last upload of the molecules that are done
+                    if upload is not None:
+                        await upload
+                    if self.tags is not None:
+                        upload = await self._start_upload()
+                    logger.info("All jobs have finished, stopping the job daemon.")
+                    break
+
+                await self._sleep(self._next_poll_interval(n_finished))
+        finally:
+            if upload is not None:
+                await upload
+            self._io_executor.shutdown()
+            self._upload_executor.shutdown()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            logger.info("Job daemon stopped.")
+
+    async def _io(self, function, *args, **kwargs):
+        """Run a remote operation of the manager in the io worker thread."""
+
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor,
+                                                                lambda: function(*args, **kwargs))
+
+    async def _retrieve(self) -> int:
+        """Retrieve finished jobs and record their runtimes.
+
+        :return: number of jobs that finished since the last poll
+        """
+
+        submitted = set(self.manager.get_jobs(self.status.submitted))
+        if not submitted:
+            return 0
+
+        await self._io(self.manager.retrieve_jobs)
+        finished = submitted - set(self.manager.get_jobs(self.status.submitted))
+
+        now = time.time()
+        for key in finished:
+            if key in self.submitted_at:
+                self.runtimes.append(now - self.submitted_at.pop(key))
+        return len(finished)
+
+    async def _start_upload(self) -> asyncio.Future:
+        """Fetch the missing log files of done jobs in the io thread and start an upload in the upload thread.
+
+        :return: asyncio.Future of the upload
+        """
+
+        await self._io(self.manager._fetch_missing_logs, self.manager.get_jobs(self.status.done))
+        return asyncio.get_running_loop().run_in_executor(self._upload_executor, self._upload)
+
+    def _upload(self) -> None:
+        """Upload done molecules to the database, runs in the upload worker thread."""
+
+        try:
+            self.manager.upload_done_molecules_to_db(self.tags, fetch_logs=False, **self.upload_kwargs)
+        except Exception as e:
+            logger.error(f"Upload of done molecules failed: {e}")
+
+    def _track_submitted(self) -> None:
+        """Record the time jobs were first seen submitted, jobs submitted before the daemon started \
+        count as submitted at the first poll."""
+
+        now = time.time()
+        for key in self.manager.get_jobs(self.status.submitted):
+            self.submitted_at.setdefault(key, now)
+
+    def _resubmittable_jobs(self) -> dict:
+        """Incomplete jobs that have not reached the resubmission limit."""
+
+        return {key: job for key, job in self.manager.get_jobs(self.status.incomplete).items()
+                if job.n_submissions < 3}
+
+    def _is_done(self) -> bool:
+        """True if no job is waiting to be submitted, running or waiting to be resubmitted."""
+
+        if self.manager.get_jobs(self.status.created) or self.manager.get_jobs(self.status.submitted):
+            return False
+        return not (self.resubmit and self._resubmittable_jobs())
+
+    def _next_poll_interval(self, n_finished) -> float:
+        """Poll interval after a poll. It is reset to the minimum when jobs have finished and grows \
+        by the backoff factor otherwise, but the next poll is never later than the expected completion \
+        of the next job, estimated from the median runtime of the jobs observed so far. Jobs running longer \
+        than the median are not expected to finish at any particular time and do not shorten the interval.
+
+        :param n_finished: number of jobs that finished at the last poll
+        :return: float, poll interval in seconds
+        """
+
+        if n_finished:
+            self.poll_interval = self.min_poll_interval
+        else:
+            self.poll_interval = min(self.max_poll_interval, self.poll_interval * self.backoff)
+
+        interval = self.poll_interval
+        if self.runtimes and self.submitted_at:
+            now, runtime = time.time(), statistics.median(self.runtimes)
+            expected_finishes = [submitted_at + runtime for submitted_at in self.submitted_at.values()
+                                 if submitted_at + runtime > now]
+            if expected_finishes:
+                interval = min(interval, max(self.min_poll_interval, min(expected_finishes) - now))
+
+        return interval
+
+    async def _sleep(self, seconds) -> None:
+        """Sleep until the next poll or until the daemon is stopped."""
+
+        logger.debug(f"Next poll in {seconds:.0f} s.")
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class job_journal(object):
+    """Append-only journal of job events (created, submitting, submitted with the job id, retrieved, classified, \
+    uploaded, ...), one JSON record per line. Records are flushed to the operating system as they are appended, \
+    so they survive a crash of the process, and synced to disk at most once per sync interval, so that \
+    journaling a large submission costs a handful of fsyncs. The job store syncs the journal itself before \
+    a checkpoint and before a submission command runs. The job store keeps the offset of the journal \
+    up to which its snapshot is complete, the records after it are replayed when the store is opened."""
+
+    sync_interval = 1.  #: longest time in seconds between an append and the fsync of the journal
+    max_size = 64 * 1024 ** 2  #: size in bytes beyond which the journal is rotated at a checkpoint
+
+    def __init__(self, journal_file):
+        """Open (or create) the journal. A record left incomplete by a crash while it was appended is dropped.
+
+        :param journal_file: path of the journal file
+        :type journal_file: str
+        """
+
+        self.journal_file = journal_file
+        self._file = open(journal_file, "ab")
+        self._truncate_incomplete_record()
+        self._synced_at = time.time()
+
+    def append(self, event, key, **data) -> None:
+        """Append a record to the journal.
+
+        :param event: name of the event, e.g. 'submitted'
+        :type event: str
+        :param key: key of the job
+        :type key: str
+        :param data: data of the event, JSON serializable
+        """
+
+        record = {'time': time.time(), 'event': event, 'key': key, **data}
+        self._file.write(json.dumps(record, default=str).encode() + b"\n")
+        self._file.flush()
+        if time.time() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """Write the appended records to disk."""
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced_at = time.time()
+
+    def offset(self) -> int:
+        """Current end of the journal.
+
+        :return: int, offset in bytes
+        """
+
+        return self._file.tell()
+
+    def records(self, offset=0):
+        """Iterate over the records of the journal from an offset. If the offset is beyond the end of the \
+        journal, which happens if the process stopped while the journal was rotated, all records are returned.
+
+        :param offset: offset in bytes of the first record
+        :type offset: int
+        :return: iterator of dicts
+        """
+
+        self._file.flush()
+        with open(self.journal_file, "rb") as f:
+            f.seek(offset if offset <= os.path.getsize(self.journal_file) else 0)
+            for line in f:
+                yield json.loads(line)
+
+    def rotate(self) -> bool:
+        """Start a new journal if the journal exceeds the maximum size, the previous journal is kept \
+        as *.1. Only call after a checkpoint of the store.
+
+        :return: bool, True if the journal was rotated
+        """
+
+        if self.offset() < self.max_size:
+            return False
+
+        self.sync()
+        self._file.close()
+        os.replace(self.journal_file, f"{self.journal_file}.1")
+        self._file = open(self.journal_file, "ab")
+        logger.debug(f"Rotated job journal {self.journal_file}.")
+        return True
+
+    def close(self) -> None:
+        """Sync and close the journal."""
+
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def _truncate_incomplete_record(self) -> None:
+        """Drop an incomplete last record."""
+
+        size = self.offset()
+        if not size:
+            return
+        with open(self.journal_file, "rb") as f:
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+        if not tail.endswith(b"\n"):
+            end = size - len(tail) + tail.rfind(b"\n") + 1
+            self._file.truncate(end)
+            self._file.seek(end)
+            logger.warning(f"Dropped an incomplete record at the end of the job journal {self.journal_file}.")
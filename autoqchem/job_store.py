@@ -0,0 +1,409 @@
+import base64
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from collections import Counter
+from collections.abc import MutableMapping
+from functools import wraps
+
+from autoqchem.helper_classes import job_observers
+from autoqchem.job_journal import job_journal
+
+logger = logging.getLogger(__name__)
+
+
+def _synchronized(method):
+    """Run a method of the job store while holding its lock."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class job_store(MutableMapping):
+    """Transactional store of jobs under management backed by a SQLite database. It behaves like the dictionary \
+    of jobs it replaces, jobs are loaded from the database when they are first accessed. Attribute changes of \
+    loaded jobs are tracked, :py:meth:`~job_store.job_store.commit` writes the changed rows only, in a single \
+    transaction. In-memory indexes of all jobs by status, canonical smiles and job id, and counters of jobs \
+    per status and canonical smiles are kept up to date on every change, so that selecting and counting jobs \
+    does not depend on the number of jobs in the store. The store can be shared by threads. Optionally the \
+    state transitions of the jobs are recorded in an append-only journal as they happen, each commit is a \
+    checkpoint of the journal, the transitions after the last checkpoint are replayed when the store is opened."""
+
+    indexed = ('status', 'can', 'job_id')  #: indexed job attributes
+    journaled = ('status', 'job_id', 'pack', 'n_submissions', 'failure_reason', 'timings')  #: journaled job attributes
+
+    def __init__(self, db_file, legacy_cache_file=None, journal_file=None):
+        """Open (or create) the job store. If the store is empty and a pickle cache file of the jobs exists, \
+        the jobs are migrated from the pickle cache into the store and the cache file is renamed to *.migrated. \
+        If a journal file is given, the transitions journaled after the last commit are replayed.
+
+        :param db_file: path of the SQLite database file
+        :type db_file: str
+        :param legacy_cache_file: (optional) path of the pickle cache file with jobs to migrate
+        :type legacy_cache_file: str
+        :param journal_file: (optional) path of the journal file of the job transitions
+        :type journal_file: str
+        """
+
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, can TEXT, status INTEGER, job_id TEXT, job BLOB);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+            CREATE INDEX IF NOT EXISTS jobs_can ON jobs (can);
+            CREATE INDEX IF NOT EXISTS jobs_job_id ON jobs (job_id);
+            CREATE TABLE IF NOT EXISTS checkpoint (id INTEGER PRIMARY KEY CHECK (id = 0), journal_offset INTEGER);
+            CREATE TABLE IF NOT EXISTS options (name TEXT PRIMARY KEY, value TEXT);
+        """)
+
+        self._jobs = {}  # loaded jobs
+        self._keys = {}  # id of a loaded job -> key
+        self._dirty = set()  # keys of loaded jobs changed since the last flush
+        self._values = {}  # key -> indexed values of the job, for all jobs in the store
+        self._indexes = {name: {} for name in self.indexed}  # attribute -> value -> keys (dict with None values)
+        self._counts = Counter()  # (status, can) -> number of jobs
+        self.journal = None
+        self.unconfirmed = {}  # key -> journal record of submissions that were interrupted before their job id
+        self._replaying = False
+        for key, status, can, job_id in self._connection.execute("SELECT key, status, can, job_id FROM jobs"):
+            self._index(key, (status, can, job_id))
+        job_observers.add(self)
+
+        if legacy_cache_file is not None and os.path.exists(legacy_cache_file) and not len(self):
+            try:
+                self._migrate(legacy_cache_file)
+            except Exception as e:  # empty or unreadable cache file
+                logger.warning(f"Could not migrate jobs from {legacy_cache_file}: {e}")
+
+        if journal_file is not None:
+            self.journal = job_journal(journal_file)
+            self._recover()
+
+    __hash__ = object.__hash__  # stores are registered in the weak set of job observers
+
+    @_synchronized
+    def __getitem__(self, key):
+        if key not in self._jobs:
+            row = self._connection.execute("SELECT job FROM jobs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            self._load(key, row[0])
+        return self._jobs[key]
+
+    @_synchronized
+    def __setitem__(self, key, job):
+        self._journal('created', key, job=base64.b64encode(pickle.dumps(job)).decode())
+        if key in self._jobs:
+            self._keys.pop(id(self._jobs[key]), None)
+        self._jobs[key] = job
+        self._keys[id(job)] = key
+        self._dirty.add(key)
+        self._reindex(key, job)
+
+    @_synchronized
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._journal('removed', key)
+        self._connection.execute("DELETE FROM jobs WHERE key = ?", (key,))
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            self._keys.pop(id(job), None)
+        self._dirty.discard(key)
+        self._unindex(key)
+
+    @_synchronized
+    def __iter__(self):
+        return iter(list(self._values))
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    @_synchronized
+    def items(self):
+        self._load_all()
+        return dict(self._jobs).items()
+
+    @_synchronized
+    def values(self):
+        self._load_all()
+        return list(self._jobs.values())
+
+    @_synchronized
+    def select(self, status=None, can=None, job_id=None) -> dict:
+        """Select jobs using the indexes of the store.
+
+        :param status: status of the jobs
+        :type status: slurm_status or lsf_status
+        :param can: canonical smiles of the molecules, single string for one smiles, a list for multiple smiles
+        :type can: str or list
+        :param job_id: job id on the remote host, single id or a list of ids
+        :type job_id: str or list
+        :return: dict
+        """
+
+        # keys matching each of the conditions
+        matches = []
+        if status is not None:
+            matches.append(self._indexes['status'].get(status.value, {}))
+        for name, values in [('can', can), ('job_id', job_id)]:
+            if values is not None:
+                values = [values] if isinstance(values, (str, int)) else values
+                index = self._indexes[name]
+                if len(values) == 1:
+                    matches.append(index.get(str(values[0]) if name == 'job_id' else values[0], {}))
+                else:
+                    matches.append({key: None for value in dict.fromkeys(values)
+                                    for key in index.get(str(value) if name == 'job_id' else value, {})})
+
+        if not matches:
+            keys = list(self._values)
+        else:
+            smallest = min(matches, key=len)
+            keys = [key for key in smallest if all(key in match for match in matches if match is not smallest)]
+
+        self._load_keys(keys)
+        return {key: self._jobs[key] for key in keys}
+
+    @_synchronized
+    def count(self) -> list:
+        """Number of jobs for each status and canonical smiles.
+
+        :return: list of tuples of status value, canonical smiles and number of jobs
+        """
+
+        return [(status, can, n) for (status, can), n in self._counts.items() if n > 0]
+
+    @_synchronized
+    def commit(self) -> None:
+        """Write the changed jobs to the database and commit the transaction, together with the checkpoint \
+        of the journal. The journal is synced first, so that the checkpoint never points past its end on disk."""
+
+        self._flush()
+        if self.journal is not None:
+            self.journal.sync()
+            self._checkpoint(self.journal.offset())
+        self._connection.commit()
+
+        if self.journal is not None and self.journal.rotate():
+            self._checkpoint(0)
+            self._connection.commit()
+
+    @_synchronized
+    def get_option(self, name, default=None):
+        """Get an option of the manager of the jobs kept in the store, e.g. the options of a submission.
+
+        :param name: name of the option
+        :type name: str
+        :param default: value returned if the option is not set
+        :return: value of the option
+        """
+
+        row = self._connection.execute("SELECT value FROM options WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    @_synchronized
+    def set_option(self, name, value) -> None:
+        """Set an option of the manager of the jobs and commit the store, so that the option persists \
+        across restarts of the manager.
+
+        :param name: name of the option
+        :type name: str
+        :param value: value of the option, JSON serializable, None removes the option
+        """
+
+        if value is None:
+            self._connection.execute("DELETE FROM options WHERE name = ?", (name,))
+        else:
+            self._connection.execute("INSERT OR REPLACE INTO options (name, value) VALUES (?, ?)",
+                                     (name, json.dumps(value)))
+        self.commit()
+
+    @_synchronized
+    def job_changed(self, job, name, old_value, new_value) -> None:
+        """Mark a loaded job as changed, called by the job when one of its attributes is set."""
+
+        key = self._keys.get(id(job))
+        if key is not None and self._jobs.get(key) is job:
+            self._dirty.add(key)
+            if name in self.indexed:
+                self._reindex(key, job)
+            if name in self.journaled and new_value != old_value:
+                if name == 'status':
+                    self._journal(new_value.name, key, name=name, value=new_value.value)
+                    self.unconfirmed.pop(key, None)
+                else:
+                    self._journal('classified' if name == 'failure_reason' else 'changed', key,
+                                  name=name, value=new_value)
+
+    @_synchronized
+    def journal_event(self, event, key, sync=True, **data) -> None:
+        """Record an event of a job in the journal, e.g. the intent to submit it before the submission command \
+        runs. A 'submitting' event that is not followed by a status change before the store is reopened marks \
+        the job as unconfirmed, see :py:meth:`~job_store.job_store.confirm_submissions`.
+
+        :param event: name of the event
+        :type event: str
+        :param key: key of the job
+        :type key: str
+        :param sync: if True the journal is synced to disk before returning, the intent of a submission must be \
+        on disk before the submission command runs, events of a batch can be synced at once with \
+        :py:meth:`~job_store.job_store.sync_journal`
+        :type sync: bool
+        :param data: data of the event, JSON serializable
+        """
+
+        self._journal(event, key, **data)
+        if sync:
+            self.sync_journal()
+
+    @_synchronized
+    def sync_journal(self) -> None:
+        """Write the records appended to the journal to disk."""
+
+        if self.journal is not None:
+            self.journal.sync()
+
+    @_synchronized
+    def confirm_submissions(self) -> None:
+        """Forget the unconfirmed submissions, once they have been reconciled with the scheduler."""
+
+        self.unconfirmed = {}
+
+    def _journal(self, event, key, **data) -> None:
+        """Append a record to the journal, unless the journal is being replayed."""
+
+        if self.journal is not None and not self._replaying:
+            self.journal.append(event, key, **data)
+
+    def _checkpoint(self, offset) -> None:
+        """Record the offset of the journal up to which the jobs in the database are complete, \
+        within the open transaction."""
+
+        self._connection.execute("INSERT OR REPLACE INTO checkpoint (id, journal_offset) VALUES (0, ?)", (offset,))
+
+    def _recover(self) -> None:
+        """Replay the transitions journaled after the last checkpoint, e.g. the job ids of jobs submitted \
+        right before a crash, and commit them as a new checkpoint."""
+
+        row = self._connection.execute("SELECT journal_offset FROM checkpoint WHERE id = 0").fetchone()
+        offset = row[0] if row is not None else 0
+
+        n_records = 0
+        self._replaying = True
+        try:
+            for record in self.journal.records(offset):
+                key, event = record['key'], record['event']
+                n_records += 1
+                if event == 'created':
+                    self[key] = pickle.loads(base64.b64decode(record['job']))
+                elif event == 'removed':
+                    if key in self:
+                        del self[key]
+                elif event == 'submitting':
+                    self.unconfirmed[key] = record
+                elif 'name' in record and key in self:
+                    job = self[key]
+                    value = type(job.status)(record['value']) if record['name'] == 'status' else record['value']
+                    setattr(job, record['name'], value)
+        finally:
+            self._replaying = False
+
+        if n_records:
+            logger.info(f"Replayed {n_records} job transitions from the journal {self.journal.journal_file}, "
+                        f"{len(self.unconfirmed)} submissions are unconfirmed.")
+        self.commit()
+
+    def _flush(self) -> None:
+        """Write the changed jobs to the database, within the open transaction."""
+
+        if self._dirty:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO jobs (key, can, status, job_id, job) VALUES (?, ?, ?, ?, ?)",
+                [(key, job.can, job.status.value, str(job.job_id), pickle.dumps(job))
+                 for key, job in ((key, self._jobs[key]) for key in self._dirty)])
+            self._dirty.clear()
+
+    def _load(self, key, data) -> None:
+        """Unpickle a job row and track it."""
+
+        job = pickle.loads(data)
+        self._jobs[key] = job
+        self._keys[id(job)] = key
+
+    def _load_all(self) -> None:
+        """Load all jobs that have not been loaded yet."""
+
+        if len(self._jobs) < len(self):
+            for key, data in self._connection.execute("SELECT key, job FROM jobs"):
+                if key not in self._jobs:
+                    self._load(key, data)
+
+    def _load_keys(self, keys) -> None:
+        """Load the jobs of the given keys that have not been loaded yet, in batches."""
+
+        missing = [key for key in keys if key not in self._jobs]
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            query = f"SELECT key, job FROM jobs WHERE key IN ({','.join('?' * len(batch))})"
+            for key, data in self._connection.execute(query, batch):
+                self._load(key, data)
+
+    def _reindex(self, key, job) -> None:
+        """Update the indexes and counters with the current attributes of a job."""
+
+        values = (job.status.value, job.can, str(job.job_id))
+        if self._values.get(key) != values:
+            self._unindex(key)
+            self._index(key, values)
+
+    def _index(self, key, values) -> None:
+        """Add a job to the indexes and counters.
+
+        :param key: key of the job
+        :param values: tuple of status value, canonical smiles and job id
+        """
+
+        self._values[key] = values
+        for name, value in zip(self.indexed, values):
+            self._indexes[name].setdefault(value, {})[key] = None
+        self._counts[values[:2]] += 1
+
+    def _unindex(self, key) -> None:
+        """Remove a job from the indexes and counters."""
+
+        values = self._values.pop(key, None)
+        if values is None:
+            return
+        for name, value in zip(self.indexed, values):
+            index = self._indexes[name]
+            del index[value][key]
+            if not index[value]:
+                del index[value]
+        self._counts[values[:2]] -= 1
+        if not self._counts[values[:2]]:
+            del self._counts[values[:2]]
+
+    def _migrate(self, legacy_cache_file) -> None:
+        """Migrate jobs from a pickle cache file into the store."""
+
+        with open(legacy_cache_file, 'rb') as cf:
+            jobs = pickle.load(cf)
+
+        for key, job in jobs.items():
+            self[key] = job
+        self.commit()
+        os.rename(legacy_cache_file, f"{legacy_cache_file}.migrated")
+        logger.info(f"Migrated {len(jobs)} jobs from {legacy_cache_file} to {self.db_file}.")
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from autoqchem.helper_classes import lazy_module
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+# lifecycle phases of a job, see timing_frame
+phases = ['queue_wait', 'runtime', 'transfer', 'extraction', 'upload', 'turnaround']
+
+
+def timing_frame(jobs) -> pd.DataFrame:
+    """Durations of the lifecycle phases of jobs, from their timings. The queue wait is the time between \
+    the latest submission and the retrieval of a job that it did not spend running, it includes the time \
+    until the next poll of the scheduler. The turnaround is the time from the creation to the upload of a job.
+
+    :param jobs: dictionary of jobs
+    :type jobs: dict
+    :return: pandas.core.frame.DataFrame with the canonical smiles, the status, the number of processors, \
+    the time of the retrieval, the duration of each phase in seconds and the CPU hours of each job
+    """
+
+    rows = []
+    for key, job in jobs.items():
+        timings = job.timings or {}
+        submitted = timings.get('submitted')
+        retrieved = max([timings[status] for status in ('done', 'failed', 'incomplete') if status in timings],
+                        default=None)
+        if submitted is None or retrieved is None or retrieved < submitted:
+            retrieved = None  # not retrieved since the latest submission
+
+        queue_wait = None
+        if retrieved is not None:
+            queue_wait = max(0., retrieved - submitted - (job.elapsed or 0.))
+        turnaround = None
+        if 'uploaded' in timings and 'created' in timings:
+            turnaround = timings['uploaded'] - timings['created']
+        cpu_hours = job.elapsed / 3600 * job.n_processors if job.elapsed and job.n_processors else None
+
+        rows.append([key, job.can, job.status.name, job.n_processors, retrieved, queue_wait, job.elapsed,
+                     timings.get('transfer_time'), timings.get('extraction_time'), timings.get('upload_time'),
+                     turnaround, cpu_hours])
+
+    return pd.DataFrame(rows, columns=['key', 'can', 'status', 'n_processors', 'retrieved'] + phases +
+                        ['cpu_hours']).set_index('key').astype({phase: float for phase in phases})
+
+
+def summarize_timings(df, window=86400.) -> dict:
+    """Aggregate the timings of jobs into throughput and phase statistics.
+
+    :param df: timings of the jobs, see :py:meth:`~metrics_functions.timing_frame`
+    :type df: pandas.core.frame.DataFrame
+    :param window: time window in seconds of the throughput, the jobs retrieved within it are counted
+    :type window: float
+    :return: dict with the throughput in jobs per hour (jobs_per_hour, successful jobs only), the mean CPU hours \
+    per molecule of the molecules with all jobs done (cpu_hours_per_molecule) and, for each phase, \
+    the count, sum, median and 90th percentile of its durations
+    """
+
+    recent = df['retrieved'].dropna() >= time.time() - window
+    done = df[df['status'].isin(['done', 'uploaded'])]
+    finished_cans = set(done['can']) - set(df.loc[~df['status'].isin(['done', 'uploaded']), 'can'])
+    cpu_hours = done[done['can'].isin(finished_cans)].groupby('can')['cpu_hours'].sum(min_count=1).dropna()
+
+    summary = {'jobs_per_hour': recent[recent].index.intersection(done.index).size / (window / 3600),
+               'cpu_hours_per_molecule': cpu_hours.mean() if len(cpu_hours) else None,
+               'phases': {}}
+    for phase in phases:
+        durations = df[phase].dropna()
+        summary['phases'][phase] = {'count': len(durations), 'sum': durations.sum(),
+                                    'median': durations.median() if len(durations) else None,
+                                    'p90': durations.quantile(0.9) if len(durations) else None}
+    return summary
+
+
+def format_prometheus(host, job_counts, summary) -> str:
+    """Format the metrics of a queue manager in the Prometheus text exposition format.
+
+    :param host: host of the queue manager, used as label
+    :type host: str
+    :param job_counts: dict of status name -> number of jobs
+    :type job_counts: dict
+    :param summary: aggregated timings, see :py:meth:`~metrics_functions.summarize_timings`
+    :type summary: dict
+    :return: str
+    """
+
+    label = f'host="{host}"'
+    lines = ["# HELP autoqchem_jobs Number of jobs under management by status.",
+             "# TYPE autoqchem_jobs gauge"]
+    lines += [f'autoqchem_jobs{{{label},status="{status}"}} {n}' for status, n in job_counts.items()]
+
+    lines += ["# HELP autoqchem_job_phase_seconds Duration of the lifecycle phases of the jobs.",
+              "# TYPE autoqchem_job_phase_seconds summary"]
+    for phase, stats in summary['phases'].items():
+        for quantile, name in [("0.5", 'median'), ("0.9", 'p90')]:
+            if stats[name] is not None:
+                lines.append(f'autoqchem_job_phase_seconds{{{label},phase="{phase}",quantile="{quantile}"}} '
+                             f'{stats[name]:g}')
+        lines.append(f'autoqchem_job_phase_seconds_sum{{{label},phase="{phase}"}} {stats["sum"]:g}')
+        lines.append(f'autoqchem_job_phase_seconds_count{{{label},phase="{phase}"}} {stats["count"]}')
+
+    lines += ["# HELP autoqchem_throughput_jobs_per_hour Jobs finished successfully per hour.",
+              "# TYPE autoqchem_throughput_jobs_per_hour gauge",
+              f"autoqchem_throughput_jobs_per_hour{{{label}}} {summary['jobs_per_hour']:g}"]
+    if summary['cpu_hours_per_molecule'] is not None:
+        lines += ["# HELP autoqchem_cpu_hours_per_molecule Mean CPU hours of the finished molecules.",
+                  "# TYPE autoqchem_cpu_hours_per_molecule gauge",
+                  f"autoqchem_cpu_hours_per_molecule{{{label}}} {summary['cpu_hours_per_molecule']:g}"]
+
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(text, path) -> None:
+    """Write metrics to a file atomically, e.g. for the textfile collector of the Prometheus node exporter.
+
+    :param text: metrics in the Prometheus text format
+    :type text: str
+    :param path: path of the file
+    :type path: str
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as f:
+        f.write(text)
+    os.chmod(f.name, 0o644)  # temporary files are private
+    os.replace(f.name, path)
+
+
+def start_metrics_server(get_metrics, port, address="") -> http.server.ThreadingHTTPServer:
+    """Serve metrics over HTTP in a background thread, the metrics are computed on each request.
+
+    :param get_metrics: function returning the metrics in the Prometheus text format
+    :type get_metrics: callable
+    :param port: port to listen on
+    :type port: int
+    :param address: address to listen on, all interfaces by default
+    :type address: str
+    :return: http.server.ThreadingHTTPServer, call shutdown() to stop it
+    """
+
+    import http.server  # only needed to serve metrics
+
+    class handler(http.server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            try:
+                body = get_metrics().encode()
+            except Exception as e:
+                logger.error(f"Could not compute metrics: {e}")
+                self.send_error(500)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = http.server.ThreadingHTTPServer((address, port), handler)
+    threading.Thread(target=server.serve_forever, name="autoqchem-metrics", daemon=True).start()
+    logger.info(f"Serving metrics on port {server.server_address[1]}.")
+    return server
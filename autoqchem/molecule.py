@@ -1,19 +1,16 @@
-import hashlib
-
-try:
-    from openbabel import pybel  # openbabel 3.0.0
+from __future__ import annotations
 
-    GetSymbol = pybel.ob.GetSymbol
-    GetVdwRad = pybel.ob.GetVdwRad
-except ImportError:
-    import pybel  # openbabel 2.4
-
-    table = pybel.ob.OBElementTable()
-    GetSymbol = table.GetSymbol
-    GetVdwRad = table.GetVdwRad
+import hashlib
 
 from autoqchem.gaussian_input_generator import *
+from autoqchem.helper_classes import lazy_module
+from autoqchem.helper_functions import pybel, GetSymbol, GetVdwRad
 from autoqchem.openbabel_functions import *
+from autoqchem.smiles_cache import canonical_smiles, OBMol_from_can
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+distance = lazy_module("scipy.spatial.distance")
 
 logger = logging.getLogger(__name__)
 
@@ -45,15 +42,15 @@ class molecule(object):
         molecular fragments are supported
         """
 
-        # read the molecule
-        self.mol = input_to_OBMol(input, input_type, input_format)
-
-        # get canonical smiles of this molecule
-        self.can = OBMol_to_string(self.mol, "can")
+        # get canonical smiles of this molecule (string inputs are canonicalized through the cache)
+        if input_type == "string":
+            self.can = canonical_smiles(input, input_format)
+        else:
+            self.can = OBMol_to_string(input_to_OBMol(input, input_type, input_format), "can")
         logger.info(f"Initializing molecule with canonical smiles: {self.can}")
 
-        # reload molecule from can
-        self.mol = input_to_OBMol(self.can, "string", "can")
+        # load molecule from can
+        self.mol = OBMol_from_can(self.can)
 
         # create a unique name for files and directories, aka filesystem name (use stoichiometric formula)
         # add 4 hash digits of its canonical smiles in case of collisions of formulas
@@ -187,12 +184,12 @@ class molecule(object):
             v = geom.iloc[self.centers].diff().dropna().values  # separate along the center-center axis
             v = v / np.linalg.norm(v)
 
-            init_mdist = cdist(geom.loc[0], geom.loc[1]).min()
+            init_mdist = distance.cdist(geom.loc[0], geom.loc[1]).min()
             counter = 0
             mdist = init_mdist
             while mdist < min_fragment_dist:
                 geom.loc[1] = geom.loc[1].values + 0.1 * v
-                mdist = cdist(geom.loc[0], geom.loc[1]).min()
+                mdist = distance.cdist(geom.loc[0], geom.loc[1]).min()
                 counter += 1
 
             if counter > 0:
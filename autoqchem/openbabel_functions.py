@@ -1,8 +1,40 @@
+from __future__ import annotations
+
+import threading
+
 from autoqchem.gaussian_log_extractor import *
 from autoqchem.helper_classes import *
-from autoqchem.molecule import pybel
+from autoqchem.helper_functions import pybel
+from autoqchem.smiles_cache import *
+
+# OBConversion objects keep their in/out formats as state, so they are never shared between threads,
+# each thread keeps its own converters, one per (in_format, out_format) pair
+_conversions = threading.local()
+
+
+def get_OBConversion(in_format=None, out_format=None) -> pybel.ob.OBConversion:
+    """Get an OBConversion object of the calling thread with the requested formats set. Converters are created \
+    once per thread and format pair and reused afterwards, so they can be used concurrently from a thread pool.
+
+    :param in_format: input format supported by OpenBabel, e.g. 'smi', 'cdx', 'pdb', etc.
+    :param out_format: output format supported by OpenBabel, e.g. 'smi', 'can', 'svg', etc.
+    :return: openbabel.OBConversion
+    """
+
+    pool = getattr(_conversions, 'pool', None)
+    if pool is None:
+        pool = _conversions.pool = {}
 
-conv = pybel.ob.OBConversion()
+    conv = pool.get((in_format, out_format))
+    if conv is None:
+        conv = pybel.ob.OBConversion()
+        if in_format is not None and not conv.SetInFormat(in_format):
+            raise ValueError(f"Input format '{in_format}' is not supported by OpenBabel.")
+        if out_format is not None and not conv.SetOutFormat(out_format):
+            raise ValueError(f"Output format '{out_format}' is not supported by OpenBabel.")
+        pool[(in_format, out_format)] = conv
+
+    return conv
 
 
 def input_to_OBMol(input, input_type, input_format) -> pybel.ob.OBMol:
@@ -16,7 +48,7 @@ def input_to_OBMol(input, input_type, input_format) -> pybel.ob.OBMol:
     """
 
     mol = pybel.ob.OBMol()
-    conv.SetInFormat(input_format)
+    conv = get_OBConversion(in_format=input_format)
 
     if input_type == "file":
         conv.ReadFile(mol, input)
@@ -34,7 +66,7 @@ def OBMol_to_string(mol, format) -> str:
     :return: string representation of the molecule
     """
 
-    conv.SetOutFormat(format)
+    conv = get_OBConversion(out_format=format)
     return conv.WriteString(mol).strip()
 
 
@@ -46,8 +78,9 @@ def OBMol_to_file(mol, format, target_path) -> None:
     :param target_path: path of the output file
     """
 
-    conv.SetOutFormat(format)
-    return conv.WriteFile(mol, target_path)
+    conv = get_OBConversion(out_format=format)
+    conv.WriteFile(mol, target_path)
+    conv.CloseOutFile()
 
 
 def OBMol_from_done_slurm_job(slurm_job) -> pybel.ob.OBMol:
@@ -61,14 +94,28 @@ def OBMol_from_done_slurm_job(slurm_job) -> pybel.ob.OBMol:
     le = gaussian_log_extractor(f"{slurm_job.directory}/{slurm_job.base_name}.log")
     le.get_atom_labels()
     le.get_geometry()
-    # create OBMol from can
-    mol = input_to_OBMol(slurm_job.can, input_type="string", input_format="can")
+    return OBMol_from_can_and_geometry(slurm_job.can, le.geom[list('XYZ')].values.tolist())
+
+
+def OBMol_from_can_and_geometry(can, coords) -> pybel.ob.OBMol:
+    """Create OBMol object from a canonical smiles and the coordinates of its atoms, e.g. the geometry \
+    extracted from the log file of a finished job.
+
+    :param can: canonical smiles
+    :type can: str
+    :param coords: list of x, y, z coordinates of the atoms, including hydrogens, in the order of the log file
+    :type coords: list
+    :return: openbabel.OBMol
+    """
+
+    # create OBMol from can (a copy of the cached template, safe to modify)
+    mol = OBMol_from_can(can)
     mol.AddHydrogens()
 
     # adjust geometry
     for atom in pybel.ob.OBMolAtomIter(mol):
-        pos = le.geom.iloc[atom.GetIdx() - 1]
-        atom.SetVector(pos.X, pos.Y, pos.Z)
+        x, y, z = coords[atom.GetIdx() - 1]
+        atom.SetVector(x, y, z)
 
     return mol
 
@@ -0,0 +1,81 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+def get_gaussian_resources(gaussian_input) -> tuple:
+    """Read the resources requested in the resource block of a Gaussian input.
+
+    :param gaussian_input: contents of the Gaussian input file
+    :type gaussian_input: str
+    :return: tuple of number of processors and memory in GB
+    """
+
+    n_processors = int(re.search("%nprocshared=(\d+)", gaussian_input).group(1))
+    ram = int(re.search("%Mem=(\d+)GB", gaussian_input).group(1))
+    return n_processors, ram
+
+
+def pack_jobs(resources, max_processors, max_ram) -> list:
+    """Bin-pack jobs into node-sized packs with the first-fit decreasing heuristic. Jobs are placed \
+    by decreasing number of processors (then memory) into the first pack that still has room for them.
+
+    :param resources: dictionary of job name -> tuple of number of processors and memory in GB
+    :type resources: dict
+    :param max_processors: number of processors of a node
+    :type max_processors: int
+    :param max_ram: memory of a node in GB
+    :type max_ram: int
+    :return: list of packs, each pack is a list of job names
+    """
+
+    packs = []  # list of [used processors, used ram, job names]
+    for name, (n_processors, ram) in sorted(resources.items(), key=lambda item: item[1], reverse=True):
+        for pack in packs:
+            if pack[0] + n_processors <= max_processors and pack[1] + ram <= max_ram:
+                pack[0] += n_processors
+                pack[1] += ram
+                pack[2].append(name)
+                break
+        else:
+            packs.append([n_processors, ram, [name]])
+
+    return [names for _, _, names in packs]
+
+
+def create_pack_commands(base_names, remote_dir, gaussian_command) -> str:
+    """Commands of a submission script that run the Gaussian jobs of a pack concurrently. When a job ends \
+    a '.done' file holding the exit code of Gaussian is written next to its log file, so that finished jobs \
+    can be retrieved while the rest of the pack is still running.
+
+    :param base_names: base names of the Gaussian input files of the pack
+    :type base_names: list
+    :param remote_dir: remote directory of the Gaussian input files
+    :type remote_dir: str
+    :param gaussian_command: Gaussian executable, e.g. 'g16'
+    :type gaussian_command: str
+    :return: str
+    """
+
+    output = ""
+    output += f"# run the code \n" \
+              f"cd {remote_dir}\n"
+    output += f"for input in {' '.join(base_names)}; do\n" \
+              f"    ({gaussian_command} ${{input}}.gjf; echo $? > ${{input}}.done) &\n" \
+              f"done\n" \
+              f"wait\n\n"
+
+    return output
+
+
+def get_done_base_names(connection, remote_dir) -> set:
+    """Base names of the jobs of node packs that have finished on the remote host.
+
+    :param connection: fabric.Connection to the remote host
+    :param remote_dir: remote directory of the jobs
+    :return: set of base names
+    """
+
+    ret = connection.run(f"cd {remote_dir} && ls -1 | grep '\\.done$'", hide=True, warn=True)
+    return {line[:-len(".done")] for line in ret.stdout.splitlines()}
@@ -1,18 +1,263 @@
+from __future__ import annotations
+
+import getpass
 import hashlib
-import pickle
-from contextlib import suppress
+import json
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 import appdirs
-import pymongo
 
+from autoqchem.archive_functions import *
 from autoqchem.db_functions import *
 from autoqchem.gaussian_input_generator import *
 from autoqchem.helper_functions import *
+from autoqchem.job_store import job_store
+from autoqchem.metrics_functions import *
 from autoqchem.openbabel_functions import *
+from autoqchem.packing_functions import *
+from autoqchem.remote_functions import *
+from autoqchem.resubmission_functions import *
+from autoqchem.scheduler_functions import *
 
 logger = logging.getLogger(__name__)
 
 
+def _job_key(job) -> str:
+    """Create the key of a job under management from its molecule, conformation and workflow.
+
+    :param job: slurm_job or lsf_job
+    :return: str
+    """
+
+    return hashlib.md5((job.can + str(job.conformation) +
+                        str(job.max_num_conformers) + ','.join(map(str, job.tasks))).encode()).hexdigest()
+
+
+def _restart_input(job, checkpoints):
+    """Input of an incomplete job restarted from the checkpoint files of its previous submission, \
+    see :py:meth:`~gaussian_input_generator.create_restart_input`.
+
+    :param job: slurm_job or lsf_job
+    :param checkpoints: names of the checkpoint files kept on the remote host
+    :type checkpoints: set
+    :return: str, None if the job cannot be restarted from a checkpoint
+    """
+
+    with open(f"{job.directory}/{job.base_name}.gjf") as f:
+        gaussian_input = f.read()
+    # the input of a job restarted before holds the tasks that remained at that time only
+    n_skipped_tasks = len(job.tasks) - (gaussian_input.count("--Link1--") + 1)
+    restart = create_restart_input(gaussian_input, job.n_success_tasks - n_skipped_tasks)
+    if restart is None or restart[1] not in checkpoints:
+        logger.info(f"Job {job.base_name} cannot be restarted from a checkpoint file.")
+        return None
+
+    logger.info(f"Restarting job {job.base_name} from checkpoint file {restart[1]}, "
+                f"{job.n_success_tasks} of {len(job.tasks)} tasks completed.")
+    return restart[0]
+
+
+def _failure_reason(job) -> tuple:
+    """Classify why a job did not complete from its scheduler state and log file, \
+    see :py:meth:`~resubmission_functions.classify_failure`.
+
+    :param job: slurm_job or lsf_job
+    :return: tuple of the failure reason and the log extractor of the log file (None without log file)
+    """
+
+    log_file = f"{job.directory}/{job.base_name}.log"
+    if not os.path.exists(log_file):
+        return classify_failure(None, job.scheduler_state), None
+
+    le = gaussian_log_extractor(log_file)
+    exception = None
+    try:
+        le.check_for_exceptions()
+    except Exception as e:
+        exception = type(e).__name__
+    return classify_failure(le.log, job.scheduler_state, exception), le
+
+
+def _restarted_tasks(job) -> int:
+    """Number of tasks that completed before a job was restarted from a checkpoint.
+
+    :param job: slurm_job or lsf_job
+    :return: int
+    """
+
+    restart_log = f"{job.directory}/{job.base_name}.restart.log"
+    if not os.path.exists(restart_log):
+        return 0
+    with open(restart_log) as f:
+        return len(re.findall("Normal termination", f.read()))
+
+
+def _merge_restart_log(job) -> None:
+    """Prepend the log of the tasks that completed before a job was restarted from a checkpoint to its \
+    log file, so that the log file covers the whole workflow.
+
+    :param job: slurm_job or lsf_job
+    """
+
+    restart_log = f"{job.directory}/{job.base_name}.restart.log"
+    log_file = f"{job.directory}/{job.base_name}.log"
+    if os.path.exists(restart_log) and os.path.exists(log_file):
+        with open(restart_log, "ab") as dst, open(log_file, "rb") as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(restart_log, log_file)
+
+
+def _prioritize_jobs(jobs, counts, unfinished_statuses) -> list:
+    """Order jobs to submit by priority. Jobs of molecules with the fewest unfinished jobs come first, so that \
+    whole molecules finish and can be uploaded sooner, the jobs of a molecule are kept together.
+
+    :param jobs: dictionary of jobs to submit
+    :type jobs: dict
+    :param counts: list of tuples of status value, canonical smiles and number of jobs, see \
+    :py:meth:`~job_store.job_store.count`
+    :type counts: list
+    :param unfinished_statuses: status values of jobs that have not finished
+    :type unfinished_statuses: list
+    :return: list of job keys
+    """
+
+    unfinished = {}
+    for status, can, n in counts:
+        if status in unfinished_statuses:
+            unfinished[can] = unfinished.get(can, 0) + n
+    return sorted(jobs, key=lambda key: (unfinished.get(jobs[key].can, 0), jobs[key].can, jobs[key].conformation))
+
+
+def _skip_existing_molecules(molecules, gaussian_config, tags=None) -> list:
+    """Molecules that are not yet in the database with the same Gaussian config and max number of conformers, \
+    all molecules are checked with a single query, see :py:meth:`~db_functions.db_check_existing`.
+
+    :param molecules: list of molecule objects
+    :type molecules: list
+    :param gaussian_config: gaussian config dictionary
+    :type gaussian_config: dict
+    :param tags: (optional) metadata tag or tags to attach to the molecules that are already in the database
+    :type tags: str or list
+    :return: list of molecule objects
+    """
+
+    existing = db_check_existing([molecule.can for molecule in molecules], gaussian_config,
+                                 [molecule.max_num_conformers for molecule in molecules])
+    for (can, _), (_, existing_tags) in existing.items():
+        logger.warning(f"Molecule {can} already exists with the same Gaussian config with tags {existing_tags}."
+                       f" Not creating jobs.")
+    if existing and tags is not None:
+        n_tags = db_add_tags(existing, tags)
+        logger.info(f"Attached {n_tags} new tags to {len(existing)} existing molecules.")
+
+    return [molecule for molecule in molecules if (molecule.can, molecule.max_num_conformers) not in existing]
+
+
+def _extract_conformer(log_file) -> tuple:
+    """Extract the descriptors of a conformer from its log file, runs in the worker processes of the upload.
+
+    :param log_file: path to the log file
+    :type log_file: str
+    :return: tuple of the descriptors dictionary and the extraction time in seconds, the log file is read again \
+    when it is written to the database, so that the log files of a batch are not held in memory
+    """
+
+    started = time.time()
+    le = gaussian_log_extractor(log_file)
+    return le.get_descriptors(), time.time() - started
+
+
+def _remove_unused_archives(jobs, archives) -> None:
+    """Remove archives of jobs created in bulk once none of the jobs under management has its inputs in them.
+
+    :param jobs: jobs under management
+    :type jobs: job_store
+    :param archives: paths of the archives of removed jobs
+    :type archives: set
+    """
+
+    archives = set(archive for archive in archives if archive is not None)
+    if not archives:
+        return
+    for job in jobs.values():
+        archives.discard(job.archive)
+        if not archives:
+            return
+    for archive in archives:
+        if os.path.exists(archive):
+            os.remove(archive)
+            logger.info(f"Removed archive {archive}, none of its jobs are under management.")
+
+
+def _record_timings(job, **timings) -> None:
+    """Add durations to the timings of a job, the timings are replaced so that the change is tracked.
+
+    :param job: job
+    :param timings: durations in seconds, e.g. transfer_time=1.5
+    """
+
+    job.timings = {**(job.timings or {}), **timings}
+
+
+def _conformer_geometry(conformation) -> list:
+    """Coordinates of the atoms of an extracted conformer.
+
+    :param conformation: descriptors dictionary of the conformer
+    :type conformation: dict
+    :return: list of x, y, z coordinates of the atoms
+    """
+
+    atoms = conformation['atom_descriptors']
+    return list(zip(atoms['X'], atoms['Y'], atoms['Z']))
+
+
+def _boltzmann_weights(conformations) -> np.ndarray:
+    """Boltzmann weights of conformers from their free energies.
+
+    :param conformations: list of descriptors dictionaries of the conformers
+    :type conformations: list
+    :return: np.ndarray
+    """
+
+    free_energies = np.array(
+        [Hartree_in_kcal_per_mol * c['descriptors']['G'] for c in conformations])  # in kcal_mol
+    free_energies -= free_energies.min()  # to avoid huge exponentials
+    weights = np.exp(-free_energies / (k_in_kcal_per_mol_K * T))
+    return weights / weights.sum()
+
+
+def _batch_groups(groups, max_conformers) -> list:
+    """Split the conformer groups of molecules into batches of at most max_conformers conformers, \
+    a molecule with more conformers forms a batch of its own.
+
+    :param groups: list of tuples of (can, tasks, max_num_conformers) and job keys
+    :type groups: list
+    :param max_conformers: maximum number of conformers per batch
+    :type max_conformers: int
+    :return: list of lists of groups
+    """
+
+    batches, batch, size = [], [], 0
+    for group in groups:
+        if batch and size + len(group[1]) > max_conformers:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(group)
+        size += len(group[1])
+    if batch:
+        batches.append(batch)
+    return batches
+
+
 class slurm_manager(object):
     """Slurm manager class."""
 
@@ -25,42 +270,34 @@ class slurm_manager(object):
         :type host: str
         """
 
-        # set workdir and cache file
+        # set workdir and job store file
         self.workdir = appdirs.user_data_dir(appauthor="autoqchem", appname=host.split('.')[0])
-        self.cache_file = os.path.join(self.workdir, "slurm_manager.pkl")
+        self.cache_file = os.path.join(self.workdir, "slurm_manager.db")
         os.makedirs(self.workdir, exist_ok=True)
 
-        self.jobs = {}  # jobs under management
-
-        # load jobs under management from cache_file (suppress exceptions, no file, empty file, etc.)
-        with suppress(Exception):  # TODO this isn't very safe because may ignore important exceptions
-            with open(self.cache_file, 'rb') as cf:
-                self.jobs = pickle.load(cf)
+        # jobs under management, jobs of the former pickle cache file are migrated into the store,
+        # transitions since the last commit are recovered from the journal
+        self.jobs = job_store(self.cache_file, legacy_cache_file=os.path.join(self.workdir, "slurm_manager.pkl"),
+                              journal_file=os.path.join(self.workdir, "slurm_manager.journal"))
 
         self.host = host
         self.user = user
         self.remote_dir = f"/scratch/{'gpfs' if 'della' in host else 'network'}/{self.user}/gaussian"
         self.connection = None
+        self.resource_model = None  # calibrated resource model, see calibrate_resource_model
+        self.runtimes_fitted = False  # the resource model has been fitted to job runtimes, see fit_runtime_model
 
     def connect(self) -> None:
         """Connect to remote host."""
 
-        create_new_connection = False
-        # check if connection already exists
-        if self.connection is not None:
-            # check if it went stale
-            if not self.connection.is_connected:
-                logger.info(f"Connection got disconnected, reconnecting.")
-                self.connection.close()
-                self.connection = None
-                create_new_connection = True
-        else:
-            logger.info(f"Creating connection to {self.host} as {self.user}")
-            create_new_connection = True
-        if create_new_connection:
-            self.connection = ssh_connect(self.host, self.user)
+        # the connection is shared with the other managers of the host, it is recreated if it went stale
+        connection = get_connection(self.host, self.user)
+        if connection is not self.connection:
+            self.connection = connection
             self.connection.run(f"mkdir -p {self.remote_dir}")
             logger.info(f"Connected to {self.host} as {self.user}.")
+            if self.jobs.unconfirmed:
+                self._reconcile_submissions()
 
     def create_jobs_for_molecule(self,
                                  molecule,
@@ -70,7 +307,9 @@ class slurm_manager(object):
                                  heavy_basis_set="LANL2DZ",
                                  generic_basis_set="genecp",
                                  max_light_atomic_number=36,
-                                 wall_time='23:59:00') -> None:
+                                 wall_time=None,
+                                 skip_existing=False,
+                                 tags=None) -> None:
         """Generate slurm jobs for a molecule. Gaussian input files are also generated.
 
         :param molecule: molecule object
@@ -87,14 +326,16 @@ class slurm_manager(object):
         :type generic_basis_set: str
         :param max_light_atomic_number: maximum atomic number for light elements
         :type max_light_atomic_number: int
-        :param wall_time: wall time of the job in HH:MM:SS format
+        :param wall_time: wall time of the job in HH:MM:SS format, if None the wall time estimated by the \
+        resource model is used, or the slurm wall_time from config.yml if the resource model does not estimate it
         :type wall_time: str
+        :param skip_existing: if True the molecule is skipped if it is already in the database with the same \
+        Gaussian config and max number of conformers
+        :type skip_existing: bool
+        :param tags: (optional) metadata tag or tags attached to the skipped molecule in the database
+        :type tags: str or list
         """
 
-        # create gaussian files
-        molecule_workdir = os.path.join(self.workdir, molecule.fs_name)
-        gig = gaussian_input_generator(molecule, workflow_type, molecule_workdir, theory, light_basis_set,
-                                       heavy_basis_set, generic_basis_set, max_light_atomic_number)
         gaussian_config = {'theory': theory,
                            'light_basis_set': light_basis_set,
                            'heavy_basis_set': heavy_basis_set,
@@ -102,13 +343,17 @@ class slurm_manager(object):
                            'max_light_atomic_number': max_light_atomic_number}
 
         # DB check if the same molecule with the same gaussian configuration already exists
-        # exists, tags = db_check_exists(molecule.can, gaussian_config, molecule.max_num_conformers)
-        # if exists:
-        #     logger.warning(f"Molecule {molecule.can} already exists with the same Gaussian config with tags {tags}."
-        #                    f" Not creating jobs.")
-        #     return
+        if skip_existing and not _skip_existing_molecules([molecule], gaussian_config, tags):
+            return
+
+        # create gaussian files
+        molecule_workdir = os.path.join(self.workdir, molecule.fs_name)
+        gig = gaussian_input_generator(molecule, workflow_type, molecule_workdir, theory, light_basis_set,
+                                       heavy_basis_set, generic_basis_set, max_light_atomic_number,
+                                       resource_model=self._get_resource_model())
 
         gig.create_gaussian_files('slurm')
+        wall_time = wall_time or self._get_wall_time(gig)
 
         # create slurm files
         for gjf_file in glob.glob(f"{molecule_workdir}/*.gjf"):
@@ -126,11 +371,14 @@ class slurm_manager(object):
                             base_name=base_name,  # filesystem basename
                             status=slurm_status.created,
                             n_submissions=0,
-                            n_success_tasks=0)  # status
+                            n_success_tasks=0,
+                            n_processors=gig.resources['n_processors'],
+                            n_atoms=molecule.mol.NumAtoms(),
+                            n_basis=gig.n_basis,
+                            workflow_type=workflow_type)  # status
 
             # create a key for the job
-            key = hashlib.md5((job.can + str(job.conformation) +
-                               str(job.max_num_conformers) + ','.join(map(str, job.tasks))).encode()).hexdigest()
+            key = _job_key(job)
 
             # check if a job like that already exists
             if key in self.jobs:  # a job like that is already present:
@@ -142,92 +390,495 @@ class slurm_manager(object):
             self.jobs[key] = job  # add job to bag
         self._cache()
 
-    def submit_jobs(self) -> None:
-        """Submit jobs that have status 'created' to remote host."""
+    def create_jobs_for_molecules(self,
+                                  molecules,
+                                  archive_name,
+                                  workflow_type="equilibrium",
+                                  theory="APFD",
+                                  light_basis_set="6-31G*",
+                                  heavy_basis_set="LANL2DZ",
+                                  generic_basis_set="genecp",
+                                  max_light_atomic_number=36,
+                                  wall_time=None,
+                                  skip_existing=False,
+                                  tags=None) -> None:
+        """Generate slurm jobs for many molecules at once. Instead of writing a .gjf and a .sh file per conformer, \
+        the Gaussian input files and slurm files are streamed into a single compressed archive with a manifest, \
+        which is shipped and unpacked on the remote host in one transfer when the jobs are submitted.
+
+        :param molecules: list of molecule objects
+        :type molecules: list
+        :param archive_name: name of the archive, it is also used as the local directory of the jobs
+        :type archive_name: str
+        :param workflow_type: Gaussian workflow type, allowed types are: 'equilibrium' or 'transition_state'
+        :type workflow_type: str
+        :param theory: Gaussian theory functional
+        :type theory: str
+        :param light_basis_set: basis set to use for light elements
+        :type light_basis_set: str
+        :param heavy_basis_set: basis set to use for heavy elements
+        :type heavy_basis_set: str
+        :param generic_basis_set: basis set to use for generic elements
+        :type generic_basis_set: str
+        :param max_light_atomic_number: maximum atomic number for light elements
+        :type max_light_atomic_number: int
+        :param wall_time: wall time of the job in HH:MM:SS format, if None the wall time estimated by the \
+        resource model is used, or the slurm wall_time from config.yml if the resource model does not estimate it
+        :type wall_time: str
+        :param skip_existing: if True the molecules that are already in the database with the same \
+        Gaussian config and max number of conformers are skipped, all molecules are checked with a \
+        single query
+        :type skip_existing: bool
+        :param tags: (optional) metadata tag or tags attached to the skipped molecules in the database
+        :type tags: str or list
+        """
+
+        gaussian_config = {'theory': theory,
+                           'light_basis_set': light_basis_set,
+                           'heavy_basis_set': heavy_basis_set,
+                           'generic_basis_set': generic_basis_set,
+                           'max_light_atomic_number': max_light_atomic_number}
+
+        # DB check which of the molecules with the same gaussian configuration already exist
+        if skip_existing:
+            molecules = _skip_existing_molecules(molecules, gaussian_config, tags)
+            if not molecules:
+                return
+
+        directory = os.path.join(self.workdir, archive_name)
+        archive_path = os.path.join(directory, f"{archive_name}.tar.gz")
+        if os.path.exists(archive_path):
+            raise FileExistsError(f"Archive {archive_path} already exists, choose a different archive name.")
+        os.makedirs(directory, exist_ok=True)
+
+        with gaussian_archive(archive_path) as archive:
+            for molecule in molecules:
+                gig = gaussian_input_generator(molecule, workflow_type, directory, theory, light_basis_set,
+                                               heavy_basis_set, generic_basis_set, max_light_atomic_number,
+                                               resource_model=self._get_resource_model())
+
+                gaussian_inputs = list(gig.generate_gaussian_inputs('slurm'))
+                molecule_wall_time = wall_time or self._get_wall_time(gig)
+
+                for base_name, gaussian_input in gaussian_inputs:
+                    # create job structure
+                    job = slurm_job(can=molecule.can,
+                                    conformation=int(base_name.split("_conf_")[1]),
+                                    max_num_conformers=molecule.max_num_conformers,
+                                    tasks=gig.tasks,
+                                    config=gaussian_config,
+                                    job_id=-1,  # job_id (not assigned yet)
+                                    directory=directory,  # filesystem path
+                                    base_name=base_name,  # filesystem basename
+                                    status=slurm_status.created,
+                                    n_submissions=0,
+                                    n_success_tasks=0,
+                                    n_processors=gig.resources['n_processors'],
+                                    n_atoms=molecule.mol.NumAtoms(),
+                                    n_basis=gig.n_basis,
+                                    workflow_type=workflow_type,
+                                    archive=archive_path)  # input files are in the archive
+
+                    key = _job_key(job)
+                    if key in self.jobs:  # a job like that is already present:
+                        logger.warning(f"A job with exactly the same parameters, molecule {job.can}, conformation "
+                                       f"{job.conformation}, workflow {job.tasks} already exists. "
+                                       f"Not creating a duplicate")
+                        continue
+
+                    archive.add_job(base_name,
+                                    {'gjf': gaussian_input,
+                                     'sh': self._create_slurm_script(base_name, gaussian_input,
+                                                                     molecule_wall_time)},
+                                    key=key, can=job.can, conformation=job.conformation)
+                    self.jobs[key] = job  # add job to bag
+        self._cache()
+
+    def submit_jobs(self, array=False, max_concurrent=None, pack=False) -> None:
+        """Submit jobs that have status 'created' to remote host, in order of priority and within the \
+        max_queued_jobs limit of config.yml, see :py:meth:`~slurm_manager.slurm_manager._throttle_jobs`.
+
+        :param array: if True the jobs are submitted as Slurm job arrays instead of one sbatch per job
+        :type array: bool
+        :param max_concurrent: maximum number of simultaneously running tasks of each job array, \
+        if None the slurm array_max_concurrent from config.yml is used
+        :type max_concurrent: int
+        :param pack: if True small jobs are packed into node-sized allocations
+        :type pack: bool
+        """
 
         jobs = self.get_jobs(slurm_status.created)
         logger.info(f"Submitting {len(jobs)} jobs.")
-        self.submit_jobs_from_jobs_dict(jobs)
+        self.submit_jobs_from_jobs_dict(jobs, array, max_concurrent, pack)
 
-    def submit_jobs_from_jobs_dict(self, jobs) -> None:
+    def submit_jobs_from_jobs_dict(self, jobs, array=False, max_concurrent=None, pack=False) -> None:
         """Submit jobs to remote host.
 
         :param jobs: dictionary of jobs to submit
         :type jobs: dict
+        :param array: if True the jobs are submitted as Slurm job arrays instead of one sbatch per job, \
+        see :py:meth:`~slurm_manager.slurm_manager._submit_job_arrays`
+        :type array: bool
+        :param max_concurrent: maximum number of simultaneously running tasks of each job array, \
+        if None the slurm array_max_concurrent from config.yml is used
+        :type max_concurrent: int
+        :param pack: if True small jobs are packed into node-sized allocations that run them concurrently, \
+        see :py:meth:`~slurm_manager.slurm_manager._submit_job_packs`, the remaining jobs are submitted as usual
+        :type pack: bool
         """
 
+        # keep at most max_queued_jobs jobs in the queue, the other jobs are submitted by retrieve_jobs
+        n_jobs = len(jobs)
+        jobs = self._throttle_jobs(jobs)
+        if len(jobs) < n_jobs:
+            self.jobs.set_option('submit_options', {'array': array, 'max_concurrent': max_concurrent, 'pack': pack})
+
         # check if there are any jobs to be submitted
         if jobs:
             # get or create connection
             self.connect()
+            # jobs found on the scheduler by the reconciliation of interrupted submissions are not submitted again
+            jobs = {name: job for name, job in jobs.items() if job.status != slurm_status.submitted}
 
-            # check if jobs are in status created or failed
-            for name, job in jobs.items():
-                # copy .sh and .gjf file to remote_dir
-                self.connection.put(f"{job.directory}/{job.base_name}.sh", self.remote_dir)
-                self.connection.put(f"{job.directory}/{job.base_name}.gjf", self.remote_dir)
+            # ship .sh and .gjf files of the jobs to remote_dir in one transfer, the files of jobs created
+            # in bulk are taken from their archive
+            upload_job_files(self.connection, jobs, self.remote_dir)
+
+            # outputs of previous submissions would be summarized as the outputs of the new submission
+            remove_remote_outputs(self.connection, self.remote_dir,
+                                  [job.base_name for job in jobs.values() if job.n_submissions > 0])
 
+            if pack:
+                jobs = self._submit_job_packs(jobs)
+
+            if array:
+                self._submit_job_arrays(jobs, max_concurrent)
+            else:
+                for name, job in jobs.items():
+                    self.jobs.journal_event('submitting', name, job_name=f"{job.base_name}.sh")
+                    with self.connection.cd(self.remote_dir):
+                        ret = self.connection.run(f"sbatch {self.remote_dir}/{job.base_name}.sh", hide=True)
+                        job.job_id = re.search("job\s*(\d+)\n", ret.stdout).group(1)
+                        job.status = slurm_status.submitted
+                        job.pack = None
+                        job.n_submissions = job.n_submissions + 1
+                        logger.info(f"Submitted job {name}, job_id: {job.job_id}.")
+
+            self._cache()
+
+    def _submit_job_arrays(self, jobs, max_concurrent=None) -> None:
+        """Submit jobs as Slurm job arrays, with a single sbatch per array. Jobs whose submission scripts request \
+        the same resources are grouped into one array. The array script reads the base name of the Gaussian input \
+        of each task from a manifest uploaded next to it, the line of the manifest is given by the array task id. \
+        The job_id of a job is set to 'arrayid_taskid', which is how squeue and sacct report array tasks.
+
+        :param jobs: dictionary of jobs to submit, their input files must already be on the remote host
+        :type jobs: dict
+        :param max_concurrent: maximum number of simultaneously running tasks of each job array, \
+        if None the slurm array_max_concurrent from config.yml is used
+        :type max_concurrent: int
+        """
+
+        if max_concurrent is None:
+            max_concurrent = config['slurm'].get('array_max_concurrent', 0)
+        max_array_size = config['slurm'].get('max_array_size', 1000)
+
+        # group jobs with identical submission scripts (up to the input line)
+        groups = {}
+        for name, script in read_job_files(jobs, "sh").items():
+            array_script = re.sub("^input=.*$",
+                                  lambda m: f'input=$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" '
+                                            f'{self.remote_dir}/{{array_name}}.txt)',
+                                  script, count=1, flags=re.MULTILINE)
+            groups.setdefault(array_script, []).append(name)
+
+        throttle = f"%{max_concurrent}" if max_concurrent else ""
+        prefix = f"array_{time.strftime('%Y%m%d_%H%M%S')}"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, (array_script, names) in enumerate(groups.items()):
+                for start in range(0, len(names), max_array_size):
+                    array_names = names[start:start + max_array_size]
+                    array_name = f"{prefix}_{i}_{start // max_array_size}"
+
+                    # write and upload the manifest of base names and the array script
+                    with open(os.path.join(tmp_dir, f"{array_name}.txt"), "w") as f:
+                        f.write("".join(f"{jobs[name].base_name}\n" for name in array_names))
+                    with open(os.path.join(tmp_dir, f"{array_name}.sh"), "w") as f:
+                        f.write(array_script.replace("{array_name}", array_name))
+                    for ext in ["txt", "sh"]:
+                        self.connection.put(os.path.join(tmp_dir, f"{array_name}.{ext}"), self.remote_dir)
+
+                    for task_id, name in enumerate(array_names):
+                        self.jobs.journal_event('submitting', name, sync=False, job_name=f"{array_name}.sh",
+                                                task=task_id)
+                    self.jobs.sync_journal()
+                    with self.connection.cd(self.remote_dir):
+                        ret = self.connection.run(f"sbatch --array=0-{len(array_names) - 1}{throttle} "
+                                                  f"{self.remote_dir}/{array_name}.sh", hide=True)
+                    array_id = re.search("job\s*(\d+)\n", ret.stdout).group(1)
+
+                    # map array task ids back to the jobs
+                    for task_id, name in enumerate(array_names):
+                        job = jobs[name]
+                        job.job_id = f"{array_id}_{task_id}"
+                        job.status = slurm_status.submitted
+                        job.pack = None
+                        job.n_submissions = job.n_submissions + 1
+                    logger.info(f"Submitted job array {array_id} with {len(array_names)} jobs.")
+
+    def _submit_job_packs(self, jobs) -> dict:
+        """Pack small jobs into node-sized allocations and submit each pack with a single sbatch. Jobs requesting \
+        at most pack_max_job_processors processors (config.yml) are bin-packed by the processors and memory \
+        of their Gaussian resource block into packs that fit on one node, the script of a pack runs its jobs \
+        concurrently. All jobs of a pack share the job_id of the pack and keep their own status, \
+        a job is retrieved as soon as it has finished, even if other jobs of its pack are still running.
+
+        :param jobs: dictionary of jobs to submit, their input files must already be on the remote host
+        :type jobs: dict
+        :return: dict of jobs that were not packed
+        """
+
+        max_job_processors = config['slurm'].get('pack_max_job_processors', 4)
+        max_processors = config['slurm']['max_processors']
+        max_ram = config['slurm'].get('max_ram', max_processors * config['slurm']['ram_per_processor'])
+
+        gaussian_inputs = read_job_files(jobs, "gjf")
+        resources = {name: get_gaussian_resources(gaussian_input) for name, gaussian_input in gaussian_inputs.items()}
+        packs = pack_jobs({name: r for name, r in resources.items() if r[0] <= max_job_processors},
+                          max_processors, max_ram)
+        packs = [names for names in packs if len(names) > 1]  # a pack of a single job is submitted as usual
+        if not packs:
+            return jobs
+
+        scripts = read_job_files({name: jobs[name] for names in packs for name in names}, "sh")
+        prefix = f"pack_{time.strftime('%Y%m%d_%H%M%S')}"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, names in enumerate(packs):
+                pack_name = f"{prefix}_{i}"
+                wall_time = max((re.search("#SBATCH -t (\S+)", scripts[name]).group(1) for name in names),
+                                key=parse_wall_time)
+
+                script = self._create_slurm_header(sum(resources[name][0] for name in names),
+                                                   sum(resources[name][1] for name in names),
+                                                   wall_time)
+                script += create_pack_commands([jobs[name].base_name for name in names], self.remote_dir, "g16")
+                with open(os.path.join(tmp_dir, f"{pack_name}.sh"), "w") as f:
+                    f.write(script)
+                self.connection.put(os.path.join(tmp_dir, f"{pack_name}.sh"), self.remote_dir)
+
+                # remove .done files left over from earlier submissions of the jobs
+                done_files = " ".join(f"{jobs[name].base_name}.done" for name in names)
+                for name in names:
+                    self.jobs.journal_event('submitting', name, sync=False, job_name=f"{pack_name}.sh", pack=pack_name)
+                self.jobs.sync_journal()
                 with self.connection.cd(self.remote_dir):
-                    ret = self.connection.run(f"sbatch {self.remote_dir}/{job.base_name}.sh", hide=True)
-                    job.job_id = re.search("job\s*(\d+)\n", ret.stdout).group(1)
+                    ret = self.connection.run(f"rm -f {done_files} && sbatch {self.remote_dir}/{pack_name}.sh", hide=True)
+                pack_id = re.search("job\s*(\d+)\n", ret.stdout).group(1)
+
+                for name in names:
+                    job = jobs[name]
+                    job.job_id = pack_id
                     job.status = slurm_status.submitted
                     job.n_submissions = job.n_submissions + 1
-                    logger.info(f"Submitted job {name}, job_id: {job.job_id}.")
+                    job.pack = pack_name
+                logger.info(f"Submitted node pack {pack_name} with {len(names)} jobs, job_id: {pack_id}.")
 
-            self._cache()
+        packed = set(name for names in packs for name in names)
+        return {name: job for name, job in jobs.items() if name not in packed}
 
     def retrieve_jobs(self) -> None:
         """Retrieve finished jobs from remote host and check which finished succesfully and which failed."""
 
-        ids_to_check = [j.job_id for j in self.get_jobs(slurm_status.submitted).values()]
+        submitted_jobs = self.get_jobs(slurm_status.submitted)
+        ids_to_check = [j.job_id for j in submitted_jobs.values()]
         if not ids_to_check:
             logger.info(f"There are no jobs submitted to cluster. Nothing to retrieve.")
+            self._top_up_queue()
             return
 
         # get or create connection
         self.connect()
 
-        # retrieve job ids that are running on the server
-        ret = self.connection.run(f"squeue -u {self.user} -o %A,%T", hide=True)
-        user_running_ids = [s.split(',')[0] for s in ret.stdout.splitlines()[1:]]
-        running_ids = [id for id in user_running_ids if id in ids_to_check]
+        # query the state of the submitted jobs only, jobs unknown to the scheduler have finished
+        ids_to_check = list(dict.fromkeys(map(str, ids_to_check)))
+        try:
+            states = query_slurm_jobs(self.connection, ids_to_check,
+                                      chunk_size=config['slurm'].get('status_chunk_size', 500))
+        except SchedulerQueryException as e:
+            logger.warning(f"Skipping retrieval, the state of the jobs is unknown: {e}")
+            return
+        running_ids = [id for id in ids_to_check if id in states and states[id]['outcome'] == 'running']
         finished_ids = [id for id in ids_to_check if id not in running_ids]
 
         logger.info(f"There are {len(running_ids)} running/pending jobs, {len(finished_ids)} finished jobs.")
 
+        # jobs of node packs that are still running are finished when their .done file exists
+        done_base_names = set()
+        if any(job.pack is not None for job in submitted_jobs.values()):
+            done_base_names = get_done_base_names(self.connection, self.remote_dir)
+
         # get finished jobs
-        finished_jobs = {name: job for name, job in self.jobs.items() if job.job_id in finished_ids}
+        finished_jobs = {name: job for name, job in submitted_jobs.items()
+                         if str(job.job_id) in finished_ids or
+                         (job.pack is not None and job.base_name in done_base_names)}
         done_jobs = 0
 
-        if finished_jobs:
+        # record how the jobs ended, jobs of node packs that are still running keep no state
+        for job in finished_jobs.values():
+            state = states.get(str(job.job_id), {})
+            if state.get('outcome') == 'running':
+                state = {}
+            job.scheduler_state, job.exit_code, job.elapsed = state.get('state'), state.get('exit_code'), \
+                state.get('elapsed')
+
+        # jobs that ended without running (e.g. cancelled while pending) have no log file to fetch
+        not_started = {name: job for name, job in finished_jobs.items()
+                       if job.pack is None and job.elapsed == 0 and
+                       slurm_outcome(job.scheduler_state, job.exit_code) != 'completed'}
+        for job in not_started.values():
+            # jobs that lost their node or were preempted are resubmitted
+            job.failure_reason = classify_failure(None, job.scheduler_state)
+            if job.failure_reason in retriable_failures:
+                job.status = slurm_status.incomplete
+                logger.warning(f"Job {job.base_name} incomplete - {job.scheduler_state} before it started. "
+                               f"Resubmit job.")
+            else:
+                job.status = slurm_status.failed
+                logger.warning(f"Job {job.base_name} failed - {job.scheduler_state} before it started. "
+                               f"Cannot resubmit.")
+
+        if len(finished_jobs) > len(not_started):
             logger.info(f"Retrieving log files of finished jobs.")
-            for job in finished_jobs.values():
-                status = self._retrieve_single_job(job)
+            fetched_jobs = {name: job for name, job in finished_jobs.items() if name not in not_started}
+            transfer_time, started = 0., time.time()  # time spent waiting for the log files
+            for job, fetched, summary in self._fetch_log_files(fetched_jobs):
+                transfer_time += time.time() - started
+                # log files that could not be fetched in bulk are tried one by one
+                status = self._retrieve_single_job(job, fetch=not fetched, summary=summary)
                 if status.value == slurm_status.done.value:
                     done_jobs += 1
+                elif job.scheduler_state is not None:
+                    logger.info(f"Job {job.base_name} ended with scheduler state {job.scheduler_state}, "
+                                f"exit code {job.exit_code} after {job.elapsed} s.")
+                started = time.time()
+            for job in fetched_jobs.values():
+                _record_timings(job, transfer_time=transfer_time / len(fetched_jobs))
 
+        if finished_jobs:
             self._cache()
             logger.info(f"{done_jobs} jobs finished successfully (all Gaussian steps finished normally)."
                         f" {len(finished_jobs) - done_jobs} jobs failed.")
 
-    def _retrieve_single_job(self, job) -> slurm_status:
+        # submit jobs that waited for free slots of the queue
+        if finished_jobs:
+            self._top_up_queue()
+
+    def _fetch_log_files(self, jobs):
+        """Fetch log files of finished jobs. With remote_extraction enabled in config.yml the log files are \
+        summarized and compressed on the remote host and only the summaries are fetched, the log files are fetched \
+        later when they are needed. Otherwise the log files are fetched in one transfer as an archive, \
+        if that is disabled (bulk_transfer in config.yml) or fails, e.g. because of the remote quota, \
+        they are downloaded concurrently over several SFTP channels and each job is yielded as soon as its \
+        log file has landed.
+
+        :param jobs: dictionary of finished jobs
+        :type jobs: dict
+        :return: generator of tuples of job, bool (True if the log file of the job has been fetched) \
+        and the summary of the log file extracted on the remote host (None without remote extraction)
+        """
+
+        if config['slurm'].get('remote_extraction', False):
+            try:
+                summaries = extract_remote_summaries(self.connection, self.remote_dir,
+                                                     {job.base_name: job.directory for job in jobs.values()},
+                                                     config['slurm'].get('remote_python', "python3"))
+            except Exception as e:
+                logger.warning(f"Remote extraction of log files failed ({e}), fetching the log files.")
+            else:
+                for job in jobs.values():
+                    yield job, False, summaries.get(job.base_name)
+                return
+
+        jobs_by_log = {f"{job.base_name}.log": job for job in jobs.values()}
+        local_dirs = {log: job.directory for log, job in jobs_by_log.items()}
+
+        if config['slurm'].get('bulk_transfer', True):
+            try:
+                fetched = download_files(self.connection, self.remote_dir, local_dirs)
+            except Exception as e:
+                logger.warning(f"Bulk transfer of log files failed ({e}), downloading them concurrently.")
+            else:
+                for log, job in jobs_by_log.items():
+                    yield job, log in fetched, None
+                return
+
+        for log, error in sftp_download_files(self.connection, self.remote_dir, local_dirs,
+                                              max_workers=config['slurm'].get('transfer_workers', 8),
+                                              retries=config['slurm'].get('transfer_retries', 3)):
+            if error is not None and not isinstance(error, FileNotFoundError):
+                logger.warning(f"Could not download {log}: {error}")
+            yield jobs_by_log[log], error is None, None
+
+    def _fetch_missing_logs(self, jobs) -> None:
+        """Fetch log files of jobs that have been retrieved with remote extraction, the log files were \
+        compressed on the remote host and are fetched in one transfer.
+
+        :param jobs: dictionary of jobs
+        :type jobs: dict
+        """
+
+        missing = {job.base_name: job.directory for job in jobs.values()
+                   if not os.path.exists(f"{job.directory}/{job.base_name}.log")}
+        if missing:
+            self.connect()
+            fetched = fetch_compressed_logs(self.connection, self.remote_dir, missing)
+            for job in jobs.values():
+                if job.base_name in fetched:
+                    _merge_restart_log(job)
+            logger.info(f"Fetched {len(fetched)} / {len(missing)} compressed log files.")
+
+    def _retrieve_single_job(self, job, fetch=True, summary=None) -> slurm_status:
         """Retrieve single job from remote host and check its status
 
         :param job: job
+        :param fetch: if False the log file has already been fetched to the job directory
+        :type fetch: bool
+        :param summary: summary of the log file extracted on the remote host, if given the status is \
+        decided from the summary and the log file is not fetched
+        :type summary: dict
         :return: :py:meth:`~helper_classes.helper_classes.slurm_status`, resulting status
         """
 
+        log, exception = None, None
         try:  # try to fetch the file
-            log_file = self.connection.get(f"{self.remote_dir}/{job.base_name}.log",
-                                           local=f"{job.directory}/{job.base_name}.log")
+            log_file = f"{job.directory}/{job.base_name}.log"
+            if summary is not None:
+                # the log file stays compressed on the remote host until it is needed, see _fetch_missing_logs
+                if os.path.exists(log_file):
+                    os.remove(log_file)  # log file of a previous submission
+                if summary['log_missing']:
+                    raise FileNotFoundError(log_file)
+                n_tasks, check_for_exceptions = summary['n_tasks'] + _restarted_tasks(job), \
+                    lambda: raise_summary_exception(summary)
+                exception = summary['exception']
+            else:
+                if fetch:
+                    self.connection.get(f"{self.remote_dir}/{job.base_name}.log", local=log_file)
+                _merge_restart_log(job)
 
-            # initialize the log extractor, it will try to read basic info from the file
-            le = gaussian_log_extractor(log_file.local)
-            if len(job.tasks) == le.n_tasks:
+                # initialize the log extractor, it will try to read basic info from the file
+                le = gaussian_log_extractor(log_file)
+                n_tasks, check_for_exceptions = le.n_tasks, le.check_for_exceptions
+                log = le.log
+            job.n_success_tasks = n_tasks
+
+            if len(job.tasks) == n_tasks:
                 job.status = slurm_status.done
+                if job.elapsed is None and summary is None:  # the scheduler does not report run times
+                    job.elapsed = le.get_run_statistics()['elapsed_time']
             else:
                 try:  # look for more specific exception
-                    le.check_for_exceptions()
+                    check_for_exceptions()
 
                 except NoGeometryException:
                     job.status = slurm_status.failed
@@ -235,11 +886,13 @@ class slurm_manager(object):
                         f"Job {job.base_name} failed - the log file does not contain geometry. Cannot resubmit.")
 
                 except NegativeFrequencyException:
+                    exception = 'NegativeFrequencyException'
                     job.status = slurm_status.incomplete
                     logger.warning(
                         f"Job {job.base_name} incomplete - log file contains negative frequencies. Resubmit job.")
 
                 except OptimizationIncompleteException:
+                    exception = 'OptimizationIncompleteException'
                     job.status = slurm_status.incomplete
                     logger.warning(f"Job {job.base_name} incomplete - geometry optimization did not complete.")
 
@@ -255,25 +908,54 @@ class slurm_manager(object):
             job.status = slurm_status.failed
             logger.warning(f"Job {job.base_name} failed  - could not retrieve log file. Cannot resubmit.")
 
+        # jobs that ran out of time or memory, lost their node or did not converge the SCF are resubmitted
+        # even without geometry
+        job.failure_reason = None
+        if job.status.value != slurm_status.done.value:
+            job.failure_reason = classify_failure(log, job.scheduler_state, exception)
+            if job.status.value == slurm_status.failed.value and job.failure_reason in retriable_failures:
+                job.status = slurm_status.incomplete
+                logger.warning(f"Job {job.base_name} incomplete - {job.failure_reason.replace('_', ' ')}. "
+                               f"Resubmit job.")
+
         # clean up files on the remote site - do not cleanup anything, the /scratch/network cleans
         # up files that are older than 15 days
 
         return job.status
 
-    def resubmit_incomplete_jobs(self, wall_time="24:59:00") -> None:
+    def resubmit_incomplete_jobs(self, wall_time="24:59:00", restart=False) -> None:
         """Resubmit jobs that are incomplete. If the job has failed because the optimization has not completed \
         and a log file has been retrieved, then \
-        the last geometry will be used for the next submission. For failed jobs \
+        the last geometry will be used for the next submission. The resubmission depends on why the job did not \
+        complete (see :py:meth:`~resubmission_functions.decide_resubmission`): jobs that ran out of time get more \
+        wall time and then more processors, jobs that ran out of memory more memory, SCF convergence failures \
+        are retried with scf=qc and saddle points from a geometry displaced along the imaginary mode. Each \
+        decision is recorded in the resubmissions of the job, jobs that would fail the same way again are \
+        marked failed. For failed jobs \
          the job input files will need to be fixed manually and submitted using the \
         function :py:meth:`~slurm_manager.slurm_manager.submit_jobs_from_jobs_dict`.\
          Maximum number of allowed submission of the same job is 3.
 
-        :param wall_time: wall time of the job in HH:MM:SS format
+        :param wall_time: maximum wall time of a resubmitted job in HH:MM:SS format, jobs that ran out of time \
+        get their wall time escalated up to it
+        :param restart: if True jobs are restarted from the checkpoint files of their previous submission, \
+        skipping the tasks that completed and continuing an interrupted optimization (opt=Restart), \
+        jobs that cannot be restarted from a checkpoint are resubmitted from their last geometry
+        :type restart: bool
         :return: None
         """
 
         incomplete_jobs = self.get_jobs(slurm_status.incomplete)
         incomplete_jobs_to_resubmit = {}
+        self._fetch_missing_logs(incomplete_jobs)
+        checkpoints = self._get_checkpoints() if restart and incomplete_jobs else set()
+        limits = {'max_processors': config['slurm']['max_processors'],
+                  'max_ram': config['slurm'].get('max_ram', config['slurm']['max_processors'] *
+                                               config['slurm']['ram_per_processor']),
+                  'max_wall_time': parse_wall_time(wall_time),
+                  'wall_time_factor': config['slurm'].get('resubmit_wall_time_factor', 2),
+                  'ram_factor': config['slurm'].get('resubmit_ram_factor', 2),
+                  'displacement': config['slurm'].get('resubmit_displacement', 0.1)}
 
         if not incomplete_jobs:
             logger.info("There are no incomplete jobs to resubmit.")
@@ -285,62 +967,123 @@ class slurm_manager(object):
                 logger.warning(f"Job {job.base_name} has been already failed 3 times, not submitting again.")
                 continue
 
+            # input files of jobs created in bulk are in an archive, extract them to be edited
+            if job.archive is not None:
+                extract_from_archive(job.archive, [f"{job.base_name}.gjf", f"{job.base_name}.sh"], job.directory)
+                job.archive = None
+
             job_log = f"{job.directory}/{job.base_name}.log"
             job_gjf = f"{job.directory}/{job.base_name}.gjf"
+            job_sh = f"{job.directory}/{job.base_name}.sh"
 
-            # replace geometry
-            le = gaussian_log_extractor(job_log)
-            le.get_atom_labels()
-            le.get_geometry()
-            # old coords block
-            with open(job_gjf, "r") as f:
-                file_string = f.read()
-            old_coords_block = re.search(f"\w+\s+({float_or_int_regex})"
-                                         f"\s+({float_or_int_regex})"
-                                         f"\s+({float_or_int_regex}).*?\n\n",
-                                         file_string, re.DOTALL).group(0)
-
-            # new coords block
-            coords = le.geom[list('XYZ')].applymap(lambda x: f"{x:.6f}")
-            coords.insert(0, 'Atom', le.labels)
-            coords_block = "\n".join(map(" ".join, coords.values)) + "\n\n"
-
-            # make sure they are the same length and replace
-            assert len(old_coords_block.splitlines()) == len(coords_block.splitlines())
-            file_string = file_string.replace(old_coords_block, coords_block)
-            with open(job_gjf, "w") as f:
-                f.write(file_string)
-
-            logger.info("Substituting last checked geometry in the new input file.")
+            # decide how to resubmit the job from the reason it did not complete
+            job.failure_reason, le = _failure_reason(job)
+            with open(job_gjf) as f:
+                n_processors, ram = get_gaussian_resources(f.read())
+            with open(job_sh) as f:
+                job_wall_time = parse_wall_time(re.search("#SBATCH -t (\S+)", f.read()).group(1))
+            decision = decide_resubmission(job.failure_reason,
+                                           {'n_processors': n_processors, 'ram': ram, 'wall_time': job_wall_time},
+                                           limits, job.resubmissions)
+            job.resubmissions = (job.resubmissions or []) + [decision]
+            job.n_processors = decision['n_processors']
+            if decision['action'] == 'give_up':
+                job.status = slurm_status.failed
+                logger.warning(f"Job {job.base_name} failed - {job.failure_reason.replace('_', ' ')}, "
+                               f"a resubmission would fail the same way. Not submitting again.")
+                continue
 
-            # replacing wall time
-            job_sh = f"{job.directory}/{job.base_name}.sh"
-            with open(job_sh, "r") as f:
-                file_string = f.read()
-            old_wall_time = re.search(f"#SBATCH -t (\d\d:\d\d:\d\d)", file_string).group(1)
-            file_string = file_string.replace(old_wall_time, wall_time)
+            # the log of the completed tasks is kept, a job without log file is started again
+            restart_input = None
+            if restart and decision['restart']:
+                if os.path.exists(job_log):
+                    restart_input = _restart_input(job, checkpoints)
+                else:
+                    logger.info(f"Job {job.base_name} has no log file, it cannot be restarted from a checkpoint file.")
+            if restart_input is not None:
+                # keep the input of the whole workflow and the log of the completed tasks, the log of the
+                # restarted tasks is appended to it when the job is retrieved
+                if not os.path.exists(f"{job.directory}/{job.base_name}.workflow.gjf"):
+                    shutil.copy(job_gjf, f"{job.directory}/{job.base_name}.workflow.gjf")
+                with open(job_gjf, "w") as f:
+                    f.write(restart_input)
+                os.replace(job_log, f"{job.directory}/{job.base_name}.restart.log")
+            else:
+                # start the whole workflow again
+                if os.path.exists(f"{job.directory}/{job.base_name}.workflow.gjf"):
+                    os.replace(f"{job.directory}/{job.base_name}.workflow.gjf", job_gjf)
+                if os.path.exists(f"{job.directory}/{job.base_name}.restart.log"):
+                    os.remove(f"{job.directory}/{job.base_name}.restart.log")
+
+            if restart_input is None and hasattr(le, 'labels') and hasattr(le, 'geom'):
+                # replace geometry, the log extractor has read the last geometry
+                # old coords block
+                with open(job_gjf, "r") as f:
+                    file_string = f.read()
+                old_coords_block = re.search(f"\w+\s+({float_or_int_regex})"
+                                             f"\s+({float_or_int_regex})"
+                                             f"\s+({float_or_int_regex}).*?\n\n",
+                                             file_string, re.DOTALL).group(0)
+
+                # new coords block, displaced along the imaginary mode of a saddle point
+                coords = le.geom[list('XYZ')]
+                if decision['action'] == 'perturb_geometry' and le.modes is not None:
+                    mode = le.modes['Frequencies'].idxmin()
+                    vectors = le.mode_vectors[le.mode_vectors['mode_number'] == mode]
+                    mode_vectors = list(zip(*(vectors[vectors['axis'] == axis]['value'] for axis in 'XYZ')))
+                    coords = pd.DataFrame(displace_geometry(coords.values.tolist(), mode_vectors,
+                                                            decision['displacement']), columns=list('XYZ'))
+                    logger.info(f"Displacing the geometry by {decision['displacement']} Angstrom "
+                                f"along the imaginary mode.")
+                coords = coords.applymap(lambda x: f"{x:.6f}")
+                coords.insert(0, 'Atom', le.labels)
+                coords_block = "\n".join(map(" ".join, coords.values)) + "\n\n"
+
+                # make sure they are the same length and replace
+                assert len(old_coords_block.splitlines()) == len(coords_block.splitlines())
+                file_string = file_string.replace(old_coords_block, coords_block)
+                with open(job_gjf, "w") as f:
+                    f.write(file_string)
+
+                logger.info("Substituting last checked geometry in the new input file.")
+
+            # resources of the resubmission
+            with open(job_gjf) as f:
+                gaussian_input = set_gaussian_resources(f.read(), decision['n_processors'], decision['ram'])
+            if decision['action'] == 'scf_qc':
+                gaussian_input = use_scf_qc(gaussian_input)
+            with open(job_gjf, "w") as f:
+                f.write(gaussian_input)
             with open(job_sh, "w") as f:
-                f.write(file_string)
+                f.write(self._create_slurm_script(job.base_name, gaussian_input,
+                                                  format_wall_time(decision['wall_time'], 'slurm')))
             convert_crlf_to_lf(job_sh)
 
-            logger.info(f"Substituting wall_time with new value: {wall_time}")
+            logger.info(f"Resubmitting job {job.base_name} ({job.failure_reason}): {decision['action']}, "
+                        f"{decision['n_processors']} processors, {decision['ram']}GB memory, "
+                        f"{format_wall_time(decision['wall_time'], 'slurm')} wall time.")
             incomplete_jobs_to_resubmit[key] = job
 
         self.submit_jobs_from_jobs_dict(incomplete_jobs_to_resubmit)
 
     def upload_done_molecules_to_db(self, tags, cls="", subcls="",
-                                    type="", subtype="", RMSD_threshold=0.01, symmetry=True) -> None:
+                                    type="", subtype="", RMSD_threshold=0.01, symmetry=True, fetch_logs=True) -> None:
 
         """Upload done molecules to db. Molecules are considered done when all jobs for a given \
-         smiles are in 'done' status. The conformers are deduplicated and uploaded to database using a metadata tag.
+         smiles are in 'done' status. The conformers are deduplicated and uploaded to database using a metadata tag. \
+         Descriptors are extracted in a process pool (upload_workers of config.yml) and the molecules are written \
+         in batches of at most upload_chunk_size conformers, while one batch is written the next one is extracted.
 
-        :param tag: metadata tag to use for these molecules in the database
-        :type tag: str
+        :param tag: metadata tag or tags to use for these molecules in the database
+        :type tag: str or list
         :param RMSD_threshold: RMSD threshold (in Angstroms) to use when deduplicating multiple conformers \
         after Gaussian has found optimal geometry
         :type RMSD_threshold: float
         :param symmetry: if True symmetry is taken into account when comparing molecules in OBAlign(symmetry=True)
         :type symmetry: bool
+        :param fetch_logs: if True log files left compressed on the remote host by remote extraction are fetched, \
+        if False the upload does not use the connection and molecules without log files are not uploaded
+        :type fetch_logs: bool
         """
 
         done_jobs = self.get_jobs(slurm_status.done)
@@ -361,84 +1104,110 @@ class slurm_manager(object):
 
         # select jobs for done molecules
         done_can_jobs = self.get_jobs(can=done_cans)
+        if fetch_logs:
+            self._fetch_missing_logs(done_can_jobs)
         jobs_df = pd.DataFrame([job.__dict__ for job in done_can_jobs.values()], index=done_can_jobs.keys())
 
+        # check if the tag(s) are properly provided
+        assert isinstance(tags, (str, list))
+        tags = [tags] if isinstance(tags, str) else tags
+        assert all(len(t.strip()) > 0 for t in tags)
+
         logger.debug(f"Deduplicating conformers if RMSD < {RMSD_threshold}.")
         meta = {"class": cls, "subclass": subcls, "type": type, "subtype": subtype}
 
-        for (can, tasks, max_n_conf), keys in jobs_df.groupby(["can", "tasks", "max_num_conformers"]).groups.items():
+        groups = list(jobs_df.groupby(["can", "tasks", "max_num_conformers"]).groups.items())
+        batches = _batch_groups(groups, config['mongoDB'].get('upload_chunk_size', 500))
+        n_workers = config['mongoDB'].get('upload_workers', 0) or os.cpu_count()
+
+        # descriptors of the next batch are extracted while the current batch is deduplicated and written
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            extractions = self._extract_batch(executor, batches[0])
+            for i, batch in enumerate(batches):
+                next_extractions = self._extract_batch(executor, batches[i + 1]) if i + 1 < len(batches) else {}
+                self._upload_batch(batch, extractions, tags, meta, RMSD_threshold, symmetry)
+                extractions = next_extractions
+
+    def _extract_batch(self, executor, batch) -> dict:
+        """Submit the descriptor extraction of the conformers of a batch of molecules to the worker processes.
+
+        :param executor: process pool of the upload
+        :type executor: concurrent.futures.ProcessPoolExecutor
+        :param batch: list of tuples of (can, tasks, max_num_conformers) and job keys
+        :type batch: list
+        :return: dict of job key -> future of the descriptors and the extraction time
+        """
+
+        return {key: executor.submit(_extract_conformer, f"{self.jobs[key].directory}/{self.jobs[key].base_name}.log")
+                for _, keys in batch for key in keys}
+
+    def _upload_batch(self, batch, extractions, tags, meta, RMSD_threshold, symmetry) -> None:
+        """Deduplicate the conformers of a batch of molecules and upload them to database in bulk. The jobs \
+        of the uploaded conformers are marked uploaded in one transaction of the job store once the write \
+        has succeeded, the jobs of molecules that could not be extracted remain done.
+
+        :param batch: list of tuples of (can, tasks, max_num_conformers) and job keys
+        :type batch: list
+        :param extractions: dict of job key -> future of the descriptors and the extraction time
+        :type extractions: dict
+        :param tags: metadata tags
+        :type tags: list
+        :param meta: classification metadata of the molecules
+        :type meta: dict
+        :param RMSD_threshold: RMSD threshold (in Angstroms) to use when deduplicating conformers
+        :type RMSD_threshold: float
+        :param symmetry: if True symmetry is taken into account when comparing molecules
+        :type symmetry: bool
+        """
+
+        molecules = []
+        uploaded_keys = []
+        for (can, tasks, max_conf), keys in batch:
+            try:
+                extracted = {key: extractions[key].result() for key in keys}
+            except Exception as e:
+                logger.error(f"Descriptors could not be extracted for smiles: {can}, {e}. Skipping.")
+                continue
 
             if len(keys) > 1:
                 # deduplicate conformers
-                mols = [OBMol_from_done_slurm_job(done_jobs[key]) for key in keys]
+                mols = [OBMol_from_can_and_geometry(can, _conformer_geometry(extracted[key][0])) for key in keys]
                 duplicates = deduplicate_list_of_OBMols(mols, RMSD_threshold=RMSD_threshold, symmetry=symmetry)
                 logger.info(f"Molecule {can} has {len(duplicates)} / {len(keys)} duplicate conformers.")
 
                 # fetch non-duplicate keys
-                can_keys_to_keep = [key for i, key in enumerate(keys) if i not in duplicates]
-            else:
-                can_keys_to_keep = keys
-            self._upload_can_to_db(can, tasks, meta, can_keys_to_keep, tags, max_n_conf)
-
-    def _upload_can_to_db(self, can, tasks, meta, keys, tags, max_conf) -> None:
-        """Uploading single molecule conformers to database.
-
-        :param db: database client
-        :type db: pymongo.MongoClient
-        :param can: canonical smiles
-        :type can: str
-        :param tasks: tuple of Gaussian tasks
-        :type tasks: tuple
-        :param keys: list of keys to the self.jobs dictionary to upload
-        :type keys: list
-        :param tags: metadata tag or tags
-        :type tags: str or list
-        :param max_conf: max number of conformers used for this molecule
-        :type max_conf: int
-        """
+                keys = [key for i, key in enumerate(keys) if i not in duplicates]
 
-        # check if the tag(s) are properly provided
-        assert isinstance(tags, (str, list))
-        if isinstance(tags, str):
-            tags = [tags]
-        assert all(len(t.strip()) > 0 for t in tags)
+            # check that all configs are the same
+            configs = [self.jobs[key].config for key in keys]
+            assert len(set([config.__repr__() for config in configs])) == 1
+            metadata = {'gaussian_config': configs[0], 'gaussian_tasks': tasks, 'max_num_conformers': max_conf}
+            metadata.update(meta)
 
-        # loop over the conformers
-        conformations = []
-        logs = []
-        configs = []
-        for key in keys:
-            # fetch job, verify that there are not can issues (just in case)
-            job = self.jobs[key]
-            assert job.can == can
-
-            # append job configs
-            configs.append(job.config)
-
-            # extract descriptors for this conformer from log file
-            log = f"{job.directory}/{job.base_name}.log"
-            le = gaussian_log_extractor(log)
-            # add descriptors to conformations list
-            conformations.append(le.get_descriptors())
-            logs.append(le.log)
-
-        # compute weights
-        free_energies = np.array(
-            [Hartree_in_kcal_per_mol * c['descriptors']['G'] for c in conformations])  # in kcal_mol
-        free_energies -= free_energies.min()  # to avoid huge exponentials
-        weights = np.exp(-free_energies / (k_in_kcal_per_mol_K * T))
-        weights /= weights.sum()
-
-        # check that all configs are the same
-        assert len(set([config.__repr__() for config in configs])) == 1
-        metadata = {'gaussian_config': configs[0], 'gaussian_tasks': tasks, 'max_num_conformers': max_conf}
-        metadata.update(meta)
-
-        mol_id = db_upload_molecule(can, tags, metadata, weights, conformations, logs)
-        logger.info(f"Uploaded descriptors to DB for smiles: {can}, number of conformers: {len(conformations)},"
-                    f" DB molecule id {mol_id}.")
-        for key in keys:
-            self.jobs[key].status = slurm_status.uploaded
+            for key in extracted:
+                _record_timings(self.jobs[key], extraction_time=extracted[key][1])
+
+            conformations = [extracted[key][0] for key in keys]
+            molecules.append({'can': can, 'tags': tags, 'metadata': metadata,
+                              'weights': _boltzmann_weights(conformations), 'conformations': conformations,
+                              'log_files': [f"{self.jobs[key].directory}/{self.jobs[key].base_name}.log"
+                                            for key in keys]})
+            uploaded_keys.append(keys)
+
+        if not molecules:
+            return
+
+        started = time.time()
+        mol_ids = db_upload_molecules(molecules, chunk_size=config['mongoDB'].get('upload_chunk_size', 500))
+        upload_time = (time.time() - started) / sum(len(keys) for keys in uploaded_keys)
+        for molecule, mol_id in zip(molecules, mol_ids):
+            logger.info(f"Uploaded descriptors to DB for smiles: {molecule['can']}, "
+                        f"number of conformers: {len(molecule['conformations'])}, DB molecule id {mol_id}.")
+
+        for keys in uploaded_keys:
+            for key in keys:
+                _record_timings(self.jobs[key], upload_time=upload_time)
+                self.jobs[key].status = slurm_status.uploaded
         self._cache()
 
     def get_jobs(self, status=None, can=None) -> dict:
@@ -451,17 +1220,7 @@ class slurm_manager(object):
         :return: dict
         """
 
-        def match(job, status, can):
-            match = True
-            if status is not None:
-                match = match and job.status.value == status.value
-            if can is not None:
-                if isinstance(can, str):
-                    can = [can]
-                match = match and (job.can in can)
-            return match
-
-        return {name: job for name, job in self.jobs.items() if match(job, status, can)}
+        return self.jobs.select(status=status, can=can)
 
     def get_job_stats(self, split_by_can=False) -> pd.DataFrame:
         """Job stats for jobs currently under management, optionally split by canonical smiles.
@@ -471,11 +1230,61 @@ class slurm_manager(object):
         :return: pandas.core.frame.DataFrame
         """
 
-        df = pd.DataFrame([[v.status.name, v.can] for v in self.jobs.values()], columns=['status', 'can'])
+        df = pd.DataFrame([[slurm_status(status).name, can, n] for status, can, n in self.jobs.count()],
+                          columns=['status', 'can', 'jobs'])
         if split_by_can:
-            return df.groupby(['status', 'can']).size().unstack(level=1).fillna(0).astype(int).T
+            return df.groupby(['status', 'can'])['jobs'].sum().unstack(level=1).fillna(0).astype(int).T
         else:
-            return df.groupby('status').size().to_frame('jobs').T
+            return df.groupby('status')['jobs'].sum().to_frame('jobs').T
+
+    def get_timing_stats(self) -> pd.DataFrame:
+        """Durations of the lifecycle phases of the jobs under management: queue wait, runtime, transfer of \
+        the log file, extraction of the descriptors, upload to the database and turnaround, and the CPU hours \
+        of each job, see :py:meth:`~metrics_functions.timing_frame`.
+
+        :return: pandas.core.frame.DataFrame
+        """
+
+        return timing_frame(dict(self.jobs.items()))
+
+    def get_metrics(self, window=86400.) -> str:
+        """Metrics of the jobs under management in the Prometheus text format: number of jobs by status, \
+        statistics of the durations of the lifecycle phases, throughput and CPU hours per molecule.
+
+        :param window: time window in seconds of the throughput
+        :type window: float
+        :return: str
+        """
+
+        job_counts = {status.name: 0 for status in slurm_status}
+        for status, can, n in self.jobs.count():
+            job_counts[slurm_status(status).name] += n
+        return format_prometheus(self.host, job_counts, summarize_timings(self.get_timing_stats(), window))
+
+    def export_metrics(self, path, window=86400.) -> None:
+        """Write the metrics of the jobs under management to a file in the Prometheus text format, \
+        e.g. in the directory of the textfile collector of the node exporter.
+
+        :param path: path of the metrics file
+        :type path: str
+        :param window: time window in seconds of the throughput
+        :type window: float
+        """
+
+        write_metrics_file(self.get_metrics(window), path)
+
+    def serve_metrics(self, port=9091, window=86400.) -> http.server.ThreadingHTTPServer:
+        """Serve the metrics of the jobs under management over HTTP in the Prometheus text format, \
+        in a background thread.
+
+        :param port: port to listen on
+        :type port: int
+        :param window: time window in seconds of the throughput
+        :type window: float
+        :return: http.server.ThreadingHTTPServer, call shutdown() to stop serving
+        """
+
+        return start_metrics_server(lambda: self.get_metrics(window), port)
 
     def remove_jobs(self, jobs) -> None:
         """Remove jobs.
@@ -485,18 +1294,20 @@ class slurm_manager(object):
         """
 
         self.connect()
+        remote_commands = []
         for name, job in jobs.items():
             logger.debug(f"Removing job {name}.")
-            # remove local files
-            os.remove(f"{job.directory}/{job.base_name}.sh")  # slurm file
-            os.remove(f"{job.directory}/{job.base_name}.gjf")  # gaussian file
-            if os.path.exists(f"{job.directory}/{job.base_name}.log"):
-                os.remove(f"{job.directory}/{job.base_name}.log")  # log file
-            # remove remote files
-            self.connection.run(f"rm -f {self.remote_dir}/slurm-{job.job_id}.out")
-            self.connection.run(f"rm -f {self.remote_dir}/{job.base_name}*")
+            # remove local files (slurm, gaussian and log file), jobs created in bulk have inputs in an archive
+            for ext in ["sh", "gjf", "log", "summary.json", "restart.log", "workflow.gjf"]:
+                if os.path.exists(f"{job.directory}/{job.base_name}.{ext}"):
+                    os.remove(f"{job.directory}/{job.base_name}.{ext}")
+            # remote files are removed in one round trip
+            remote_commands.append(f"rm -f slurm-{job.job_id}.out {job.base_name}*")
             del self.jobs[name]
+        run_batched(self.connection, remote_commands, remote_dir=self.remote_dir, hide=True)
         self._cache()
+        _remove_unused_archives(self.jobs, set(job.archive for job in jobs.values()))
+        cleanup_empty_dirs(self.workdir)
 
     def squeue(self, summary=True) -> pd.DataFrame:
         """Run 'squeue -u $user' command on the server.
@@ -515,6 +1326,49 @@ class slurm_manager(object):
             data = np.array(list(map(str.split, ret.stdout.splitlines())))
             return pd.DataFrame(data[1:], columns=data[0])
 
+    def calibrate_resource_model(self, workflow_type="equilibrium") -> None:
+        """Calibrate the resource model on log files of jobs that finished successfully. Jobs created \
+        afterwards get processors, memory and wall time estimated by the calibrated model.
+
+        :param workflow_type: Gaussian workflow type of the finished jobs
+        :type workflow_type: str
+        """
+
+        finished_statuses = [slurm_status.done.value, slurm_status.uploaded.value]
+        log_files = [f"{job.directory}/{job.base_name}.log" for job in self.jobs.values()
+                     if job.status.value in finished_statuses]
+        model = resource_model('slurm')
+        model.calibrate([log for log in log_files if os.path.exists(log)], workflow_type)
+        self.resource_model = model
+
+    def fit_runtime_model(self) -> None:
+        """Fit the wall time of the resource model to the runtimes of the jobs of this host that finished \
+        successfully in their first submission, for each workflow type, see \
+        :py:meth:`~resource_functions.resource_model.fit_runtimes`. Jobs of the fitted workflow types created \
+        afterwards get wall times predicted from their number of basis functions and processors, their processors \
+        and memory are assigned as before.
+        """
+
+        runtimes = [(job.workflow_type, job.n_basis, job.n_processors, job.elapsed)
+                    for status in (slurm_status.done, slurm_status.uploaded) for job in self.jobs.select(status=status).values()
+                    if job.pack is None and job.n_submissions == 1]
+        model = self.resource_model or resource_model('slurm')
+        model.fit_runtimes(runtimes)
+        if model.runtime_fits:
+            self.resource_model = model
+        self.runtimes_fitted = True
+
+    def _get_resource_model(self) -> resource_model:
+        """Resource model of new jobs. If runtime_model is set in config.yml, the resource model is fitted to \
+        the runtimes of the finished jobs the first time it is needed.
+
+        :return: resource_model, None if resources are assigned as configured in config.yml
+        """
+
+        if not self.runtimes_fitted and config['slurm'].get('runtime_model', False):
+            self.fit_runtime_model()
+        return self.resource_model
+
     def _scancel(self) -> None:
         """Run 'scancel -u $user' command on the server."""
 
@@ -522,13 +1376,98 @@ class slurm_manager(object):
         self.connection.run(f"scancel -u {self.user}")
         self.remove_jobs(self.get_jobs(status=slurm_status.submitted))
 
+    def _reconcile_submissions(self) -> None:
+        """Reconcile the submissions that were interrupted before their job ids were recorded, e.g. by a crash \
+        between sbatch and the commit of the job store (see the journal of :py:class:`~job_store.job_store`). \
+        The jobs are looked up on the scheduler by job name, a job that was submitted is marked submitted \
+        with its job id, the other jobs keep their status and are submitted again."""
+
+        unconfirmed = {key: record for key, record in self.jobs.unconfirmed.items() if key in self.jobs}
+        self.jobs.confirm_submissions()
+        if not unconfirmed:
+            return
+
+        # look up the submissions from a little before the first one, allowing for clock skew with the host
+        since = min(record['time'] for record in unconfirmed.values()) - 600
+        found = find_slurm_jobs(self.connection, self.user,
+                                set(record['job_name'] for record in unconfirmed.values()), since)
+
+        for key, record in unconfirmed.items():
+            job = self.jobs[key]
+            job_ids = [job_id for job_id in found.get(record['job_name'], [])
+                       if job_id != str(job.job_id).split('_')[0]]  # not the previous submission of the job
+            if not job_ids:
+                logger.warning(f"Job {key} was not submitted before the interruption, it will be submitted again.")
+                continue
+            job.job_id = f"{job_ids[-1]}_{record['task']}" if 'task' in record else job_ids[-1]
+            job.status = slurm_status.submitted
+            job.pack = record.get('pack')
+            job.n_submissions = job.n_submissions + 1
+            logger.info(f"Recovered the submission of job {key}, job_id: {job.job_id}.")
+
+        self._cache()
+
     def _cache(self) -> None:
-        """save jobs under management and cleanup empty directories"""
+        """save changes of the jobs under management"""
 
-        with open(self.cache_file, 'wb') as cf:
-            pickle.dump(self.jobs, cf)
+        self.jobs.commit()
 
-        cleanup_empty_dirs(self.workdir)
+    def _throttle_jobs(self, jobs) -> dict:
+        """Select the jobs to submit by priority (see :py:meth:`~queue_manager._prioritize_jobs`) within \
+        the max_queued_jobs limit of config.yml on the number of jobs queued on the host. Jobs beyond the limit \
+        are given status 'created', they are submitted by retrieve_jobs as slots of the queue free up.
+
+        :param jobs: dictionary of jobs to submit
+        :type jobs: dict
+        :return: dict of jobs to submit now, in order of priority
+        """
+
+        unfinished = [slurm_status.created.value, slurm_status.submitted.value, slurm_status.incomplete.value]
+        keys = _prioritize_jobs(jobs, self.jobs.count(), unfinished)
+        max_queued = config['slurm'].get('max_queued_jobs', 0)
+        if max_queued:
+            # jobs of a node pack share a job id and count once
+            n_queued = len(set(str(job.job_id) for job in self.get_jobs(slurm_status.submitted).values()))
+            n_free = max(0, max_queued - n_queued)
+            for key in keys[n_free:]:
+                jobs[key].status = slurm_status.created
+            if len(keys) > n_free:
+                logger.info(f"{n_queued} jobs are queued on {self.host}, holding back {len(keys) - n_free} "
+                            f"jobs until slots free up (max_queued_jobs: {max_queued}).")
+            keys = keys[:n_free]
+        return {key: jobs[key] for key in keys}
+
+    def _top_up_queue(self) -> None:
+        """Submit the jobs held back by the max_queued_jobs limit of config.yml as slots of the queue free up, \
+        with the options of their first submission. The options are kept in the job store, so that the jobs \
+        are submitted after a restart of the manager too."""
+
+        options = self.jobs.get_option('submit_options')
+        if options is not None and self.get_jobs(slurm_status.created):
+            self.jobs.set_option('submit_options', None)
+            self.submit_jobs(**options)
+
+    def _get_checkpoints(self) -> set:
+        """Names of the Gaussian checkpoint files kept on the remote host.
+
+        :return: set of file names
+        """
+
+        self.connect()
+        return get_remote_checkpoints(self.connection, self.remote_dir)
+
+    def _get_wall_time(self, gig) -> str:
+        """Wall time for the jobs of a gaussian input generator, estimated by its resource model or taken \
+        from config.yml.
+
+        :param gig: gaussian input generator, after the Gaussian inputs have been generated
+        :type gig: gaussian_input_generator
+        :return: wall time in HH:MM:SS format
+        """
+
+        if gig.resources['wall_time'] is None:
+            return config['slurm']['wall_time']
+        return format_wall_time(gig.resources['wall_time'], 'slurm')
 
     def _create_slurm_file_from_gaussian_file(self, base_name, directory, wall_time) -> None:
         """Generate a single slurm submission file based on the Gaussian input file.
@@ -542,29 +1481,55 @@ class slurm_manager(object):
         with open(f"{directory}/{base_name}.gjf") as f:
             file_string = f.read()
 
-        host = self.host.split(".")[0]
+        sh_file_path = f"{directory}/{base_name}.sh"
+        with open(sh_file_path, "w") as f:
+            f.write(self._create_slurm_script(base_name, file_string, wall_time))
+        convert_crlf_to_lf(sh_file_path)
+        logger.debug(f"Created a Slurm job file in {sh_file_path}")
+
+    def _create_slurm_script(self, base_name, gaussian_input, wall_time) -> str:
+        """Generate the contents of a single slurm submission file based on the Gaussian input.
+
+        :param base_name: base name of the Gaussian file
+        :param gaussian_input: contents of the Gaussian input file
+        :param wall_time: wall time of the job in HH:MM:SS format
+        :return: slurm submission script
+        """
 
-        n_processors = re.search("nprocshared=(.*?)\n", file_string).group(1)
+        n_processors, ram = get_gaussian_resources(gaussian_input)
+
+        output = self._create_slurm_header(n_processors, ram, wall_time)
+        output += f"input={base_name}\n\n"
+        output += f"# run the code \n" \
+                  f"cd {self.remote_dir}\n" \
+                  f"g16 ${{input}}.gjf\n\n"
+
+        return output
+
+    def _create_slurm_header(self, n_processors, ram, wall_time) -> str:
+        """Generate the resource requests and environment setup of a slurm submission file.
+
+        :param n_processors: number of processors
+        :param ram: memory used by Gaussian in GB
+        :param wall_time: wall time of the job in HH:MM:SS format
+        :return: str
+        """
+
+        host = self.host.split(".")[0]
         constraint = {'della': '\"haswell|skylake\"', 'adroit': '\"skylake\"'}[host]
 
         output = ""
         output += f"#!/bin/bash\n"
+        # request more memory than Gaussian may use (%Mem) to leave room for the program itself
         output += f"#SBATCH -N 1\n" \
                   f"#SBATCH --ntasks-per-node={n_processors}\n" \
                   f"#SBATCH -t {wall_time}\n" \
+                  f"#SBATCH --mem={int(ram * 1.2) + 1}G\n" \
                   f"#SBATCH --constraint={constraint}\n\n"
         if host == "adroit":
             output += f"module load gaussian/g16\n\n"
-        output += f"input={base_name}\n\n"
-        output += f"# run the code \n" \
-                  f"cd {self.remote_dir}\n" \
-                  f"g16 ${{input}}.gjf\n\n"
 
-        sh_file_path = f"{directory}/{base_name}.sh"
-        with open(sh_file_path, "w") as f:
-            f.write(output)
-        convert_crlf_to_lf(sh_file_path)
-        logger.debug(f"Created a Slurm job file in {sh_file_path}")
+        return output
 
 
 class lsf_manager(object):
@@ -579,43 +1544,35 @@ class lsf_manager(object):
         :type host: str
         """
 
-        # set workdir and cache file
+        # set workdir and job store file
         self.workdir = appdirs.user_data_dir(appauthor="autoqchem", appname=host.split('.')[0])
-        self.cache_file = os.path.join(self.workdir, "LSF_manager.pkl")
+        self.cache_file = os.path.join(self.workdir, "LSF_manager.db")
         os.makedirs(self.workdir, exist_ok=True)
 
-        self.jobs = {}  # jobs under management
-
-        # load jobs under management from cache_file (suppress exceptions, no file, empty file, etc.)
-        with suppress(Exception):  # TODO this isn't very safe because may ignore important exceptions
-            with open(self.cache_file, 'rb') as cf:
-                self.jobs = pickle.load(cf)
+        # jobs under management, jobs of the former pickle cache file are migrated into the store,
+        # transitions since the last commit are recovered from the journal
+        self.jobs = job_store(self.cache_file, legacy_cache_file=os.path.join(self.workdir, "LSF_manager.pkl"),
+                              journal_file=os.path.join(self.workdir, "LSF_manager.journal"))
 
         self.host = host
         self.user = user
         self.keyfile = os.path.join(os.path.expanduser('~'), '.ssh', 'id_ed25519_euler')
         self.remote_dir = f"/cluster/scratch/{self.user}/gaussian"
         self.connection = None
+        self.resource_model = None  # calibrated resource model, see calibrate_resource_model
+        self.runtimes_fitted = False  # the resource model has been fitted to job runtimes, see fit_runtime_model
 
     def connect(self) -> None:
         """Connect to remote host."""
 
-        create_new_connection = False
-        # check if connection already exists
-        if self.connection is not None:
-            # check if it went stale
-            if not self.connection.is_connected:
-                logger.info(f"Connection got disconnected, reconnecting.")
-                self.connection.close()
-                self.connection = None
-                create_new_connection = True
-        else:
-            logger.info(f"Creating connection to {self.host} as {self.user}")
-            create_new_connection = True
-        if create_new_connection:
-            self.connection = ssh_connect(self.host, self.user, self.keyfile)
+        # the connection is shared with the other managers of the host, it is recreated if it went stale
+        connection = get_connection(self.host, self.user, self.keyfile)
+        if connection is not self.connection:
+            self.connection = connection
             self.connection.run(f"mkdir -p {self.remote_dir}")
             logger.info(f"Connected to {self.host} as {self.user}.")
+            if self.jobs.unconfirmed:
+                self._reconcile_submissions()
 
     def create_jobs_for_molecule(self,
                                  molecule,
@@ -624,7 +1581,9 @@ class lsf_manager(object):
                                  light_basis_set="6-31G*",
                                  heavy_basis_set="LANL2DZ",
                                  generic_basis_set="genecp",
-                                 max_light_atomic_number=36) -> None:
+                                 max_light_atomic_number=36,
+                                 skip_existing=False,
+                                 tags=None) -> None:
         """Generate LSF jobs for a molecule. Gaussian input files are also generated.
 
         :param molecule: molecule object
@@ -641,12 +1600,13 @@ class lsf_manager(object):
         :type generic_basis_set: str
         :param max_light_atomic_number: maximum atomic number for light elements
         :type max_light_atomic_number: int
+        :param skip_existing: if True the molecule is skipped if it is already in the database with the same \
+        Gaussian config and max number of conformers
+        :type skip_existing: bool
+        :param tags: (optional) metadata tag or tags attached to the skipped molecule in the database
+        :type tags: str or list
         """
 
-        # create gaussian files
-        molecule_workdir = os.path.join(self.workdir, molecule.fs_name)
-        gig = gaussian_input_generator(molecule, workflow_type, molecule_workdir, theory, light_basis_set,
-                                       heavy_basis_set, generic_basis_set, max_light_atomic_number)
         gaussian_config = {'theory': theory,
                            'light_basis_set': light_basis_set,
                            'heavy_basis_set': heavy_basis_set,
@@ -654,19 +1614,23 @@ class lsf_manager(object):
                            'max_light_atomic_number': max_light_atomic_number}
 
         # DB check if the same molecule with the same gaussian configuration already exists
-        # exists, tags = db_check_exists(molecule.can, gaussian_config, molecule.max_num_conformers)
-        # if exists:
-        #     logger.warning(f"Molecule {molecule.can} already exists with the same Gaussian config with tags {tags}."
-        #                    f" Not creating jobs.")
-        #     return
+        if skip_existing and not _skip_existing_molecules([molecule], gaussian_config, tags):
+            return
+
+        # create gaussian files
+        molecule_workdir = os.path.join(self.workdir, molecule.fs_name)
+        gig = gaussian_input_generator(molecule, workflow_type, molecule_workdir, theory, light_basis_set,
+                                       heavy_basis_set, generic_basis_set, max_light_atomic_number,
+                                       resource_model=self._get_resource_model())
 
         gig.create_gaussian_files('lsf')
+        wall_time = self._get_wall_time(gig)
 
         # create LSF files
         for gjf_file in glob.glob(f"{molecule_workdir}/*.gjf"):
 
             base_name = os.path.basename(os.path.splitext(gjf_file)[0])
-            self._create_lsf_file_from_gaussian_file(base_name, molecule_workdir)
+            self._create_lsf_file_from_gaussian_file(base_name, molecule_workdir, wall_time)
             # create job structure
             job = lsf_job(can=molecule.can,
                             conformation=int(base_name.split("_conf_")[1]),
@@ -678,11 +1642,14 @@ class lsf_manager(object):
                             base_name=base_name,  # filesystem basename
                             status=lsf_status.created,
                             n_submissions=0,
-                            n_success_tasks=0)  # status
+                            n_success_tasks=0,
+                            n_processors=gig.resources['n_processors'],
+                            n_atoms=molecule.mol.NumAtoms(),
+                            n_basis=gig.n_basis,
+                            workflow_type=workflow_type)  # status
 
             # create a key for the job
-            key = hashlib.md5((job.can + str(job.conformation) +
-                               str(job.max_num_conformers) + ','.join(map(str, job.tasks))).encode()).hexdigest()
+            key = _job_key(job)
 
             # check if a job like that already exists
             if key in self.jobs:  # a job like that is already present:
@@ -694,92 +1661,419 @@ class lsf_manager(object):
             self.jobs[key] = job  # add job to bag
         self._cache()
 
-    def submit_jobs(self) -> None:
-        """Submit jobs that have status 'created' to remote host."""
+    def create_jobs_for_molecules(self,
+                                  molecules,
+                                  archive_name,
+                                  workflow_type="equilibrium",
+                                  theory="APFD",
+                                  light_basis_set="6-31G*",
+                                  heavy_basis_set="LANL2DZ",
+                                  generic_basis_set="genecp",
+                                  max_light_atomic_number=36,
+                                  skip_existing=False,
+                                  tags=None) -> None:
+        """Generate LSF jobs for many molecules at once. Instead of writing a .gjf and a .sh file per conformer, \
+        the Gaussian input files and LSF files are streamed into a single compressed archive with a manifest, \
+        which is shipped and unpacked on the remote host in one transfer when the jobs are submitted.
+
+        :param molecules: list of molecule objects
+        :type molecules: list
+        :param archive_name: name of the archive, it is also used as the local directory of the jobs
+        :type archive_name: str
+        :param workflow_type: Gaussian workflow type, allowed types are: 'equilibrium' or 'transition_state'
+        :type workflow_type: str
+        :param theory: Gaussian theory functional
+        :type theory: str
+        :param light_basis_set: basis set to use for light elements
+        :type light_basis_set: str
+        :param heavy_basis_set: basis set to use for heavy elements
+        :type heavy_basis_set: str
+        :param generic_basis_set: basis set to use for generic elements
+        :type generic_basis_set: str
+        :param max_light_atomic_number: maximum atomic number for light elements
+        :type max_light_atomic_number: int
+        :param skip_existing: if True the molecules that are already in the database with the same \
+        Gaussian config and max number of conformers are skipped, all molecules are checked with a \
+        single query
+        :type skip_existing: bool
+        :param tags: (optional) metadata tag or tags attached to the skipped molecules in the database
+        :type tags: str or list
+        """
+
+        gaussian_config = {'theory': theory,
+                           'light_basis_set': light_basis_set,
+                           'heavy_basis_set': heavy_basis_set,
+                           'generic_basis_set': generic_basis_set,
+                           'max_light_atomic_number': max_light_atomic_number}
+
+        # DB check which of the molecules with the same gaussian configuration already exist
+        if skip_existing:
+            molecules = _skip_existing_molecules(molecules, gaussian_config, tags)
+            if not molecules:
+                return
+
+        directory = os.path.join(self.workdir, archive_name)
+        archive_path = os.path.join(directory, f"{archive_name}.tar.gz")
+        if os.path.exists(archive_path):
+            raise FileExistsError(f"Archive {archive_path} already exists, choose a different archive name.")
+        os.makedirs(directory, exist_ok=True)
+
+        with gaussian_archive(archive_path) as archive:
+            for molecule in molecules:
+                gig = gaussian_input_generator(molecule, workflow_type, directory, theory, light_basis_set,
+                                               heavy_basis_set, generic_basis_set, max_light_atomic_number,
+                                               resource_model=self._get_resource_model())
+
+                gaussian_inputs = list(gig.generate_gaussian_inputs('lsf'))
+                wall_time = self._get_wall_time(gig)
+
+                for base_name, gaussian_input in gaussian_inputs:
+                    # create job structure
+                    job = lsf_job(can=molecule.can,
+                                  conformation=int(base_name.split("_conf_")[1]),
+                                  max_num_conformers=molecule.max_num_conformers,
+                                  tasks=gig.tasks,
+                                  config=gaussian_config,
+                                  job_id=-1,  # job_id (not assigned yet)
+                                  directory=directory,  # filesystem path
+                                  base_name=base_name,  # filesystem basename
+                                  status=lsf_status.created,
+                                  n_submissions=0,
+                                  n_success_tasks=0,
+                                  n_processors=gig.resources['n_processors'],
+                                  n_atoms=molecule.mol.NumAtoms(),
+                                  n_basis=gig.n_basis,
+                                  workflow_type=workflow_type,
+                                  archive=archive_path)  # input files are in the archive
+
+                    key = _job_key(job)
+                    if key in self.jobs:  # a job like that is already present:
+                        logger.warning(f"A job with exactly the same parameters, molecule {job.can}, conformation "
+                                       f"{job.conformation}, workflow {job.tasks} already exists. "
+                                       f"Not creating a duplicate")
+                        continue
+
+                    archive.add_job(base_name,
+                                    {'gjf': gaussian_input,
+                                     'sh': self._create_lsf_script(base_name, gaussian_input, wall_time)},
+                                    key=key, can=job.can, conformation=job.conformation)
+                    self.jobs[key] = job  # add job to bag
+        self._cache()
+
+    def submit_jobs(self, pack=False) -> None:
+        """Submit jobs that have status 'created' to remote host, in order of priority and within the \
+        max_queued_jobs limit of config.yml, see :py:meth:`~lsf_manager.lsf_manager._throttle_jobs`.
+
+        :param pack: if True small jobs are packed into node-sized allocations
+        :type pack: bool
+        """
 
         jobs = self.get_jobs(lsf_status.created)
         logger.info(f"Submitting {len(jobs)} jobs.")
-        self.submit_jobs_from_jobs_dict(jobs)
+        self.submit_jobs_from_jobs_dict(jobs, pack)
 
-    def submit_jobs_from_jobs_dict(self, jobs) -> None:
+    def submit_jobs_from_jobs_dict(self, jobs, pack=False) -> None:
         """Submit jobs to remote host.
 
         :param jobs: dictionary of jobs to submit
         :type jobs: dict
+        :param pack: if True small jobs are packed into node-sized allocations that run them concurrently, \
+        see :py:meth:`~lsf_manager.lsf_manager._submit_job_packs`, the remaining jobs are submitted as usual
+        :type pack: bool
         """
 
+        # keep at most max_queued_jobs jobs in the queue, the other jobs are submitted by retrieve_jobs
+        n_jobs = len(jobs)
+        jobs = self._throttle_jobs(jobs)
+        if len(jobs) < n_jobs:
+            self.jobs.set_option('submit_options', {'pack': pack})
+
         # check if there are any jobs to be submitted
         if jobs:
             # get or create connection
             self.connect()
+            # jobs found on the scheduler by the reconciliation of interrupted submissions are not submitted again
+            jobs = {name: job for name, job in jobs.items() if job.status != lsf_status.submitted}
 
-            # check if jobs are in status created or failed
-            for name, job in jobs.items():
-                # copy .sh and .gjf file to remote_dir
-                self.connection.put(f"{job.directory}/{job.base_name}.sh", self.remote_dir)
-                self.connection.put(f"{job.directory}/{job.base_name}.gjf", self.remote_dir)
+            # ship .sh and .gjf files of the jobs to remote_dir in one transfer, the files of jobs created
+            # in bulk are taken from their archive
+            upload_job_files(self.connection, jobs, self.remote_dir)
+
+            # outputs of previous submissions would be summarized as the outputs of the new submission
+            remove_remote_outputs(self.connection, self.remote_dir,
+                                  [job.base_name for job in jobs.values() if job.n_submissions > 0])
 
+            if pack:
+                jobs = self._submit_job_packs(jobs)
+
+            for name, job in jobs.items():
+                self.jobs.journal_event('submitting', name, job_name=job.base_name)
                 with self.connection.cd(self.remote_dir):
-                    ret = self.connection.run(f"module load new gaussian nbo openblas;bsub < {job.base_name}.sh", hide=True)
+                    ret = self.connection.run(f"module load new gaussian nbo openblas;"
+                                              f"bsub -J {job.base_name} < {job.base_name}.sh", hide=True)
                     job.job_id = re.search("Job\s*<(\d+)>", ret.stdout).group(1)
                     job.status = lsf_status.submitted
+                    job.pack = None
                     job.n_submissions = job.n_submissions + 1
                     logger.info(f"Submitted job {name}, job_id: {job.job_id}.")
 
             self._cache()
 
+    def _submit_job_packs(self, jobs) -> dict:
+        """Pack small jobs into node-sized allocations and submit each pack with a single bsub. Jobs requesting \
+        at most pack_max_job_processors processors (config.yml) are bin-packed by the processors and memory \
+        of their Gaussian resource block into packs that fit on one node, the script of a pack runs its jobs \
+        concurrently. All jobs of a pack share the job_id of the pack and keep their own status, \
+        a job is retrieved as soon as it has finished, even if other jobs of its pack are still running.
+
+        :param jobs: dictionary of jobs to submit, their input files must already be on the remote host
+        :type jobs: dict
+        :return: dict of jobs that were not packed
+        """
+
+        max_job_processors = config['lsf'].get('pack_max_job_processors', 4)
+        max_processors = config['lsf']['max_processors']
+        max_ram = config['lsf'].get('max_ram', max_processors * config['lsf']['ram_per_processor'])
+
+        gaussian_inputs = read_job_files(jobs, "gjf")
+        resources = {name: get_gaussian_resources(gaussian_input) for name, gaussian_input in gaussian_inputs.items()}
+        packs = pack_jobs({name: r for name, r in resources.items() if r[0] <= max_job_processors},
+                          max_processors, max_ram)
+        packs = [names for names in packs if len(names) > 1]  # a pack of a single job is submitted as usual
+        if not packs:
+            return jobs
+
+        scripts = read_job_files({name: jobs[name] for names in packs for name in names}, "sh")
+        prefix = f"pack_{time.strftime('%Y%m%d_%H%M%S')}"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, names in enumerate(packs):
+                pack_name = f"{prefix}_{i}"
+                wall_time = max((re.search("#BSUB -W (\S+)", scripts[name]).group(1) for name in names),
+                                key=parse_wall_time)
+
+                script = self._create_lsf_header(sum(resources[name][0] for name in names),
+                                                 sum(resources[name][1] for name in names),
+                                                 wall_time)
+                script += f'#BSUB -R "span[hosts=1]"\n\n'  # all jobs of the pack on the same node
+                script += create_pack_commands([jobs[name].base_name for name in names], self.remote_dir, "g09")
+                with open(os.path.join(tmp_dir, f"{pack_name}.sh"), "w") as f:
+                    f.write(script)
+                self.connection.put(os.path.join(tmp_dir, f"{pack_name}.sh"), self.remote_dir)
+
+                # remove .done files left over from earlier submissions of the jobs
+                done_files = " ".join(f"{jobs[name].base_name}.done" for name in names)
+                for name in names:
+                    self.jobs.journal_event('submitting', name, sync=False, job_name=pack_name, pack=pack_name)
+                self.jobs.sync_journal()
+                with self.connection.cd(self.remote_dir):
+                    ret = self.connection.run(f"rm -f {done_files} && module load new gaussian nbo openblas;"
+                                              f"bsub -J {pack_name} < {pack_name}.sh", hide=True)
+                pack_id = re.search("Job\s*<(\d+)>", ret.stdout).group(1)
+
+                for name in names:
+                    job = jobs[name]
+                    job.job_id = pack_id
+                    job.status = lsf_status.submitted
+                    job.n_submissions = job.n_submissions + 1
+                    job.pack = pack_name
+                logger.info(f"Submitted node pack {pack_name} with {len(names)} jobs, job_id: {pack_id}.")
+
+        packed = set(name for names in packs for name in names)
+        return {name: job for name, job in jobs.items() if name not in packed}
+
     def retrieve_jobs(self) -> None:
         """Retrieve finished jobs from remote host and check which finished succesfully and which failed."""
 
-        ids_to_check = [j.job_id for j in self.get_jobs(lsf_status.submitted).values()]
+        submitted_jobs = self.get_jobs(lsf_status.submitted)
+        ids_to_check = [j.job_id for j in submitted_jobs.values()]
         if not ids_to_check:
             logger.info(f"There are no jobs submitted to cluster. Nothing to retrieve.")
+            self._top_up_queue()
             return
 
         # get or create connection
         self.connect()
 
-        # retrieve job ids that are running on the server
-        ret = self.connection.run(f"bjobs -u {self.user}", hide=True)
-        user_running_ids = [s.split(',')[0] for s in ret.stdout.splitlines()[1:]]
-        running_ids = [id for id in user_running_ids if id in ids_to_check]
+        # query the state of the submitted jobs only, jobs unknown to the scheduler have finished
+        ids_to_check = list(dict.fromkeys(map(str, ids_to_check)))
+        try:
+            states = query_lsf_jobs(self.connection, ids_to_check,
+                                    chunk_size=config['lsf'].get('status_chunk_size', 500))
+        except SchedulerQueryException as e:
+            logger.warning(f"Skipping retrieval, the state of the jobs is unknown: {e}")
+            return
+        running_ids = [id for id in ids_to_check if id in states and states[id]['outcome'] == 'running']
         finished_ids = [id for id in ids_to_check if id not in running_ids]
 
         logger.info(f"There are {len(running_ids)} running/pending jobs, {len(finished_ids)} finished jobs.")
 
+        # jobs of node packs that are still running are finished when their .done file exists
+        done_base_names = set()
+        if any(job.pack is not None for job in submitted_jobs.values()):
+            done_base_names = get_done_base_names(self.connection, self.remote_dir)
+
         # get finished jobs
-        finished_jobs = {name: job for name, job in self.jobs.items() if job.job_id in finished_ids}
+        finished_jobs = {name: job for name, job in submitted_jobs.items()
+                         if str(job.job_id) in finished_ids or
+                         (job.pack is not None and job.base_name in done_base_names)}
         done_jobs = 0
 
-        if finished_jobs:
+        # record how the jobs ended, jobs of node packs that are still running keep no state
+        for job in finished_jobs.values():
+            state = states.get(str(job.job_id), {})
+            if state.get('outcome') == 'running':
+                state = {}
+            job.scheduler_state, job.exit_code, job.elapsed = state.get('state'), state.get('exit_code'), \
+                state.get('elapsed')
+
+        # jobs that ended without running (e.g. cancelled while pending) have no log file to fetch
+        not_started = {name: job for name, job in finished_jobs.items()
+                       if job.pack is None and job.elapsed == 0 and
+                       lsf_outcome(job.scheduler_state, job.exit_code) != 'completed'}
+        for job in not_started.values():
+            # jobs that lost their node or were preempted are resubmitted
+            job.failure_reason = classify_failure(None, job.scheduler_state)
+            if job.failure_reason in retriable_failures:
+                job.status = lsf_status.incomplete
+                logger.warning(f"Job {job.base_name} incomplete - {job.scheduler_state} before it started. "
+                               f"Resubmit job.")
+            else:
+                job.status = lsf_status.failed
+                logger.warning(f"Job {job.base_name} failed - {job.scheduler_state} before it started. "
+                               f"Cannot resubmit.")
+
+        if len(finished_jobs) > len(not_started):
             logger.info(f"Retrieving log files of finished jobs.")
-            for job in finished_jobs.values():
-                status = self._retrieve_single_job(job)
+            fetched_jobs = {name: job for name, job in finished_jobs.items() if name not in not_started}
+            transfer_time, started = 0., time.time()  # time spent waiting for the log files
+            for job, fetched, summary in self._fetch_log_files(fetched_jobs):
+                transfer_time += time.time() - started
+                # log files that could not be fetched in bulk are tried one by one
+                status = self._retrieve_single_job(job, fetch=not fetched, summary=summary)
                 if status.value == slurm_status.done.value:
                     done_jobs += 1
+                elif job.scheduler_state is not None:
+                    logger.info(f"Job {job.base_name} ended with scheduler state {job.scheduler_state}, "
+                                f"exit code {job.exit_code} after {job.elapsed} s.")
+                started = time.time()
+            for job in fetched_jobs.values():
+                _record_timings(job, transfer_time=transfer_time / len(fetched_jobs))
 
+        if finished_jobs:
             self._cache()
             logger.info(f"{done_jobs} jobs finished successfully (all Gaussian steps finished normally)."
                         f" {len(finished_jobs) - done_jobs} jobs failed.")
 
-    def _retrieve_single_job(self, job) -> lsf_status:
+        # submit jobs that waited for free slots of the queue
+        if finished_jobs:
+            self._top_up_queue()
+
+    def _fetch_log_files(self, jobs):
+        """Fetch log files of finished jobs. With remote_extraction enabled in config.yml the log files are \
+        summarized and compressed on the remote host and only the summaries are fetched, the log files are fetched \
+        later when they are needed. Otherwise the log files are fetched in one transfer as an archive, \
+        if that is disabled (bulk_transfer in config.yml) or fails, e.g. because of the remote quota, \
+        they are downloaded concurrently over several SFTP channels and each job is yielded as soon as its \
+        log file has landed.
+
+        :param jobs: dictionary of finished jobs
+        :type jobs: dict
+        :return: generator of tuples of job, bool (True if the log file of the job has been fetched) \
+        and the summary of the log file extracted on the remote host (None without remote extraction)
+        """
+
+        if config['lsf'].get('remote_extraction', False):
+            try:
+                summaries = extract_remote_summaries(self.connection, self.remote_dir,
+                                                     {job.base_name: job.directory for job in jobs.values()},
+                                                     config['lsf'].get('remote_python', "python3"))
+            except Exception as e:
+                logger.warning(f"Remote extraction of log files failed ({e}), fetching the log files.")
+            else:
+                for job in jobs.values():
+                    yield job, False, summaries.get(job.base_name)
+                return
+
+        jobs_by_log = {f"{job.base_name}.log": job for job in jobs.values()}
+        local_dirs = {log: job.directory for log, job in jobs_by_log.items()}
+
+        if config['lsf'].get('bulk_transfer', True):
+            try:
+                fetched = download_files(self.connection, self.remote_dir, local_dirs)
+            except Exception as e:
+                logger.warning(f"Bulk transfer of log files failed ({e}), downloading them concurrently.")
+            else:
+                for log, job in jobs_by_log.items():
+                    yield job, log in fetched, None
+                return
+
+        for log, error in sftp_download_files(self.connection, self.remote_dir, local_dirs,
+                                              max_workers=config['lsf'].get('transfer_workers', 8),
+                                              retries=config['lsf'].get('transfer_retries', 3)):
+            if error is not None and not isinstance(error, FileNotFoundError):
+                logger.warning(f"Could not download {log}: {error}")
+            yield jobs_by_log[log], error is None, None
+
+    def _fetch_missing_logs(self, jobs) -> None:
+        """Fetch log files of jobs that have been retrieved with remote extraction, the log files were \
+        compressed on the remote host and are fetched in one transfer.
+
+        :param jobs: dictionary of jobs
+        :type jobs: dict
+        """
+
+        missing = {job.base_name: job.directory for job in jobs.values()
+                   if not os.path.exists(f"{job.directory}/{job.base_name}.log")}
+        if missing:
+            self.connect()
+            fetched = fetch_compressed_logs(self.connection, self.remote_dir, missing)
+            for job in jobs.values():
+                if job.base_name in fetched:
+                    _merge_restart_log(job)
+            logger.info(f"Fetched {len(fetched)} / {len(missing)} compressed log files.")
+
+    def _retrieve_single_job(self, job, fetch=True, summary=None) -> lsf_status:
         """Retrieve single job from remote host and check its status
 
         :param job: job
+        :param fetch: if False the log file has already been fetched to the job directory
+        :type fetch: bool
+        :param summary: summary of the log file extracted on the remote host, if given the status is \
+        decided from the summary and the log file is not fetched
+        :type summary: dict
         :return: :py:meth:`~helper_classes.helper_classes.slurm_status`, resulting status
         """
 
+        log, exception = None, None
         try:  # try to fetch the file
-            log_file = self.connection.get(f"{self.remote_dir}/{job.base_name}.log",
-                                           local=f"{job.directory}/{job.base_name}.log")
+            log_file = f"{job.directory}/{job.base_name}.log"
+            if summary is not None:
+                # the log file stays compressed on the remote host until it is needed, see _fetch_missing_logs
+                if os.path.exists(log_file):
+                    os.remove(log_file)  # log file of a previous submission
+                if summary['log_missing']:
+                    raise FileNotFoundError(log_file)
+                n_tasks, check_for_exceptions = summary['n_tasks'] + _restarted_tasks(job), \
+                    lambda: raise_summary_exception(summary)
+                exception = summary['exception']
+            else:
+                if fetch:
+                    self.connection.get(f"{self.remote_dir}/{job.base_name}.log", local=log_file)
+                _merge_restart_log(job)
+
+                # initialize the log extractor, it will try to read basic info from the file
+                le = gaussian_log_extractor(log_file)
+                n_tasks, check_for_exceptions = le.n_tasks, le.check_for_exceptions
+                log = le.log
+            job.n_success_tasks = n_tasks
 
-            # initialize the log extractor, it will try to read basic info from the file
-            le = gaussian_log_extractor(log_file.local)
-            if len(job.tasks) == le.n_tasks:
+            if len(job.tasks) == n_tasks:
                 job.status = lsf_status.done
+                if job.elapsed is None and summary is None:  # the scheduler does not report run times
+                    job.elapsed = le.get_run_statistics()['elapsed_time']
             else:
                 try:  # look for more specific exception
-                    le.check_for_exceptions()
+                    check_for_exceptions()
 
                 except NoGeometryException:
                     job.status = lsf_status.failed
@@ -787,11 +2081,13 @@ class lsf_manager(object):
                         f"Job {job.base_name} failed - the log file does not contain geometry. Cannot resubmit.")
 
                 except NegativeFrequencyException:
+                    exception = 'NegativeFrequencyException'
                     job.status = lsf_status.incomplete
                     logger.warning(
                         f"Job {job.base_name} incomplete - log file contains negative frequencies. Resubmit job.")
 
                 except OptimizationIncompleteException:
+                    exception = 'OptimizationIncompleteException'
                     job.status = lsf_status.incomplete
                     logger.warning(f"Job {job.base_name} incomplete - geometry optimization did not complete.")
 
@@ -807,26 +2103,55 @@ class lsf_manager(object):
             job.status = lsf_status.failed
             logger.warning(f"Job {job.base_name} failed  - could not retrieve log file. Cannot resubmit.")
 
+        # jobs that ran out of time or memory, lost their node or did not converge the SCF are resubmitted
+        # even without geometry
+        job.failure_reason = None
+        if job.status.value != lsf_status.done.value:
+            job.failure_reason = classify_failure(log, job.scheduler_state, exception)
+            if job.status.value == lsf_status.failed.value and job.failure_reason in retriable_failures:
+                job.status = lsf_status.incomplete
+                logger.warning(f"Job {job.base_name} incomplete - {job.failure_reason.replace('_', ' ')}. "
+                               f"Resubmit job.")
+
         # clean up files on the remote site - do not cleanup anything, the /scratch/network cleans
         # up files that are older than 15 days
 
         return job.status
 
-    def resubmit_incomplete_jobs(self, wall_time="23:59") -> None:
+    def resubmit_incomplete_jobs(self, wall_time="23:59", restart=False) -> None:
         """Resubmit jobs that are incomplete. If the job has failed because the optimization has not completed \
         and a log file has been retrieved, then \
-        the last geometry will be used for the next submission. For failed jobs \
+        the last geometry will be used for the next submission. The resubmission depends on why the job did not \
+        complete (see :py:meth:`~resubmission_functions.decide_resubmission`): jobs that ran out of time get more \
+        wall time and then more processors, jobs that ran out of memory more memory, SCF convergence failures \
+        are retried with scf=qc and saddle points from a geometry displaced along the imaginary mode. Each \
+        decision is recorded in the resubmissions of the job, jobs that would fail the same way again are \
+        marked failed. For failed jobs \
          the job input files will need to be fixed manually and submitted using the \
         function :py:meth:`~slurm_manager.slurm_manager.submit_jobs_from_jobs_dict`.\
          Maximum number of allowed submission of the same job is 3.
 
-        :param wall_time: wall time of the job in HH:MM format
+        :param wall_time: maximum wall time of a resubmitted job in HH:MM format, jobs that ran out of time \
+        get their wall time escalated up to it
+        :param restart: if True jobs are restarted from the checkpoint files of their previous submission, \
+        skipping the tasks that completed and continuing an interrupted optimization (opt=Restart), \
+        jobs that cannot be restarted from a checkpoint are resubmitted from their last geometry
+        :type restart: bool
         :return: None
         TODO change this description
         """
 
         incomplete_jobs = self.get_jobs(lsf_status.incomplete)
         incomplete_jobs_to_resubmit = {}
+        self._fetch_missing_logs(incomplete_jobs)
+        checkpoints = self._get_checkpoints() if restart and incomplete_jobs else set()
+        limits = {'max_processors': config['lsf']['max_processors'],
+                  'max_ram': config['lsf'].get('max_ram', config['lsf']['max_processors'] *
+                                               config['lsf']['ram_per_processor']),
+                  'max_wall_time': parse_wall_time(wall_time),
+                  'wall_time_factor': config['lsf'].get('resubmit_wall_time_factor', 2),
+                  'ram_factor': config['lsf'].get('resubmit_ram_factor', 2),
+                  'displacement': config['lsf'].get('resubmit_displacement', 0.1)}
 
         if not incomplete_jobs:
             logger.info("There are no incomplete jobs to resubmit.")
@@ -838,62 +2163,123 @@ class lsf_manager(object):
                 logger.warning(f"Job {job.base_name} has been already failed 3 times, not submitting again.")
                 continue
 
+            # input files of jobs created in bulk are in an archive, extract them to be edited
+            if job.archive is not None:
+                extract_from_archive(job.archive, [f"{job.base_name}.gjf", f"{job.base_name}.sh"], job.directory)
+                job.archive = None
+
             job_log = f"{job.directory}/{job.base_name}.log"
             job_gjf = f"{job.directory}/{job.base_name}.gjf"
+            job_sh = f"{job.directory}/{job.base_name}.sh"
 
-            # replace geometry
-            le = gaussian_log_extractor(job_log)
-            le.get_atom_labels()
-            le.get_geometry()
-            # old coords block
-            with open(job_gjf, "r") as f:
-                file_string = f.read()
-            old_coords_block = re.search(f"\w+\s+({float_or_int_regex})"
-                                         f"\s+({float_or_int_regex})"
-                                         f"\s+({float_or_int_regex}).*?\n\n",
-                                         file_string, re.DOTALL).group(0)
-
-            # new coords block
-            coords = le.geom[list('XYZ')].applymap(lambda x: f"{x:.6f}")
-            coords.insert(0, 'Atom', le.labels)
-            coords_block = "\n".join(map(" ".join, coords.values)) + "\n\n"
-
-            # make sure they are the same length and replace
-            assert len(old_coords_block.splitlines()) == len(coords_block.splitlines())
-            file_string = file_string.replace(old_coords_block, coords_block)
-            with open(job_gjf, "w") as f:
-                f.write(file_string)
-
-            logger.info("Substituting last checked geometry in the new input file.")
+            # decide how to resubmit the job from the reason it did not complete
+            job.failure_reason, le = _failure_reason(job)
+            with open(job_gjf) as f:
+                n_processors, ram = get_gaussian_resources(f.read())
+            with open(job_sh) as f:
+                job_wall_time = parse_wall_time(re.search("#BSUB -W (\S+)", f.read()).group(1))
+            decision = decide_resubmission(job.failure_reason,
+                                           {'n_processors': n_processors, 'ram': ram, 'wall_time': job_wall_time},
+                                           limits, job.resubmissions)
+            job.resubmissions = (job.resubmissions or []) + [decision]
+            job.n_processors = decision['n_processors']
+            if decision['action'] == 'give_up':
+                job.status = lsf_status.failed
+                logger.warning(f"Job {job.base_name} failed - {job.failure_reason.replace('_', ' ')}, "
+                               f"a resubmission would fail the same way. Not submitting again.")
+                continue
 
-            # replacing wall time
-            job_sh = f"{job.directory}/{job.base_name}.sh"
-            with open(job_sh, "r") as f:
-                file_string = f.read()
-            old_wall_time = re.search(f"#BSUB -W (\d\d:\d\d)", file_string).group(1)  # TODO check an lsf to see if this substitution is correct
-            file_string = file_string.replace(old_wall_time, wall_time)
+            # the log of the completed tasks is kept, a job without log file is started again
+            restart_input = None
+            if restart and decision['restart']:
+                if os.path.exists(job_log):
+                    restart_input = _restart_input(job, checkpoints)
+                else:
+                    logger.info(f"Job {job.base_name} has no log file, it cannot be restarted from a checkpoint file.")
+            if restart_input is not None:
+                # keep the input of the whole workflow and the log of the completed tasks, the log of the
+                # restarted tasks is appended to it when the job is retrieved
+                if not os.path.exists(f"{job.directory}/{job.base_name}.workflow.gjf"):
+                    shutil.copy(job_gjf, f"{job.directory}/{job.base_name}.workflow.gjf")
+                with open(job_gjf, "w") as f:
+                    f.write(restart_input)
+                os.replace(job_log, f"{job.directory}/{job.base_name}.restart.log")
+            else:
+                # start the whole workflow again
+                if os.path.exists(f"{job.directory}/{job.base_name}.workflow.gjf"):
+                    os.replace(f"{job.directory}/{job.base_name}.workflow.gjf", job_gjf)
+                if os.path.exists(f"{job.directory}/{job.base_name}.restart.log"):
+                    os.remove(f"{job.directory}/{job.base_name}.restart.log")
+
+            if restart_input is None and hasattr(le, 'labels') and hasattr(le, 'geom'):
+                # replace geometry, the log extractor has read the last geometry
+                # old coords block
+                with open(job_gjf, "r") as f:
+                    file_string = f.read()
+                old_coords_block = re.search(f"\w+\s+({float_or_int_regex})"
+                                             f"\s+({float_or_int_regex})"
+                                             f"\s+({float_or_int_regex}).*?\n\n",
+                                             file_string, re.DOTALL).group(0)
+
+                # new coords block, displaced along the imaginary mode of a saddle point
+                coords = le.geom[list('XYZ')]
+                if decision['action'] == 'perturb_geometry' and le.modes is not None:
+                    mode = le.modes['Frequencies'].idxmin()
+                    vectors = le.mode_vectors[le.mode_vectors['mode_number'] == mode]
+                    mode_vectors = list(zip(*(vectors[vectors['axis'] == axis]['value'] for axis in 'XYZ')))
+                    coords = pd.DataFrame(displace_geometry(coords.values.tolist(), mode_vectors,
+                                                            decision['displacement']), columns=list('XYZ'))
+                    logger.info(f"Displacing the geometry by {decision['displacement']} Angstrom "
+                                f"along the imaginary mode.")
+                coords = coords.applymap(lambda x: f"{x:.6f}")
+                coords.insert(0, 'Atom', le.labels)
+                coords_block = "\n".join(map(" ".join, coords.values)) + "\n\n"
+
+                # make sure they are the same length and replace
+                assert len(old_coords_block.splitlines()) == len(coords_block.splitlines())
+                file_string = file_string.replace(old_coords_block, coords_block)
+                with open(job_gjf, "w") as f:
+                    f.write(file_string)
+
+                logger.info("Substituting last checked geometry in the new input file.")
+
+            # resources of the resubmission
+            with open(job_gjf) as f:
+                gaussian_input = set_gaussian_resources(f.read(), decision['n_processors'], decision['ram'])
+            if decision['action'] == 'scf_qc':
+                gaussian_input = use_scf_qc(gaussian_input)
+            with open(job_gjf, "w") as f:
+                f.write(gaussian_input)
             with open(job_sh, "w") as f:
-                f.write(file_string)
+                f.write(self._create_lsf_script(job.base_name, gaussian_input,
+                                                  format_wall_time(decision['wall_time'], 'lsf')))
             convert_crlf_to_lf(job_sh)
 
-            logger.info(f"Substituting wall_time with new value: {wall_time}")
+            logger.info(f"Resubmitting job {job.base_name} ({job.failure_reason}): {decision['action']}, "
+                        f"{decision['n_processors']} processors, {decision['ram']}GB memory, "
+                        f"{format_wall_time(decision['wall_time'], 'lsf')} wall time.")
             incomplete_jobs_to_resubmit[key] = job
 
         self.submit_jobs_from_jobs_dict(incomplete_jobs_to_resubmit)
 
     def upload_done_molecules_to_db(self, tag, cls="", subcls="",
-                                    type="", subtype="", RMSD_threshold=0.01, symmetry=True) -> None:
+                                    type="", subtype="", RMSD_threshold=0.01, symmetry=True, fetch_logs=True) -> None:
 
         """Upload done molecules to db. Molecules are considered done when all jobs for a given \
-         smiles are in 'done' status. The conformers are deduplicated and uploaded to database using a metadata tag.
+         smiles are in 'done' status. The conformers are deduplicated and uploaded to database using a metadata tag. \
+         Descriptors are extracted in a process pool (upload_workers of config.yml) and the molecules are written \
+         in batches of at most upload_chunk_size conformers, while one batch is written the next one is extracted.
 
-        :param tag: metadata tag to use for these molecules in the database
-        :type tag: str
+        :param tag: metadata tag or tags to use for these molecules in the database
+        :type tag: str or list
         :param RMSD_threshold: RMSD threshold (in Angstroms) to use when deduplicating multiple conformers \
         after Gaussian has found optimal geometry
         :type RMSD_threshold: float
         :param symmetry: if True symmetry is taken into account when comparing molecules in OBAlign(symmetry=True)
         :type symmetry: bool
+        :param fetch_logs: if True log files left compressed on the remote host by remote extraction are fetched, \
+        if False the upload does not use the connection and molecules without log files are not uploaded
+        :type fetch_logs: bool
         """
 
         done_jobs = self.get_jobs(lsf_status.done)
@@ -914,84 +2300,110 @@ class lsf_manager(object):
 
         # select jobs for done molecules
         done_can_jobs = self.get_jobs(can=done_cans)
+        if fetch_logs:
+            self._fetch_missing_logs(done_can_jobs)
         jobs_df = pd.DataFrame([job.__dict__ for job in done_can_jobs.values()], index=done_can_jobs.keys())
 
+        # check if the tag(s) are properly provided
+        assert isinstance(tag, (str, list))
+        tags = [tag] if isinstance(tag, str) else tag
+        assert all(len(t.strip()) > 0 for t in tags)
+
         logger.debug(f"Deduplicating conformers if RMSD < {RMSD_threshold}.")
         meta = {"class": cls, "subclass": subcls, "type": type, "subtype": subtype}
 
-        for (can, tasks, max_n_conf), keys in jobs_df.groupby(["can", "tasks", "max_num_conformers"]).groups.items():
+        groups = list(jobs_df.groupby(["can", "tasks", "max_num_conformers"]).groups.items())
+        batches = _batch_groups(groups, config['mongoDB'].get('upload_chunk_size', 500))
+        n_workers = config['mongoDB'].get('upload_workers', 0) or os.cpu_count()
+
+        # descriptors of the next batch are extracted while the current batch is deduplicated and written
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            extractions = self._extract_batch(executor, batches[0])
+            for i, batch in enumerate(batches):
+                next_extractions = self._extract_batch(executor, batches[i + 1]) if i + 1 < len(batches) else {}
+                self._upload_batch(batch, extractions, tags, meta, RMSD_threshold, symmetry)
+                extractions = next_extractions
+
+    def _extract_batch(self, executor, batch) -> dict:
+        """Submit the descriptor extraction of the conformers of a batch of molecules to the worker processes.
+
+        :param executor: process pool of the upload
+        :type executor: concurrent.futures.ProcessPoolExecutor
+        :param batch: list of tuples of (can, tasks, max_num_conformers) and job keys
+        :type batch: list
+        :return: dict of job key -> future of the descriptors and the extraction time
+        """
+
+        return {key: executor.submit(_extract_conformer, f"{self.jobs[key].directory}/{self.jobs[key].base_name}.log")
+                for _, keys in batch for key in keys}
+
+    def _upload_batch(self, batch, extractions, tags, meta, RMSD_threshold, symmetry) -> None:
+        """Deduplicate the conformers of a batch of molecules and upload them to database in bulk. The jobs \
+        of the uploaded conformers are marked uploaded in one transaction of the job store once the write \
+        has succeeded, the jobs of molecules that could not be extracted remain done.
+
+        :param batch: list of tuples of (can, tasks, max_num_conformers) and job keys
+        :type batch: list
+        :param extractions: dict of job key -> future of the descriptors and the extraction time
+        :type extractions: dict
+        :param tags: metadata tags
+        :type tags: list
+        :param meta: classification metadata of the molecules
+        :type meta: dict
+        :param RMSD_threshold: RMSD threshold (in Angstroms) to use when deduplicating conformers
+        :type RMSD_threshold: float
+        :param symmetry: if True symmetry is taken into account when comparing molecules
+        :type symmetry: bool
+        """
+
+        molecules = []
+        uploaded_keys = []
+        for (can, tasks, max_conf), keys in batch:
+            try:
+                extracted = {key: extractions[key].result() for key in keys}
+            except Exception as e:
+                logger.error(f"Descriptors could not be extracted for smiles: {can}, {e}. Skipping.")
+                continue
 
             if len(keys) > 1:
                 # deduplicate conformers
-                mols = [OBMol_from_done_slurm_job(done_jobs[key]) for key in keys]  # TODO
+                mols = [OBMol_from_can_and_geometry(can, _conformer_geometry(extracted[key][0])) for key in keys]
                 duplicates = deduplicate_list_of_OBMols(mols, RMSD_threshold=RMSD_threshold, symmetry=symmetry)
                 logger.info(f"Molecule {can} has {len(duplicates)} / {len(keys)} duplicate conformers.")
 
                 # fetch non-duplicate keys
-                can_keys_to_keep = [key for i, key in enumerate(keys) if i not in duplicates]
-            else:
-                can_keys_to_keep = keys
-            self._upload_can_to_db(can, tasks, meta, can_keys_to_keep, tag, max_n_conf)
-
-    def _upload_can_to_db(self, can, tasks, meta, keys, tags, max_conf) -> None:
-        """Uploading single molecule conformers to database.
-
-        :param db: database client
-        :type db: pymongo.MongoClient
-        :param can: canonical smiles
-        :type can: str
-        :param tasks: tuple of Gaussian tasks
-        :type tasks: tuple
-        :param keys: list of keys to the self.jobs dictionary to upload
-        :type keys: list
-        :param tags: metadata tag or tags
-        :type tags: str or list
-        :param max_conf: max number of conformers used for this molecule
-        :type max_conf: int
-        """
+                keys = [key for i, key in enumerate(keys) if i not in duplicates]
 
-        # check if the tag(s) are properly provided
-        assert isinstance(tags, (str, list))
-        if isinstance(tags, str):
-            tags = [tags]
-        assert all(len(t.strip()) > 0 for t in tags)
+            # check that all configs are the same
+            configs = [self.jobs[key].config for key in keys]
+            assert len(set([config.__repr__() for config in configs])) == 1
+            metadata = {'gaussian_config': configs[0], 'gaussian_tasks': tasks, 'max_num_conformers': max_conf}
+            metadata.update(meta)
 
-        # loop over the conformers
-        conformations = []
-        logs = []
-        configs = []
-        for key in keys:
-            # fetch job, verify that there are not can issues (just in case)
-            job = self.jobs[key]
-            assert job.can == can
-
-            # append job configs
-            configs.append(job.config)
-
-            # extract descriptors for this conformer from log file
-            log = f"{job.directory}/{job.base_name}.log"
-            le = gaussian_log_extractor(log)
-            # add descriptors to conformations list
-            conformations.append(le.get_descriptors())
-            logs.append(le.log)
-
-        # compute weights
-        free_energies = np.array(
-            [Hartree_in_kcal_per_mol * c['descriptors']['G'] for c in conformations])  # in kcal_mol
-        free_energies -= free_energies.min()  # to avoid huge exponentials
-        weights = np.exp(-free_energies / (k_in_kcal_per_mol_K * T))
-        weights /= weights.sum()
-
-        # check that all configs are the same
-        assert len(set([config.__repr__() for config in configs])) == 1
-        metadata = {'gaussian_config': configs[0], 'gaussian_tasks': tasks, 'max_num_conformers': max_conf}
-        metadata.update(meta)
-
-        mol_id = db_upload_molecule(can, tags, metadata, weights, conformations, logs)
-        logger.info(f"Uploaded descriptors to DB for smiles: {can}, number of conformers: {len(conformations)},"
-                    f" DB molecule id {mol_id}.")
-        for key in keys:
-            self.jobs[key].status = slurm_status.uploaded
+            for key in extracted:
+                _record_timings(self.jobs[key], extraction_time=extracted[key][1])
+
+            conformations = [extracted[key][0] for key in keys]
+            molecules.append({'can': can, 'tags': tags, 'metadata': metadata,
+                              'weights': _boltzmann_weights(conformations), 'conformations': conformations,
+                              'log_files': [f"{self.jobs[key].directory}/{self.jobs[key].base_name}.log"
+                                            for key in keys]})
+            uploaded_keys.append(keys)
+
+        if not molecules:
+            return
+
+        started = time.time()
+        mol_ids = db_upload_molecules(molecules, chunk_size=config['mongoDB'].get('upload_chunk_size', 500))
+        upload_time = (time.time() - started) / sum(len(keys) for keys in uploaded_keys)
+        for molecule, mol_id in zip(molecules, mol_ids):
+            logger.info(f"Uploaded descriptors to DB for smiles: {molecule['can']}, "
+                        f"number of conformers: {len(molecule['conformations'])}, DB molecule id {mol_id}.")
+
+        for keys in uploaded_keys:
+            for key in keys:
+                _record_timings(self.jobs[key], upload_time=upload_time)
+                self.jobs[key].status = lsf_status.uploaded
         self._cache()
 
     def get_jobs(self, status=None, can=None) -> dict:
@@ -1004,17 +2416,7 @@ class lsf_manager(object):
         :return: dict
         """
 
-        def match(job, status, can):
-            match = True
-            if status is not None:
-                match = match and job.status.value == status.value
-            if can is not None:
-                if isinstance(can, str):
-                    can = [can]
-                match = match and (job.can in can)
-            return match
-
-        return {name: job for name, job in self.jobs.items() if match(job, status, can)}
+        return self.jobs.select(status=status, can=can)
 
     def get_job_stats(self, split_by_can=False) -> pd.DataFrame:
         """Job stats for jobs currently under management, optionally split by canonical smiles.
@@ -1024,11 +2426,61 @@ class lsf_manager(object):
         :return: pandas.core.frame.DataFrame
         """
 
-        df = pd.DataFrame([[v.status.name, v.can] for v in self.jobs.values()], columns=['status', 'can'])
+        df = pd.DataFrame([[lsf_status(status).name, can, n] for status, can, n in self.jobs.count()],
+                          columns=['status', 'can', 'jobs'])
         if split_by_can:
-            return df.groupby(['status', 'can']).size().unstack(level=1).fillna(0).astype(int).T
+            return df.groupby(['status', 'can'])['jobs'].sum().unstack(level=1).fillna(0).astype(int).T
         else:
-            return df.groupby('status').size().to_frame('jobs').T
+            return df.groupby('status')['jobs'].sum().to_frame('jobs').T
+
+    def get_timing_stats(self) -> pd.DataFrame:
+        """Durations of the lifecycle phases of the jobs under management: queue wait, runtime, transfer of \
+        the log file, extraction of the descriptors, upload to the database and turnaround, and the CPU hours \
+        of each job, see :py:meth:`~metrics_functions.timing_frame`.
+
+        :return: pandas.core.frame.DataFrame
+        """
+
+        return timing_frame(dict(self.jobs.items()))
+
+    def get_metrics(self, window=86400.) -> str:
+        """Metrics of the jobs under management in the Prometheus text format: number of jobs by status, \
+        statistics of the durations of the lifecycle phases, throughput and CPU hours per molecule.
+
+        :param window: time window in seconds of the throughput
+        :type window: float
+        :return: str
+        """
+
+        job_counts = {status.name: 0 for status in lsf_status}
+        for status, can, n in self.jobs.count():
+            job_counts[lsf_status(status).name] += n
+        return format_prometheus(self.host, job_counts, summarize_timings(self.get_timing_stats(), window))
+
+    def export_metrics(self, path, window=86400.) -> None:
+        """Write the metrics of the jobs under management to a file in the Prometheus text format, \
+        e.g. in the directory of the textfile collector of the node exporter.
+
+        :param path: path of the metrics file
+        :type path: str
+        :param window: time window in seconds of the throughput
+        :type window: float
+        """
+
+        write_metrics_file(self.get_metrics(window), path)
+
+    def serve_metrics(self, port=9091, window=86400.) -> http.server.ThreadingHTTPServer:
+        """Serve the metrics of the jobs under management over HTTP in the Prometheus text format, \
+        in a background thread.
+
+        :param port: port to listen on
+        :type port: int
+        :param window: time window in seconds of the throughput
+        :type window: float
+        :return: http.server.ThreadingHTTPServer, call shutdown() to stop serving
+        """
+
+        return start_metrics_server(lambda: self.get_metrics(window), port)
 
     def remove_jobs(self, jobs) -> None:
         """Remove jobs.
@@ -1038,18 +2490,20 @@ class lsf_manager(object):
         """
 
         self.connect()
+        remote_commands = []
         for name, job in jobs.items():
             logger.debug(f"Removing job {name}.")
-            # remove local files
-            os.remove(f"{job.directory}/{job.base_name}.sh")  # slurm file
-            os.remove(f"{job.directory}/{job.base_name}.gjf")  # gaussian file
-            if os.path.exists(f"{job.directory}/{job.base_name}.log"):
-                os.remove(f"{job.directory}/{job.base_name}.log")  # log file
-            # remove remote files
-            self.connection.run(f"rm -f {self.remote_dir}/lsf.o{job.job_id}")
-            self.connection.run(f"rm -f {self.remote_dir}/{job.base_name}*")
+            # remove local files (slurm, gaussian and log file), jobs created in bulk have inputs in an archive
+            for ext in ["sh", "gjf", "log", "summary.json", "restart.log", "workflow.gjf"]:
+                if os.path.exists(f"{job.directory}/{job.base_name}.{ext}"):
+                    os.remove(f"{job.directory}/{job.base_name}.{ext}")
+            # remote files are removed in one round trip
+            remote_commands.append(f"rm -f lsf.o{job.job_id} {job.base_name}*")
             del self.jobs[name]
+        run_batched(self.connection, remote_commands, remote_dir=self.remote_dir, hide=True)
         self._cache()
+        _remove_unused_archives(self.jobs, set(job.archive for job in jobs.values()))
+        cleanup_empty_dirs(self.workdir)
 
     def bjobs(self, summary=True) -> pd.DataFrame:
         """Run 'bjobs -u $user' command on the server.
@@ -1069,6 +2523,49 @@ class lsf_manager(object):
             data = np.array(list(map(str.split, ret.stdout.splitlines())))
             return ret # pd.DataFrame(data[1:], columns=data[0])
 
+    def calibrate_resource_model(self, workflow_type="equilibrium") -> None:
+        """Calibrate the resource model on log files of jobs that finished successfully. Jobs created \
+        afterwards get processors, memory and wall time estimated by the calibrated model.
+
+        :param workflow_type: Gaussian workflow type of the finished jobs
+        :type workflow_type: str
+        """
+
+        finished_statuses = [lsf_status.done.value, lsf_status.uploaded.value]
+        log_files = [f"{job.directory}/{job.base_name}.log" for job in self.jobs.values()
+                     if job.status.value in finished_statuses]
+        model = resource_model('lsf')
+        model.calibrate([log for log in log_files if os.path.exists(log)], workflow_type)
+        self.resource_model = model
+
+    def fit_runtime_model(self) -> None:
+        """Fit the wall time of the resource model to the runtimes of the jobs of this host that finished \
+        successfully in their first submission, for each workflow type, see \
+        :py:meth:`~resource_functions.resource_model.fit_runtimes`. Jobs of the fitted workflow types created \
+        afterwards get wall times predicted from their number of basis functions and processors, their processors \
+        and memory are assigned as before.
+        """
+
+        runtimes = [(job.workflow_type, job.n_basis, job.n_processors, job.elapsed)
+                    for status in (lsf_status.done, lsf_status.uploaded) for job in self.jobs.select(status=status).values()
+                    if job.pack is None and job.n_submissions == 1]
+        model = self.resource_model or resource_model('lsf')
+        model.fit_runtimes(runtimes)
+        if model.runtime_fits:
+            self.resource_model = model
+        self.runtimes_fitted = True
+
+    def _get_resource_model(self) -> resource_model:
+        """Resource model of new jobs. If runtime_model is set in config.yml, the resource model is fitted to \
+        the runtimes of the finished jobs the first time it is needed.
+
+        :return: resource_model, None if resources are assigned as configured in config.yml
+        """
+
+        if not self.runtimes_fitted and config['lsf'].get('runtime_model', False):
+            self.fit_runtime_model()
+        return self.resource_model
+
     def _bkill(self) -> None:
         """Run 'bkill 0' command on the server. (kill all jobs from user)"""
 
@@ -1076,15 +2573,97 @@ class lsf_manager(object):
         self.connection.run(f"bkill 0")
         self.remove_jobs(self.get_jobs(status=lsf_status.submitted))
 
+    def _reconcile_submissions(self) -> None:
+        """Reconcile the submissions that were interrupted before their job ids were recorded, e.g. by a crash \
+        between bsub and the commit of the job store (see the journal of :py:class:`~job_store.job_store`). \
+        The jobs are looked up on the scheduler by job name, a job that was submitted is marked submitted \
+        with its job id, the other jobs keep their status and are submitted again."""
+
+        unconfirmed = {key: record for key, record in self.jobs.unconfirmed.items() if key in self.jobs}
+        self.jobs.confirm_submissions()
+        if not unconfirmed:
+            return
+
+        found = find_lsf_jobs(self.connection, self.user, set(record['job_name'] for record in unconfirmed.values()))
+
+        for key, record in unconfirmed.items():
+            job = self.jobs[key]
+            job_ids = [job_id for job_id in found.get(record['job_name'], [])
+                       if job_id != str(job.job_id).split('_')[0]]  # not the previous submission of the job
+            if not job_ids:
+                logger.warning(f"Job {key} was not submitted before the interruption, it will be submitted again.")
+                continue
+            job.job_id = f"{job_ids[-1]}_{record['task']}" if 'task' in record else job_ids[-1]
+            job.status = lsf_status.submitted
+            job.pack = record.get('pack')
+            job.n_submissions = job.n_submissions + 1
+            logger.info(f"Recovered the submission of job {key}, job_id: {job.job_id}.")
+
+        self._cache()
+
     def _cache(self) -> None:
-        """save jobs under management and cleanup empty directories"""
+        """save changes of the jobs under management"""
 
-        with open(self.cache_file, 'wb') as cf:
-            pickle.dump(self.jobs, cf)
+        self.jobs.commit()
 
-        cleanup_empty_dirs(self.workdir)
+    def _throttle_jobs(self, jobs) -> dict:
+        """Select the jobs to submit by priority (see :py:meth:`~queue_manager._prioritize_jobs`) within \
+        the max_queued_jobs limit of config.yml on the number of jobs queued on the host. Jobs beyond the limit \
+        are given status 'created', they are submitted by retrieve_jobs as slots of the queue free up.
+
+        :param jobs: dictionary of jobs to submit
+        :type jobs: dict
+        :return: dict of jobs to submit now, in order of priority
+        """
+
+        unfinished = [lsf_status.created.value, lsf_status.submitted.value, lsf_status.incomplete.value]
+        keys = _prioritize_jobs(jobs, self.jobs.count(), unfinished)
+        max_queued = config['lsf'].get('max_queued_jobs', 0)
+        if max_queued:
+            # jobs of a node pack share a job id and count once
+            n_queued = len(set(str(job.job_id) for job in self.get_jobs(lsf_status.submitted).values()))
+            n_free = max(0, max_queued - n_queued)
+            for key in keys[n_free:]:
+                jobs[key].status = lsf_status.created
+            if len(keys) > n_free:
+                logger.info(f"{n_queued} jobs are queued on {self.host}, holding back {len(keys) - n_free} "
+                            f"jobs until slots free up (max_queued_jobs: {max_queued}).")
+            keys = keys[:n_free]
+        return {key: jobs[key] for key in keys}
+
+    def _top_up_queue(self) -> None:
+        """Submit the jobs held back by the max_queued_jobs limit of config.yml as slots of the queue free up, \
+        with the options of their first submission. The options are kept in the job store, so that the jobs \
+        are submitted after a restart of the manager too."""
+
+        options = self.jobs.get_option('submit_options')
+        if options is not None and self.get_jobs(lsf_status.created):
+            self.jobs.set_option('submit_options', None)
+            self.submit_jobs(**options)
+
+    def _get_checkpoints(self) -> set:
+        """Names of the Gaussian checkpoint files kept on the remote host.
+
+        :return: set of file names
+        """
+
+        self.connect()
+        return get_remote_checkpoints(self.connection, self.remote_dir)
 
-    def _create_lsf_file_from_gaussian_file(self, base_name, directory) -> None:
+    def _get_wall_time(self, gig) -> str:
+        """Wall time for the jobs of a gaussian input generator, estimated by its resource model or taken \
+        from config.yml.
+
+        :param gig: gaussian input generator, after the Gaussian inputs have been generated
+        :type gig: gaussian_input_generator
+        :return: wall time in HH:MM format
+        """
+
+        if gig.resources['wall_time'] is None:
+            return config['lsf']['wall_time']
+        return format_wall_time(gig.resources['wall_time'], 'lsf')
+
+    def _create_lsf_file_from_gaussian_file(self, base_name, directory, wall_time=None) -> None:
         """Generate a single LSF submission file based on the Gaussian input file.
 
         :param base_name: base name of the Gaussian file
@@ -1096,24 +2675,400 @@ class lsf_manager(object):
         with open(f"{directory}/{base_name}.gjf") as f:
             file_string = f.read()
 
-        host = self.host.split(".")[0]
+        sh_file_path = f"{directory}/{base_name}.sh"
+        with open(sh_file_path, "w") as f:
+            f.write(self._create_lsf_script(base_name, file_string, wall_time))
+        convert_crlf_to_lf(sh_file_path)
+        logger.debug(f"Created a LSF job file in {sh_file_path}")
 
-        n_processors = re.search("nprocshared=(.*?)\n", file_string).group(1)
-        ram = int(config['lsf']['ram_per_processor'])
-        wall_time = config['lsf']['wall_time']
+    def _create_lsf_script(self, base_name, gaussian_input, wall_time=None) -> str:
+        """Generate the contents of a single LSF submission file based on the Gaussian input.
 
-        output = ""
-        output += f"#!/bin/bash\n"
-        output += f"#BSUB -n {n_processors}\n" \
-                  f"#BSUB -W {wall_time}\n" \
-                  f'#BSUB -R "rusage[mem={ram * 1024}]"\n'
+        :param base_name: base name of the Gaussian file
+        :param gaussian_input: contents of the Gaussian input file
+        :param wall_time: wall time of the job in HH:MM format, if None the LSF wall_time from config.yml is used
+        :return: LSF submission script
+        """
+
+        n_processors, ram = get_gaussian_resources(gaussian_input)
+
+        output = self._create_lsf_header(n_processors, ram, wall_time)
         output += f"input={base_name}\n\n"
         output += f"# run the code \n" \
                   f"cd {self.remote_dir}\n" \
                   f"g09 ${{input}}.gjf\n\n"
 
-        sh_file_path = f"{directory}/{base_name}.sh"
-        with open(sh_file_path, "w") as f:
-            f.write(output)
-        convert_crlf_to_lf(sh_file_path)
-        logger.debug(f"Created a LSF job file in {sh_file_path}")
\ No newline at end of file
+        return output
+
+    def _create_lsf_header(self, n_processors, ram, wall_time=None) -> str:
+        """Generate the resource requests of a LSF submission file.
+
+        :param n_processors: number of processors
+        :param ram: memory used by Gaussian in GB
+        :param wall_time: wall time of the job in HH:MM format, if None the LSF wall_time from config.yml is used
+        :return: str
+        """
+
+        # memory per processor in GB, rounded up
+        ram_per_processor = -(-ram // n_processors)
+        wall_time = wall_time or config['lsf']['wall_time']
+
+        output = ""
+        output += f"#!/bin/bash\n"
+        output += f"#BSUB -n {n_processors}\n" \
+                  f"#BSUB -W {wall_time}\n" \
+                  f'#BSUB -R "rusage[mem={ram_per_processor * 1024}]"\n'
+
+        return output
+
+
+class local_manager(slurm_manager):
+    """Local manager class, runs the jobs on this machine instead of a cluster. Jobs are created, resubmitted \
+    and uploaded like slurm jobs (they use the slurm resources from config.yml) and are kept in the same kind of \
+    job store, the scheduler is replaced by a pool of local processes running the Gaussian command. \
+    Jobs are started first in first out as long as the processors and memory they request are free."""
+
+    def __init__(self, command=None, max_processors=None, max_ram=None):
+        """Initialize local manager and load the cache file.
+
+        :param command: command that runs a Gaussian input file given as its last argument, e.g. 'g16', \
+        if None the local command from config.yml is used
+        :type command: str
+        :param max_processors: number of processors available to the jobs, if None the local max_processors \
+        from config.yml is used (0 for all processors of the machine)
+        :type max_processors: int
+        :param max_ram: memory available to the jobs in GB, if None the local max_ram from config.yml is used \
+        (0 for all memory of the machine)
+        :type max_ram: int
+        """
+
+        # set workdir and job store file
+        self.workdir = appdirs.user_data_dir(appauthor="autoqchem", appname="local")
+        self.cache_file = os.path.join(self.workdir, "local_manager.db")
+        os.makedirs(self.workdir, exist_ok=True)
+
+        # jobs under management, transitions since the last commit are recovered from the journal
+        self.jobs = job_store(self.cache_file, journal_file=os.path.join(self.workdir, "local_manager.journal"))
+
+        self.host = "localhost"
+        self.user = getpass.getuser()
+        self.remote_dir = os.path.join(self.workdir, "run")  # jobs run here, like in the remote dir of a cluster
+        self.connection = None
+        self.resource_model = None  # calibrated resource model, see calibrate_resource_model
+        self.runtimes_fitted = False  # the resource model has been fitted to job runtimes, see fit_runtime_model
+
+        self.command = command or config['local']['command']
+        max_processors = config['local']['max_processors'] if max_processors is None else max_processors
+        max_ram = config['local']['max_ram'] if max_ram is None else max_ram
+        self.max_processors = max_processors or os.cpu_count()
+        self.max_ram = max_ram or os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024 ** 3
+        self.poll_interval = config['local'].get('poll_interval', 1.)
+
+        # process pool state
+        self._lock = threading.Lock()
+        self._queue = deque()  # base names of the jobs waiting for resources
+        self._requests = {}  # base name -> requested processors and memory
+        self._running = {}  # base name -> process and its start time
+        self._dispatcher = None
+
+    def connect(self) -> None:
+        """Create the run directory, there is no remote host to connect to."""
+
+        os.makedirs(self.remote_dir, exist_ok=True)
+
+    def submit_jobs(self, array=False, max_concurrent=None, pack=False) -> None:
+        """Submit jobs that have status 'created' to the local process pool.
+
+        :param array: ignored, there are no job arrays in the local process pool
+        :type array: bool
+        :param max_concurrent: ignored, the number of running jobs is limited by the processors and memory
+        :type max_concurrent: int
+        :param pack: ignored, jobs are run concurrently as long as the processors and memory are free
+        :type pack: bool
+        """
+
+        jobs = self.get_jobs(slurm_status.created)
+        logger.info(f"Submitting {len(jobs)} jobs.")
+        self.submit_jobs_from_jobs_dict(jobs, array, max_concurrent, pack)
+
+    def submit_jobs_from_jobs_dict(self, jobs, array=False, max_concurrent=None, pack=False) -> None:
+        """Submit jobs to the local process pool. The submission options of a cluster are accepted so that \
+        the local manager can be driven like the other managers, they are ignored.
+
+        :param jobs: dictionary of jobs to submit
+        :type jobs: dict
+        :param array: ignored, there are no job arrays in the local process pool
+        :type array: bool
+        :param max_concurrent: ignored, the number of running jobs is limited by the processors and memory
+        :type max_concurrent: int
+        :param pack: ignored, jobs are run concurrently as long as the processors and memory are free
+        :type pack: bool
+        """
+
+        if not jobs:
+            return
+
+        if array or max_concurrent is not None or pack:
+            logger.debug("Job arrays and node packs are not supported by the local manager, submitting jobs "
+                         "to the process pool.")
+
+        self.connect()
+
+        # copy the input files into the run directory, jobs created in bulk have their inputs in an archive
+        for archive_path in set(job.archive for job in jobs.values() if job.archive is not None):
+            extract_from_archive(archive_path, [f"{job.base_name}.gjf" for job in jobs.values()
+                                                if job.archive == archive_path], self.remote_dir)
+        for job in jobs.values():
+            if job.archive is None:
+                shutil.copy(f"{job.directory}/{job.base_name}.gjf", self.remote_dir)
+
+        for name, job in jobs.items():
+            for ext in ["log", "done", "pid"]:  # files of a previous submission
+                if os.path.exists(f"{self.remote_dir}/{job.base_name}.{ext}"):
+                    os.remove(f"{self.remote_dir}/{job.base_name}.{ext}")
+            self._enqueue(job.base_name)
+            job.job_id = job.base_name
+            job.status = slurm_status.submitted
+            job.pack = None
+            job.n_submissions = job.n_submissions + 1
+            logger.info(f"Submitted job {name}, job_id: {job.job_id}.")
+
+        self._cache()
+
+    def retrieve_jobs(self) -> None:
+        """Retrieve finished jobs from the run directory and check which finished succesfully and which failed. \
+        Submitted jobs that are neither running nor waiting, because the process that submitted them has ended, \
+        are submitted to the pool again, unless their Gaussian process is still running. Jobs whose Gaussian \
+        process outlived the process that submitted them are retrieved from their log file once it has ended."""
+
+        submitted_jobs = self.get_jobs(slurm_status.submitted)
+        if not submitted_jobs:
+            logger.info(f"There are no jobs submitted to the process pool. Nothing to retrieve.")
+            return
+
+        with self._lock:
+            active = set(self._queue) | set(self._running)
+        for job in submitted_jobs.values():
+            if job.base_name in active or os.path.exists(f"{self.remote_dir}/{job.base_name}.done"):
+                continue
+            pid_file = f"{self.remote_dir}/{job.base_name}.pid"
+            if not os.path.exists(pid_file):
+                logger.info(f"Job {job.base_name} is not in the process pool, submitting it again.")
+                self._enqueue(job.base_name)
+            elif not self._is_orphan_running(job.base_name):
+                # the Gaussian process ended after the process that started it, its exit code is unknown
+                with open(pid_file) as f:
+                    start = json.load(f)['start']
+                log_file = f"{self.remote_dir}/{job.base_name}.log"
+                end = os.path.getmtime(log_file) if os.path.exists(log_file) else start
+                with open(f"{self.remote_dir}/{job.base_name}.done", "w") as f:
+                    json.dump({'exit_code': None, 'elapsed': max(0., end - start)}, f)
+                os.remove(pid_file)
+
+        finished_jobs = {name: job for name, job in submitted_jobs.items()
+                         if job.base_name not in active and os.path.exists(f"{self.remote_dir}/{job.base_name}.done")}
+
+        logger.info(f"There are {len(submitted_jobs) - len(finished_jobs)} running/pending jobs, "
+                    f"{len(finished_jobs)} finished jobs.")
+
+        done_jobs = 0
+        for job in finished_jobs.values():
+            with open(f"{self.remote_dir}/{job.base_name}.done") as f:
+                state = json.load(f)
+            job.scheduler_state = 'COMPLETED' if state['exit_code'] == 0 else 'FAILED'
+            if state['exit_code'] is None:  # the process outlived the local manager, see _is_orphan_running
+                job.scheduler_state = None
+            job.exit_code, job.elapsed = state['exit_code'], state['elapsed']
+
+            log_file = f"{self.remote_dir}/{job.base_name}.log"
+            if os.path.exists(log_file):
+                shutil.copy(log_file, job.directory)
+            elif os.path.exists(f"{job.directory}/{job.base_name}.log"):
+                os.remove(f"{job.directory}/{job.base_name}.log")  # log file of a previous submission
+            status = self._retrieve_single_job(job, fetch=False)
+            if status.value == slurm_status.done.value:
+                done_jobs += 1
+
+        if finished_jobs:
+            self._cache()
+            logger.info(f"{done_jobs} jobs finished successfully (all Gaussian steps finished normally)."
+                        f" {len(finished_jobs) - done_jobs} jobs failed.")
+
+    def _fetch_missing_logs(self, jobs) -> None:
+        """Log files are copied when the jobs are retrieved, there is nothing to fetch."""
+
+        pass
+
+    def _get_checkpoints(self) -> set:
+        """Names of the Gaussian checkpoint files in the run directory.
+
+        :return: set of file names
+        """
+
+        return set(os.path.basename(path) for path in glob.glob(f"{self.remote_dir}/*.chk"))
+
+    def remove_jobs(self, jobs) -> None:
+        """Remove jobs, running jobs are killed.
+
+        :param jobs: dictionary of jobs to remove
+        :type jobs: dict
+        """
+
+        base_names = set(job.base_name for job in jobs.values())
+        with self._lock:
+            self._queue = deque(base_name for base_name in self._queue if base_name not in base_names)
+            for base_name in base_names & set(self._running):
+                self._running[base_name][0].kill()
+            for base_name in base_names - set(self._running):
+                if self._is_orphan_running(base_name):
+                    with open(f"{self.remote_dir}/{base_name}.pid") as f:
+                        os.kill(json.load(f)['pid'], signal.SIGKILL)
+
+        for name, job in jobs.items():
+            logger.debug(f"Removing job {name}.")
+            # remove local files (slurm, gaussian and log file), jobs created in bulk have inputs in an archive
+            for ext in ["sh", "gjf", "log", "summary.json", "restart.log", "workflow.gjf"]:
+                if os.path.exists(f"{job.directory}/{job.base_name}.{ext}"):
+                    os.remove(f"{job.directory}/{job.base_name}.{ext}")
+            # remove files of the run directory
+            for file_name in glob.glob(f"{self.remote_dir}/{glob.escape(job.base_name)}.*"):
+                os.remove(file_name)
+            del self.jobs[name]
+        self._cache()
+        _remove_unused_archives(self.jobs, set(job.archive for job in jobs.values()))
+        cleanup_empty_dirs(self.workdir)
+
+    def squeue(self, summary=True) -> pd.DataFrame:
+        """Show the jobs of the process pool.
+
+        :param summary: if True only a summary frame is displayed with counts of jobs in each state
+        :return: pandas.core.frame.DataFrame
+        """
+
+        with self._lock:
+            df = pd.DataFrame([(base_name, 'RUNNING', self._requests[base_name][0], self._requests[base_name][1],
+                                time.time() - start) for base_name, (_, start) in self._running.items()] +
+                              [(base_name, 'PENDING', self._requests[base_name][0], self._requests[base_name][1], 0.)
+                               for base_name in self._queue],
+                              columns=['job', 'state', 'processors', 'ram', 'elapsed'])
+        if summary:
+            return df.groupby('state').size().to_frame("jobs").T
+        return df
+
+    def wait(self) -> None:
+        """Block until all jobs of the process pool have finished."""
+
+        while True:
+            with self._lock:
+                if not self._queue and not self._running:
+                    return
+            time.sleep(self.poll_interval)
+
+    def _create_slurm_header(self, n_processors, ram, wall_time) -> str:
+        """Generate the resource requests of a job file, the job files of local jobs are not submitted \
+        but hold the wall time used on resubmission.
+
+        :param n_processors: number of processors
+        :param ram: memory used by Gaussian in GB
+        :param wall_time: wall time of the job in HH:MM:SS format
+        :return: str
+        """
+
+        output = ""
+        output += f"#!/bin/bash\n"
+        output += f"#SBATCH -N 1\n" \
+                  f"#SBATCH --ntasks-per-node={n_processors}\n" \
+                  f"#SBATCH -t {wall_time}\n" \
+                  f"#SBATCH --mem={int(ram * 1.2) + 1}G\n\n"
+
+        return output
+
+    def _scancel(self) -> None:
+        """Kill all jobs of the process pool."""
+
+        self.remove_jobs(self.get_jobs(status=slurm_status.submitted))
+
+    def _is_orphan_running(self, base_name) -> bool:
+        """Check if the Gaussian process of a job started by an earlier process of the local manager is \
+        still running, from the pid file written when it was started.
+
+        :param base_name: base name of the Gaussian input file in the run directory
+        :return: bool
+        """
+
+        pid_file = f"{self.remote_dir}/{base_name}.pid"
+        if not os.path.exists(pid_file):
+            return False
+        with open(pid_file) as f:
+            pid = json.load(f)['pid']
+        try:
+            os.kill(pid, 0)
+        except OSError:  # no such process, or a process of another user that reused the pid
+            return False
+
+        # the pid may have been reused by another process
+        cmdline = f"/proc/{pid}/cmdline"
+        if os.path.exists(cmdline):
+            with open(cmdline, "rb") as f:
+                return f"{base_name}.gjf".encode() in f.read().split(b"\0")
+        return True
+
+    def _enqueue(self, base_name) -> None:
+        """Add a job to the queue of the process pool and start the dispatcher if it is not running.
+
+        :param base_name: base name of the Gaussian input file in the run directory
+        """
+
+        with open(f"{self.remote_dir}/{base_name}.gjf") as f:
+            n_processors, ram = get_gaussian_resources(f.read())
+
+        with self._lock:
+            # a job larger than the machine runs on its own
+            self._requests[base_name] = (min(n_processors, self.max_processors), min(ram, self.max_ram))
+            self._queue.append(base_name)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="autoqchem-local", daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch(self) -> None:
+        """Start queued jobs when their resources are free and record finished jobs, runs in a thread \
+        until the queue is empty and all jobs have finished. When a job ends a '.done' file holding its \
+        exit code and run time is written next to its log file."""
+
+        while True:
+            with self._lock:
+                for base_name, (process, start) in list(self._running.items()):
+                    if process.poll() is not None:
+                        with open(f"{self.remote_dir}/{base_name}.done", "w") as f:
+                            json.dump({'exit_code': process.returncode, 'elapsed': time.time() - start}, f)
+                        os.remove(f"{self.remote_dir}/{base_name}.pid")
+                        del self._running[base_name]
+
+                used_processors = sum(self._requests[base_name][0] for base_name in self._running)
+                used_ram = sum(self._requests[base_name][1] for base_name in self._running)
+                while self._queue:
+                    n_processors, ram = self._requests[self._queue[0]]
+                    if used_processors + n_processors > self.max_processors or used_ram + ram > self.max_ram:
+                        break
+                    base_name = self._queue.popleft()
+                    try:
+                        with open(f"{self.remote_dir}/{base_name}.out", "w") as out:
+                            process = subprocess.Popen(shlex.split(self.command) + [f"{base_name}.gjf"],
+                                                       cwd=self.remote_dir, stdout=out, stderr=subprocess.STDOUT)
+                    except OSError as e:  # e.g. the command does not exist
+                        logger.error(f"Could not start job {base_name}: {e}")
+                        with open(f"{self.remote_dir}/{base_name}.done", "w") as f:
+                            json.dump({'exit_code': 127, 'elapsed': 0.}, f)
+                        continue
+                    self._running[base_name] = (process, time.time())
+                    # the process outlives this one if it ends, the pid keeps it from being started twice
+                    with open(f"{self.remote_dir}/{base_name}.pid", "w") as f:
+                        json.dump({'pid': process.pid, 'start': self._running[base_name][1]}, f)
+                    used_processors += n_processors
+                    used_ram += ram
+
+                if not self._queue and not self._running:
+                    self._dispatcher = None
+                    return
+
+            time.sleep(self.poll_interval)
@@ -0,0 +1,129 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from autoqchem.archive_functions import download_files
+from autoqchem.gaussian_log_extractor import NegativeFrequencyException, NoGeometryException, \
+    OptimizationIncompleteException
+
+logger = logging.getLogger(__name__)
+
+runner_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "remote_runner.py")
+
+
+def extract_remote_summaries(connection, remote_dir, local_dirs, python="python3") -> dict:
+    """Summarize log files on the remote host with the extraction runner and fetch the summaries \
+    in one transfer. The runner compresses the log files, they can be fetched later with \
+    :py:meth:`~remote_functions.fetch_compressed_logs`.
+
+    :param connection: fabric.Connection to the remote host
+    :param remote_dir: remote directory of the log files
+    :type remote_dir: str
+    :param local_dirs: dictionary of job base name -> local directory to fetch the summary into
+    :type local_dirs: dict
+    :param python: python interpreter on the remote host
+    :type python: str
+    :return: dict of job base name -> summary
+    """
+
+    if not local_dirs:
+        return {}
+
+    name = f"remote_runner_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, f"{name}.txt"), "w") as f:
+            f.write("".join(f"{base_name}\n" for base_name in local_dirs))
+        connection.put(runner_path, f"{remote_dir}/remote_runner.py")
+        connection.put(os.path.join(tmp_dir, f"{name}.txt"), f"{remote_dir}/{name}.txt")
+    connection.run(f"cd {remote_dir} && {python} remote_runner.py {remote_dir} {name}.txt; "
+                   f"status=$?; rm -f {name}.txt; exit $status", hide=True)
+
+    fetched = download_files(connection, remote_dir,
+                             {f"{base_name}.summary.json": directory for base_name, directory in local_dirs.items()})
+
+    summaries = {}
+    for base_name, directory in local_dirs.items():
+        if f"{base_name}.summary.json" in fetched:
+            with open(os.path.join(directory, f"{base_name}.summary.json")) as f:
+                summaries[base_name] = json.load(f)
+    return summaries
+
+
+def raise_summary_exception(summary) -> None:
+    """Raise the exception that the extraction runner found in a log file, counterpart of \
+    :py:meth:`~gaussian_log_extractor.gaussian_log_extractor.check_for_exceptions`.
+
+    :param summary: summary of the log file
+    :type summary: dict
+    """
+
+    exceptions = {'NoGeometryException': NoGeometryException,
+                  'NegativeFrequencyException': NegativeFrequencyException,
+                  'OptimizationIncompleteException': OptimizationIncompleteException}
+
+    if summary['exception'] is not None:
+        raise exceptions[summary['exception']]()
+
+
+def fetch_compressed_logs(connection, remote_dir, local_dirs) -> set:
+    """Fetch log files compressed on the remote host by the extraction runner and decompress them locally.
+
+    :param connection: fabric.Connection to the remote host
+    :param remote_dir: remote directory of the log files
+    :type remote_dir: str
+    :param local_dirs: dictionary of job base name -> local directory of the log file
+    :type local_dirs: dict
+    :return: set of base names of the fetched log files
+    """
+
+    fetched = download_files(connection, remote_dir,
+                             {f"{base_name}.log.gz": directory for base_name, directory in local_dirs.items()})
+
+    base_names = set()
+    for base_name, directory in local_dirs.items():
+        compressed = os.path.join(directory, f"{base_name}.log.gz")
+        if f"{base_name}.log.gz" in fetched:
+            with gzip.open(compressed, "rb") as src, open(os.path.join(directory, f"{base_name}.log"), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(compressed)
+            base_names.add(base_name)
+
+    return base_names
+
+
+def remove_remote_outputs(connection, remote_dir, base_names, chunk_size=500) -> None:
+    """Remove the compressed log files and summaries that the extraction runner left for previous submissions \
+    of jobs, so that a resubmitted job is not summarized from the log of its previous run.
+
+    :param connection: fabric.Connection to the remote host
+    :param remote_dir: remote directory of the log files
+    :type remote_dir: str
+    :param base_names: base names of the jobs
+    :type base_names: list
+    :param chunk_size: maximum number of jobs per command
+    :type chunk_size: int
+    """
+
+    base_names = list(base_names)
+    for start in range(0, len(base_names), chunk_size):
+        files = " ".join(f"{base_name}.log.gz {base_name}.summary.json"
+                         for base_name in base_names[start:start + chunk_size])
+        connection.run(f"cd {remote_dir} && rm -f {files}", hide=True)
+
+
+def get_remote_checkpoints(connection, remote_dir) -> set:
+    """Names of the Gaussian checkpoint files kept on the remote host.
+
+    :param connection: fabric.Connection to the remote host
+    :param remote_dir: remote directory of the jobs
+    :type remote_dir: str
+    :return: set of file names
+    """
+
+    ret = connection.run(f"cd {remote_dir} && ls -1 | grep '\\.chk$'", hide=True, warn=True)
+    return set(ret.stdout.split())
@@ -0,0 +1,82 @@
+"""Self-contained extraction runner, executed next to the Gaussian log files on the remote host.
+
+Each log file is reduced to a small JSON summary holding what is needed to decide the status of its job, the number
+of normally terminated tasks and the exception found by the checks of
+:py:meth:`~gaussian_log_extractor.gaussian_log_extractor.check_for_exceptions`, and the log file is compressed,
+so that only the summaries are transferred when the jobs are retrieved. The runner uses the standard library only,
+so that it runs with any python 3 on the cluster::
+
+    python3 remote_runner.py <directory> <file with base names of the jobs, one per line>
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+
+
+def summarize(log) -> dict:
+    """Summarize a Gaussian log file, the checks follow gaussian_log_extractor.check_for_exceptions.
+
+    :param log: contents of the log file
+    :type log: str
+    :return: dict
+    """
+
+    summary = {'log_missing': False,
+               'n_tasks': len(re.findall("Normal termination", log)),
+               'exception': None}
+
+    # atom labels and geometry
+    z_matrices = re.findall("Multiplicity = \d\n(.*?)\n\s*\n", log, re.DOTALL)
+    geoms = re.findall("Standard orientation:.*?X\s+Y\s+Z\n(.*?)\n\s*Rotational constants", log, re.DOTALL)
+    if not z_matrices or not geoms:
+        summary['exception'] = 'NoGeometryException'
+        return summary
+
+    # frequencies of the 'freq' part
+    parts = {}
+    for part in re.split("\n\s-+\n\s#\s", log)[1:]:
+        name = re.search("^\w+", part)
+        if name is not None:
+            parts[name.group(0)] = part
+    freqs = [float(freq) for line in re.findall("Frequencies --(.*)", parts.get('freq', ""))
+             for freq in line.split()]
+
+    if not freqs:
+        summary['exception'] = 'OptimizationIncompleteException'
+    elif any(freq < 0. for freq in freqs):
+        summary['exception'] = 'NegativeFrequencyException'
+
+    return summary
+
+
+def main(directory, base_names_file) -> int:
+    with open(base_names_file) as f:
+        base_names = f.read().split()
+
+    for base_name in base_names:
+        log_path = os.path.join(directory, f"{base_name}.log")
+        if os.path.exists(log_path):
+            with open(log_path, errors="replace") as f:
+                summary = summarize(f.read())
+            # compress the log file, it is fetched later only if needed
+            with open(log_path, "rb") as src, gzip.open(f"{log_path}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(log_path)
+        elif os.path.exists(f"{log_path}.gz"):  # already summarized
+            with gzip.open(f"{log_path}.gz", "rt", errors="replace") as f:
+                summary = summarize(f.read())
+        else:
+            summary = {'log_missing': True, 'n_tasks': 0, 'exception': None}
+
+        with open(os.path.join(directory, f"{base_name}.summary.json"), "w") as f:
+            json.dump(summary, f)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:3]))
@@ -0,0 +1,265 @@
+import logging
+import math
+
+from autoqchem.gaussian_log_extractor import gaussian_log_extractor
+from autoqchem.helper_classes import config, lazy_module
+
+np = lazy_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+# approximate number of contracted basis functions per atom for each row of the periodic table
+# (H-He, Li-Ne, Na-Ar, K-Kr, Rb-Xe, Cs-Rn), Pople basis sets use cartesian d functions like Gaussian does,
+# ECP basis sets (LANL2DZ, SDD) only describe the valence electrons of the atoms below the 2nd row
+basis_functions_per_row = {
+    '3-21g': (2, 9, 13, 23, 31, 31),
+    '6-31g': (2, 9, 13, 23, 31, 31),
+    '6-31g*': (2, 15, 19, 29, 37, 37),
+    '6-31g(d)': (2, 15, 19, 29, 37, 37),
+    '6-31g**': (5, 15, 19, 29, 37, 37),
+    '6-31g(d,p)': (5, 15, 19, 29, 37, 37),
+    '6-31+g*': (2, 19, 23, 33, 41, 41),
+    '6-31+g(d)': (2, 19, 23, 33, 41, 41),
+    '6-31+g**': (5, 19, 23, 33, 41, 41),
+    '6-31+g(d,p)': (5, 19, 23, 33, 41, 41),
+    '6-311g**': (6, 18, 26, 36, 44, 44),
+    '6-311g(d,p)': (6, 18, 26, 36, 44, 44),
+    '6-311+g**': (6, 22, 30, 40, 48, 48),
+    '6-311+g(d,p)': (6, 22, 30, 40, 48, 48),
+    'cc-pvdz': (5, 14, 18, 43, 43, 43),
+    'cc-pvtz': (14, 30, 34, 68, 68, 68),
+    'def2svp': (5, 14, 18, 31, 31, 31),
+    'def2tzvp': (6, 31, 37, 61, 61, 61),
+    'lanl2dz': (2, 9, 8, 22, 22, 22),
+    'sdd': (2, 9, 8, 22, 22, 22),
+}
+
+# relative cost of the Gaussian workflows, compared to the 'equilibrium' workflow (opt, freq/NMR, TD)
+workflow_cost_factors = {'equilibrium': 1., 'transition_state': 1.2, 'test': 0.05}
+
+
+def get_row(atomic_number) -> int:
+    """Get the row of the periodic table for an atomic number.
+
+    :param atomic_number: atomic number
+    :return: int, row number starting from 1
+    """
+
+    for row, last_atomic_number in enumerate([2, 10, 18, 36, 54, 86], start=1):
+        if atomic_number <= last_atomic_number:
+            return row
+    return 7
+
+
+def get_basis_functions(atomic_number, basis_set) -> int:
+    """Approximate number of basis functions of a single atom for a given basis set.
+
+    :param atomic_number: atomic number
+    :param basis_set: basis set name, e.g. '6-31G*', 'def2-SVP', 'LANL2DZ'
+    :return: int
+    """
+
+    name = basis_set.lower().replace(" ", "").replace("def2-", "def2")
+    if name not in basis_functions_per_row:
+        logger.warning(f"Basis set {basis_set} is not known to the resource model, using 6-31G* basis set size.")
+        name = '6-31g*'
+    counts = basis_functions_per_row[name]
+    return counts[min(get_row(atomic_number), len(counts)) - 1]
+
+
+def estimate_basis_functions(atomic_numbers, light_basis_set, heavy_basis_set, max_light_atomic_number) -> int:
+    """Estimate the number of basis functions of a molecule, light elements are described with the light basis set, \
+    heavy elements with the heavy (typically ECP) basis set.
+
+    :param atomic_numbers: atomic numbers of all atoms of the molecule (including hydrogens)
+    :param light_basis_set: basis set to use for light elements
+    :param heavy_basis_set: basis set to use for heavy elements
+    :param max_light_atomic_number: maximum atomic number for light elements
+    :return: int
+    """
+
+    return sum(get_basis_functions(n, light_basis_set if n <= max_light_atomic_number else heavy_basis_set)
+               for n in atomic_numbers)
+
+
+def format_wall_time(hours, queue_system) -> str:
+    """Format wall time for a job submission file.
+
+    :param hours: wall time in hours
+    :param queue_system: 'slurm' (HH:MM:SS format) or 'lsf' (HH:MM format)
+    :return: str
+    """
+
+    minutes = int(math.ceil(hours * 60))
+    if queue_system == 'lsf':
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def parse_wall_time(wall_time) -> float:
+    """Parse wall time string in HH:MM:SS or HH:MM format.
+
+    :param wall_time: wall time string
+    :return: float, wall time in hours
+    """
+
+    parts = [int(p) for p in wall_time.split(":")] + [0]
+    return parts[0] + parts[1] / 60 + parts[2] / 3600
+
+
+class resource_model(object):
+    """Model of computational resources (processors, memory and wall time) of Gaussian jobs based on the \
+    number of basis functions. The cost of a job is modeled as cpu_hours = coefficient * (n_basis / 100) ** exponent, \
+    scaled by the workflow type. The coefficient and exponent can be calibrated from completed jobs, or fitted \
+    for each workflow type to the runtimes of finished jobs recorded in the job store. Their defaults are rough \
+    guesses, which is why the 'atoms' resource model stays the default of config.yml. Unless the model is \
+    calibrated or chosen in config.yml, only the wall times of the workflow types fitted to runtimes are \
+    estimated, processors and memory are assigned based on the number of atoms."""
+
+    def __init__(self, queue_system, coefficient=0.5, exponent=2.5):
+        """Initialize resource model with the limits of a queue system.
+
+        :param queue_system: 'slurm' or 'lsf', name of the section in config.yml
+        :type queue_system: str
+        :param coefficient: cpu hours of the equilibrium workflow for a molecule with 100 basis functions
+        :type coefficient: float
+        :param exponent: scaling exponent of the cpu time with the number of basis functions
+        :type exponent: float
+        """
+
+        self.queue_system = queue_system
+        self.coefficient = coefficient
+        self.exponent = exponent
+
+        queue_config = config[queue_system]
+        self.basis_functions_per_processor = queue_config.get('basis_functions_per_processor', 60)
+        self.max_processors = queue_config['max_processors']
+        self.ram_per_processor = queue_config['ram_per_processor']
+        self.max_ram = queue_config.get('max_ram', self.max_processors * self.ram_per_processor)
+        self.max_wall_time = parse_wall_time(queue_config['wall_time'])
+        self.min_wall_time = queue_config.get('min_wall_time', 1.)
+        self.parallel_efficiency = queue_config.get('parallel_efficiency', 0.8)
+        self.safety_factor = queue_config.get('wall_time_safety_factor', 1.5)
+        self.margin_sigmas = queue_config.get('wall_time_margin_sigmas', 2.)
+        self.min_runtimes = queue_config.get('runtime_model_min_jobs', 20)
+        self.runtime_fits = {}  # workflow type -> coefficient, exponent and safety factor fitted to job runtimes
+
+        # processors, memory and wall time of all jobs are estimated from the number of basis functions
+        self.use_basis_functions = queue_config.get('resource_model', 'atoms') == 'basis_functions'
+
+    def estimate(self, n_basis, workflow_type="equilibrium") -> dict:
+        """Estimate the resources of a job.
+
+        :param n_basis: number of basis functions
+        :type n_basis: int
+        :param workflow_type: Gaussian workflow type
+        :type workflow_type: str
+        :return: dict with n_processors, ram (in GB) and wall_time (in hours)
+        """
+
+        n_processors = max(1, min(self.max_processors, math.ceil(n_basis / self.basis_functions_per_processor)))
+
+        # memory per processor grows with the size of the basis, doubling at 1000 basis functions
+        ram = min(self.max_ram, math.ceil(n_processors * self.ram_per_processor * (1 + n_basis / 1000)))
+
+        return {'n_processors': n_processors, 'ram': ram,
+                'wall_time': self.estimate_wall_time(n_basis, n_processors, workflow_type)}
+
+    def estimates_wall_time(self, workflow_type) -> bool:
+        """Whether the wall time of jobs of a workflow type is estimated by the model, otherwise the wall_time \
+        of config.yml is used.
+
+        :param workflow_type: Gaussian workflow type
+        :type workflow_type: str
+        :return: bool
+        """
+
+        return self.use_basis_functions or workflow_type in self.runtime_fits
+
+    def estimate_wall_time(self, n_basis, n_processors, workflow_type="equilibrium") -> float:
+        """Estimate the wall time of a job, from the runtime fit of its workflow type if there is one.
+
+        :param n_basis: number of basis functions
+        :type n_basis: int
+        :param n_processors: number of processors of the job
+        :type n_processors: int
+        :param workflow_type: Gaussian workflow type
+        :type workflow_type: str
+        :return: float, wall time in hours
+        """
+
+        if workflow_type in self.runtime_fits:
+            coefficient, exponent, safety_factor = self.runtime_fits[workflow_type]
+            cpu_hours = coefficient * (n_basis / 100) ** exponent
+        else:
+            safety_factor = self.safety_factor
+            cpu_hours = (self.coefficient * (n_basis / 100) ** self.exponent *
+                         workflow_cost_factors.get(workflow_type, 1.))
+        wall_time = safety_factor * cpu_hours / (n_processors * self.parallel_efficiency)
+        return min(self.max_wall_time, max(self.min_wall_time, wall_time))
+
+    def calibrate(self, log_files, workflow_type="equilibrium") -> None:
+        """Fit the coefficient and exponent of the model from Gaussian log files of completed jobs \
+        with a linear regression of log(cpu time) on log(number of basis functions).
+
+        :param log_files: list of paths of log files of completed jobs
+        :type log_files: list
+        :param workflow_type: Gaussian workflow type of the jobs
+        :type workflow_type: str
+        """
+
+        points = []
+        for log_file in log_files:
+            stats = gaussian_log_extractor(log_file).get_run_statistics()
+            if stats['n_basis'] and stats['cpu_time']:
+                points.append((stats['n_basis'], stats['cpu_time'] / 3600))
+
+        if len(set(n for n, _ in points)) < 2:
+            logger.warning(f"Not enough completed jobs of different size to calibrate the resource model "
+                           f"({len(points)} usable log files). Keeping coefficient {self.coefficient} "
+                           f"and exponent {self.exponent}.")
+            return
+
+        x = np.log([n / 100 for n, _ in points])
+        y = np.log([t / workflow_cost_factors.get(workflow_type, 1.) for _, t in points])
+        exponent, intercept = np.polyfit(x, y, 1)
+        self.exponent, self.coefficient = float(exponent), float(np.exp(intercept))
+        self.use_basis_functions = True
+        logger.info(f"Calibrated resource model on {len(points)} jobs: coefficient {self.coefficient:.3f} "
+                    f"cpu hours, exponent {self.exponent:.2f}.")
+
+    def fit_runtimes(self, runtimes) -> None:
+        """Fit the cost of each workflow type to the runtimes of finished jobs with a linear regression of \
+        log(cpu time) on log(number of basis functions), the cpu time of a job being its runtime times its \
+        processors and the parallel efficiency. The wall time safety factor of a workflow type covers the spread \
+        of the runtimes around the fit, exp(wall_time_margin_sigmas * standard deviation of the log residuals), \
+        but is never smaller than wall_time_safety_factor, which covers the spread between the nodes of the host. \
+        A workflow type is fitted once it has at least runtime_model_min_jobs runtimes (config.yml).
+
+        :param runtimes: list of tuples of workflow type, number of basis functions, number of processors and \
+        runtime in seconds of finished jobs
+        :type runtimes: list
+        """
+
+        points = {}
+        for workflow_type, n_basis, n_processors, elapsed in runtimes:
+            if n_basis and n_processors and elapsed:
+                cpu_hours = elapsed / 3600 * n_processors * self.parallel_efficiency
+                points.setdefault(workflow_type, []).append((n_basis, cpu_hours))
+
+        for workflow_type, workflow_points in points.items():
+            if len(workflow_points) < max(3, self.min_runtimes) or len(set(n for n, _ in workflow_points)) < 2:
+                logger.debug(f"Not enough runtimes of {workflow_type} jobs of different size to fit their wall time "
+                             f"({len(workflow_points)} jobs).")
+                continue
+
+            x = np.log([n / 100 for n, _ in workflow_points])
+            y = np.log([t for _, t in workflow_points])
+            exponent, intercept = np.polyfit(x, y, 1)
+            residuals = y - (exponent * x + intercept)
+            sigma = float(np.sqrt(np.sum(residuals ** 2) / (len(residuals) - 2)))
+            safety_factor = max(self.safety_factor, float(np.exp(self.margin_sigmas * sigma)))
+            self.runtime_fits[workflow_type] = (float(np.exp(intercept)), float(exponent), safety_factor)
+            logger.info(f"Fitted {workflow_type} wall time on {len(workflow_points)} job runtimes: coefficient "
+                        f"{np.exp(intercept):.3f} cpu hours, exponent {exponent:.2f}, safety factor "
+                        f"{safety_factor:.2f}.")
@@ -0,0 +1,163 @@
+import logging
+import math
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# failures that are worth resubmitting even if the log file holds no geometry, from the input geometry
+retriable_failures = ('timeout', 'interrupted', 'out_of_memory', 'node_failure', 'scf_convergence')
+
+
+def classify_failure(log=None, scheduler_state=None, exception=None) -> str:
+    """Classify why a job did not complete, from the state reported by the scheduler and the log file.
+
+    :param log: contents of the log file, None if it is not available
+    :type log: str
+    :param scheduler_state: state reported by the scheduler when the job left the queue, e.g. 'TIMEOUT'
+    :type scheduler_state: str
+    :param exception: name of the exception found in the log file, e.g. 'NegativeFrequencyException'
+    :type exception: str
+    :return: str, one of 'timeout', 'out_of_memory', 'node_failure', 'negative_frequency', 'scf_convergence', \
+    'optimization_incomplete', 'link_error', 'interrupted' (the log file ends abruptly) and 'unknown'
+    """
+
+    if scheduler_state in ('TIMEOUT', 'DEADLINE'):
+        return 'timeout'
+    if scheduler_state == 'OUT_OF_MEMORY':
+        return 'out_of_memory'
+    if scheduler_state in ('NODE_FAIL', 'BOOT_FAIL', 'PREEMPTED'):
+        return 'node_failure'
+    if exception == 'NegativeFrequencyException':
+        return 'negative_frequency'
+    if log is None:
+        return 'optimization_incomplete' if exception == 'OptimizationIncompleteException' else 'unknown'
+
+    if re.search("galloc: could not allocate memory|Out-of-memory error|could not allocate memory", log):
+        return 'out_of_memory'
+    if re.search("Convergence failure -- run terminated", log):
+        return 'scf_convergence'
+    if re.search("Number of steps exceeded|Optimization stopped", log):
+        return 'optimization_incomplete'
+    if re.search("Error termination", log):
+        return 'link_error'
+    if not re.search("termination", log[-2000:]):
+        return 'interrupted'  # killed from outside, e.g. by the run time limit of the scheduler
+    if exception == 'OptimizationIncompleteException':
+        return 'optimization_incomplete'
+    return 'unknown'
+
+
+def decide_resubmission(reason, resources, limits, history=None) -> dict:
+    """Decide how to resubmit a job that did not complete. Jobs that ran out of time get more wall time, \
+    then more processors, jobs that ran out of memory get more memory, SCF convergence failures are retried \
+    with quadratically convergent SCF, optimizations that ended at a saddle point are restarted from a geometry \
+    displaced along the imaginary mode. Jobs that would fail the same way again are given up.
+
+    :param reason: failure reason, see :py:meth:`~resubmission_functions.classify_failure`
+    :type reason: str
+    :param resources: resources of the previous submission, dict with n_processors, ram (in GB) and \
+    wall_time (in hours)
+    :type resources: dict
+    :param limits: dict with max_processors, max_ram (in GB), max_wall_time (in hours), wall_time_factor, \
+    ram_factor and displacement (in Angstrom)
+    :type limits: dict
+    :param history: previous decisions for the job
+    :type history: list
+    :return: dict with the reason, the action ('resubmit', 'escalate_wall_time', 'escalate_processors', \
+    'escalate_memory', 'scf_qc', 'perturb_geometry' or 'give_up'), the resources of the resubmission, \
+    whether the job may be restarted from its checkpoint files, the displacement and the time of the decision
+    """
+
+    history = history or []
+    n_processors, ram, wall_time = resources['n_processors'], resources['ram'], resources['wall_time']
+    decision = {'reason': reason, 'action': 'resubmit', 'restart': True, 'displacement': None}
+
+    if reason in ('timeout', 'interrupted'):
+        if wall_time < limits['max_wall_time']:
+            decision['action'] = 'escalate_wall_time'
+            wall_time = min(limits['max_wall_time'], wall_time * limits['wall_time_factor'])
+        elif n_processors < limits['max_processors']:
+            decision['action'] = 'escalate_processors'
+            factor = min(limits['max_processors'], 2 * n_processors) / n_processors
+            n_processors = int(n_processors * factor)
+            ram = min(limits['max_ram'], int(math.ceil(ram * factor)))
+        else:
+            decision['action'] = 'give_up'
+
+    elif reason == 'out_of_memory':
+        if ram < limits['max_ram']:
+            decision['action'] = 'escalate_memory'
+            ram = min(limits['max_ram'], int(math.ceil(ram * limits['ram_factor'])))
+        else:
+            decision['action'] = 'give_up'
+
+    elif reason == 'scf_convergence':
+        tried = any(previous['action'] == 'scf_qc' for previous in history)
+        decision['action'] = 'give_up' if tried else 'scf_qc'
+        decision['restart'] = False
+
+    elif reason == 'negative_frequency':
+        n_perturbed = sum(previous['action'] == 'perturb_geometry' for previous in history)
+        decision['action'] = 'perturb_geometry'
+        decision['displacement'] = limits['displacement'] * (n_perturbed + 1)
+        decision['restart'] = False
+
+    elif reason == 'link_error':
+        decision['action'] = 'give_up'
+
+    elif reason == 'unknown':
+        if history and history[-1]['reason'] == 'unknown':
+            decision['action'] = 'give_up'
+
+    decision.update({'n_processors': n_processors, 'ram': ram, 'wall_time': wall_time, 'time': time.time()})
+    return decision
+
+
+def set_gaussian_resources(gaussian_input, n_processors, ram) -> str:
+    """Set the processors and memory of all tasks of a Gaussian input.
+
+    :param gaussian_input: contents of the Gaussian input file
+    :type gaussian_input: str
+    :param n_processors: number of processors
+    :type n_processors: int
+    :param ram: memory in GB
+    :type ram: int
+    :return: str
+    """
+
+    gaussian_input = re.sub("%nprocshared=\d+", f"%nprocshared={n_processors}", gaussian_input)
+    return re.sub("%Mem=\d+GB", f"%Mem={ram}GB", gaussian_input)
+
+
+def use_scf_qc(gaussian_input) -> str:
+    """Switch the tasks of a Gaussian input to the quadratically convergent SCF procedure (scf=qc).
+
+    :param gaussian_input: contents of the Gaussian input file
+    :type gaussian_input: str
+    :return: str
+    """
+
+    def replace(match):
+        route = match.group(0)
+        if re.search("\\bscf=", route, re.IGNORECASE):
+            return re.sub("\\bscf=(\([^)]*\)|\w+)", "scf=qc", route, flags=re.IGNORECASE)
+        return f"{route} scf=qc"
+
+    return re.sub("^#.*$", replace, gaussian_input, flags=re.MULTILINE)
+
+
+def displace_geometry(coords, mode, displacement) -> list:
+    """Displace a geometry along a normal mode, e.g. the imaginary mode of a saddle point.
+
+    :param coords: list of x, y, z coordinates of the atoms
+    :type coords: list
+    :param mode: list of x, y, z displacements of the atoms in the normal mode
+    :type mode: list
+    :param displacement: length of the displacement in Angstrom
+    :type displacement: float
+    :return: list of x, y, z coordinates of the atoms
+    """
+
+    norm = math.sqrt(sum(d ** 2 for vector in mode for d in vector)) or 1.
+    return [[c + displacement * d / norm for c, d in zip(atom, vector)] for atom, vector in zip(coords, mode)]
@@ -0,0 +1,236 @@
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# scheduler states of jobs that are waiting or running
+slurm_active_states = {'PENDING', 'RUNNING', 'CONFIGURING', 'COMPLETING', 'SUSPENDED', 'REQUEUED', 'REQUEUE_FED',
+                       'REQUEUE_HOLD', 'RESIZING', 'SIGNALING', 'STAGE_OUT', 'STOPPED', 'RESV_DEL_HOLD'}
+lsf_active_states = {'PEND', 'RUN', 'PSUSP', 'USUSP', 'SSUSP', 'WAIT', 'PROV', 'UNKWN'}
+
+
+class SchedulerQueryException(Exception):
+    """Raised when the scheduler cannot be queried, e.g. because its controller does not respond. The state
+    of the jobs is unknown, they must not be taken as finished."""
+    pass
+
+
+def _chunks(items, chunk_size) -> list:
+    """Split a list into chunks of at most chunk_size items."""
+
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+
+def parse_slurm_elapsed(elapsed) -> float:
+    """Convert a slurm duration ([D-]HH:MM:SS, MM:SS or MM:SS.mmm) to seconds.
+
+    :param elapsed: slurm duration
+    :type elapsed: str
+    :return: float, None if the duration cannot be parsed
+    """
+
+    match = re.fullmatch("(?:(\d+)-)?(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)", elapsed.strip())
+    if match is None:
+        return None
+    days, hours, minutes, seconds = match.groups()
+    return int(days or 0) * 86400 + int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def slurm_outcome(state, exit_code=None) -> str:
+    """Classify a slurm job state.
+
+    :param state: slurm job state, e.g. 'COMPLETED', 'TIMEOUT'
+    :type state: str
+    :param exit_code: exit code of the job script
+    :type exit_code: int
+    :return: str, one of 'running', 'completed', 'timeout', 'cancelled', 'failed'
+    """
+
+    if state in slurm_active_states:
+        return 'running'
+    if state == 'COMPLETED':
+        return 'completed' if not exit_code else 'failed'
+    if state in ('TIMEOUT', 'DEADLINE'):
+        return 'timeout'
+    if state == 'CANCELLED':
+        return 'cancelled'
+    return 'failed'  # FAILED, NODE_FAIL, OUT_OF_MEMORY, BOOT_FAIL, PREEMPTED
+
+
+def lsf_outcome(state, exit_code=None, exit_reason="") -> str:
+    """Classify a lsf job state.
+
+    :param state: lsf job state, e.g. 'DONE', 'EXIT'
+    :type state: str
+    :param exit_code: exit code of the job script
+    :type exit_code: int
+    :param exit_reason: exit reason reported by bjobs, e.g. 'TERM_RUNLIMIT: job killed after reaching LSF run time limit'
+    :type exit_reason: str
+    :return: str, one of 'running', 'completed', 'timeout', 'cancelled', 'failed'
+    """
+
+    if state in lsf_active_states:
+        return 'running'
+    if state == 'DONE':
+        return 'completed' if not exit_code else 'failed'
+    if 'RUNLIMIT' in exit_reason:
+        return 'timeout'
+    if 'TERM_OWNER' in exit_reason or 'TERM_ADMIN' in exit_reason:
+        return 'cancelled'
+    return 'failed'
+
+
+def query_slurm_jobs(connection, job_ids, chunk_size=500) -> dict:
+    """Query the state of the given slurm jobs only, in chunks of job ids. Jobs in the queue are queried \
+    with squeue, jobs that have left the queue with sacct (if accounting is enabled on the cluster). \
+    Jobs unknown to both are missing from the result. Raises a SchedulerQueryException if squeue or sacct \
+    fail for another reason than unknown job ids or disabled accounting.
+
+    :param connection: fabric.Connection to the remote host
+    :param job_ids: job ids, array tasks as 'arrayid_taskid'
+    :type job_ids: list
+    :param chunk_size: maximum number of job ids per command
+    :type chunk_size: int
+    :return: dict of job id -> dict with the state, exit_code, elapsed time in seconds and outcome \
+    (see :py:meth:`~scheduler_functions.slurm_outcome`) of the job
+    """
+
+    job_ids = list(dict.fromkeys(map(str, job_ids)))
+    states = {}
+
+    # jobs in the queue, squeue fails if none of the jobs of a chunk is known
+    for chunk in _chunks(job_ids, chunk_size):
+        ret = connection.run(f"squeue -h -r -j {','.join(chunk)} -o %i,%T,%M", hide=True, warn=True)
+        if ret.failed and "Invalid job id" not in ret.stderr:
+            raise SchedulerQueryException(f"squeue failed: {ret.stderr.strip()}")
+        for line in ret.stdout.splitlines():
+            fields = line.strip().split(',')
+            if len(fields) == 3 and fields[0] in chunk:
+                states[fields[0]] = {'state': fields[1], 'exit_code': None,
+                                     'elapsed': parse_slurm_elapsed(fields[2]),
+                                     'outcome': slurm_outcome(fields[1])}
+
+    # jobs that have left the queue
+    for chunk in _chunks([job_id for job_id in job_ids if job_id not in states], chunk_size):
+        ret = connection.run(f"sacct -n -P -X -j {','.join(chunk)} --format=JobID,State,ExitCode,Elapsed",
+                             hide=True, warn=True)
+        if ret.failed:
+            if "accounting storage is disabled" not in ret.stderr:
+                raise SchedulerQueryException(f"sacct failed: {ret.stderr.strip()}")
+            logger.debug(f"sacct failed: {ret.stderr.strip()}")
+            break
+        for line in ret.stdout.splitlines():  # the last line of a requeued job is its latest run
+            fields = line.strip().split('|')
+            if len(fields) == 4 and fields[0] in chunk:
+                state = fields[1].split()[0] if fields[1] else ""  # e.g. 'CANCELLED by 1234'
+                exit_code = int(fields[2].split(':')[0]) if fields[2][:1].isdigit() else None
+                states[fields[0]] = {'state': state, 'exit_code': exit_code,
+                                     'elapsed': parse_slurm_elapsed(fields[3]),
+                                     'outcome': slurm_outcome(state, exit_code)}
+
+    return states
+
+
+def query_lsf_jobs(connection, job_ids, chunk_size=500) -> dict:
+    """Query the state of the given lsf jobs only, in chunks of job ids, with bjobs JSON output. Finished jobs \
+    are known to bjobs for the CLEAN_PERIOD of the cluster, jobs unknown to bjobs are missing from the result. \
+    Raises a SchedulerQueryException if the output of bjobs cannot be parsed, e.g. when the batch system \
+    does not respond.
+
+    :param connection: fabric.Connection to the remote host
+    :param job_ids: job ids
+    :type job_ids: list
+    :param chunk_size: maximum number of job ids per command
+    :type chunk_size: int
+    :return: dict of job id -> dict with the state, exit_code, elapsed time in seconds and outcome \
+    (see :py:meth:`~scheduler_functions.lsf_outcome`) of the job
+    """
+
+    job_ids = list(dict.fromkeys(map(str, job_ids)))
+    states = {}
+
+    for chunk in _chunks(job_ids, chunk_size):
+        ret = connection.run(f"bjobs -o 'jobid stat exit_code exit_reason run_time' -json {' '.join(chunk)}",
+                             hide=True, warn=True)
+        try:
+            records = json.loads(ret.stdout).get('RECORDS', [])
+        except ValueError:
+            raise SchedulerQueryException(f"Could not parse bjobs output: {ret.stderr.strip() or ret.stdout[:200]}")
+
+        for record in records:
+            job_id = record.get('JOBID')
+            if 'ERROR' in record or job_id not in chunk:  # e.g. 'Job <123> is not found'
+                continue
+            state = record.get('STAT', "")
+            exit_code = int(record['EXIT_CODE']) if str(record.get('EXIT_CODE', "")).isdigit() else None
+            exit_reason = record.get('EXIT_REASON', "")
+            run_time = re.match("(\d+)", record.get('RUN_TIME', ""))
+            states[job_id] = {'state': state, 'exit_code': exit_code,
+                              'elapsed': float(run_time.group(1)) if run_time else None,
+                              'outcome': lsf_outcome(state, exit_code, exit_reason)}
+
+    return states
+
+
+def find_slurm_jobs(connection, user, names, since=None) -> dict:
+    """Find the slurm jobs of a user by job name, jobs in the queue with squeue and jobs that have left \
+    the queue with sacct (if accounting is enabled on the cluster). Array jobs are reported by their array id.
+
+    :param connection: fabric.Connection to the remote host
+    :param user: username at the remote host
+    :type user: str
+    :param names: job names, the default job name of a job is the file name of its submission script
+    :type names: set
+    :param since: (optional) unix time of the earliest submission to consider in the accounting
+    :type since: float
+    :return: dict of job name -> list of job ids, in ascending order
+    """
+
+    job_ids = {}
+
+    ret = connection.run(f"squeue -h -u {user} -o %i,%j", hide=True, warn=True)
+    lines = ret.stdout.splitlines()
+    start = f"-S {time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(since))}" if since is not None else ""
+    ret = connection.run(f"sacct -n -P -X -u {user} {start} --format=JobID,JobName", hide=True, warn=True)
+    if ret.failed:
+        logger.debug(f"sacct failed: {ret.stderr.strip()}")
+    else:
+        lines += [line.replace('|', ',', 1) for line in ret.stdout.splitlines()]
+
+    for line in lines:
+        fields = line.strip().split(',', 1)
+        if len(fields) == 2 and fields[1] in names:
+            job_id = fields[0].split('_')[0]  # array tasks, e.g. 123_4 or 123_[5-9]
+            if job_id.isdigit():
+                job_ids.setdefault(fields[1], set()).add(job_id)
+
+    return {name: sorted(ids, key=int) for name, ids in job_ids.items()}
+
+
+def find_lsf_jobs(connection, user, names) -> dict:
+    """Find the lsf jobs of a user by job name, with bjobs JSON output. Finished jobs are known to bjobs \
+    for the CLEAN_PERIOD of the cluster.
+
+    :param connection: fabric.Connection to the remote host
+    :param user: username at the remote host
+    :type user: str
+    :param names: job names
+    :type names: set
+    :return: dict of job name -> list of job ids, in ascending order
+    """
+
+    ret = connection.run(f"bjobs -u {user} -a -o 'jobid job_name' -json", hide=True, warn=True)
+    try:
+        records = json.loads(ret.stdout).get('RECORDS', [])
+    except ValueError:
+        logger.warning(f"Could not parse bjobs output: {ret.stderr.strip() or ret.stdout[:200]}")
+        return {}
+
+    job_ids = {}
+    for record in records:
+        if record.get('JOB_NAME') in names and str(record.get('JOBID', "")).isdigit():
+            job_ids.setdefault(record['JOB_NAME'], set()).add(record['JOBID'])
+
+    return {name: sorted(ids, key=int) for name, ids in job_ids.items()}
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+
+from autoqchem.helper_classes import lazy_module
+from autoqchem.helper_functions import pybel
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+# maximum number of entries kept in each of the caches
+cache_size = 4096
+
+
+@lru_cache(maxsize=cache_size)
+def canonical_smiles(input, input_format="smi") -> str:
+    """Get the canonical smiles of a molecule string, repeated calls with the same input are served from cache.
+
+    :param input: molecule string
+    :type input: str
+    :param input_format: any format supported by OpenBabel, e.g. 'smi', 'can', 'inchi', etc.
+    :type input_format: str
+    :return: canonical smiles
+    """
+
+    return _write_can(_read_string(input, input_format))
+
+
+def OBMol_from_can(can) -> pybel.ob.OBMol:
+    """Create OBMol object from a canonical smiles. The smiles is parsed once and kept as a template, \
+    each call returns a new copy of the template, which the caller is free to modify.
+
+    :param can: canonical smiles
+    :type can: str
+    :return: openbabel.OBMol
+    """
+
+    return pybel.ob.OBMol(_OBMol_template(can))
+
+
+def pybel_molecule_from_can(can) -> pybel.Molecule:
+    """Create pybel.Molecule object from a canonical smiles using the cached template.
+
+    :param can: canonical smiles
+    :type can: str
+    :return: pybel.Molecule
+    """
+
+    return pybel.Molecule(OBMol_from_can(can))
+
+
+def get_cache_stats() -> pd.DataFrame:
+    """Hit and miss statistics of the smiles caches.
+
+    :return: pandas.core.frame.DataFrame
+    """
+
+    stats = {}
+    for name, func in [('canonical_smiles', canonical_smiles), ('OBMol_templates', _OBMol_template)]:
+        info = func.cache_info()
+        calls = info.hits + info.misses
+        stats[name] = {'hits': info.hits,
+                       'misses': info.misses,
+                       'hit_rate': info.hits / calls if calls else 0.,
+                       'size': info.currsize,
+                       'max_size': info.maxsize}
+    return pd.DataFrame.from_dict(stats, orient="index")
+
+
+def clear_caches() -> None:
+    """Empty the smiles caches and reset their statistics."""
+
+    canonical_smiles.cache_clear()
+    _OBMol_template.cache_clear()
+    logger.debug("Smiles caches cleared.")
+
+
+@lru_cache(maxsize=cache_size)
+def _OBMol_template(can) -> pybel.ob.OBMol:
+    """Parse a canonical smiles into an OBMol template. Templates are shared, they must not be modified.
+
+    :param can: canonical smiles
+    :return: openbabel.OBMol
+    """
+
+    return _read_string(can, "can")
+
+
+def _read_string(input, input_format) -> pybel.ob.OBMol:
+    """Read an OBMol object from a string with a private converter.
+
+    :param input: molecule string
+    :param input_format: any format supported by OpenBabel
+    :return: openbabel.OBMol
+    """
+
+    conv = pybel.ob.OBConversion()
+    conv.SetInFormat(input_format)
+    mol = pybel.ob.OBMol()
+    conv.ReadString(mol, input)
+    return mol
+
+
+def _write_can(mol) -> str:
+    """Write canonical smiles of an OBMol object with a private converter.
+
+    :param mol: OBMol object
+    :return: canonical smiles
+    """
+
+    conv = pybel.ob.OBConversion()
+    conv.SetOutFormat("can")
+    return conv.WriteString(mol).strip()
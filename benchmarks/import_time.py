@@ -0,0 +1,73 @@
+"""Import time benchmark for autoqchem modules.
+
+Every module is imported in a fresh interpreter, the import time is measured and the heavy dependencies that got
+imported along the way are listed. The script exits with a non-zero code if a module imports a heavy dependency
+eagerly or if its import takes longer than the allowed maximum, so it can be used to guard against regressions::
+
+    python benchmarks/import_time.py --max-seconds 0.5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+modules = ['helper_classes', 'helper_functions', 'smiles_cache', 'descriptor_functions', 'gaussian_log_extractor',
+           'gaussian_input_generator', 'openbabel_functions', 'molecule', 'db_functions', 'archive_functions',
+           'resource_functions', 'packing_functions', 'remote_functions', 'resubmission_functions', 'scheduler_functions',
+           'metrics_functions', 'job_journal', 'job_store', 'queue_manager', 'job_daemon', 'federation']
+
+heavy_dependencies = ['pandas', 'numpy', 'scipy', 'openbabel', 'pybel', 'rdkit', 'pymongo', 'fabric', 'paramiko']
+
+probe = """
+import json, sys, time
+start = time.perf_counter()
+import autoqchem.{module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeats) -> dict:
+    """Import a module in fresh interpreters and report the best import time and the heavy dependencies imported.
+
+    :param module: autoqchem module name
+    :param repeats: number of fresh interpreters to use
+    :return: dict
+    """
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+
+    results = []
+    for _ in range(repeats):
+        ret = subprocess.run([sys.executable, "-c", probe.format(module=module, heavy=heavy_dependencies)],
+                             capture_output=True, text=True, env=env, check=True)
+        results.append(json.loads(ret.stdout.splitlines()[-1]))
+
+    return {'seconds': min(r['seconds'] for r in results), 'heavy': results[0]['heavy']}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-seconds", type=float, default=0.5, help="maximum allowed import time of a module")
+    parser.add_argument("--repeats", type=int, default=3, help="number of measurements per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in modules:
+        result = measure(module, args.repeats)
+        problems = []
+        if result['heavy']:
+            problems.append(f"eagerly imports {', '.join(result['heavy'])}")
+        if result['seconds'] > args.max_seconds:
+            problems.append(f"slower than {args.max_seconds:.3f}s")
+        failed = failed or bool(problems)
+        print(f"autoqchem.{module:<26} {result['seconds']:.3f}s  {'; '.join(problems) or 'ok'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""End to end benchmark of the job pipeline on the local manager.
+
+Jobs are created for a set of molecules and driven through submission and retrieval by the job daemon, with the
+Gaussian executable replaced by benchmarks/replay_gaussian.py. The wall time of each stage is reported, together with
+the orchestration overhead, the wall time above what the simulated run times would take on the available processors::
+
+    python benchmarks/local_pipeline.py --molecules 20 --delay 1 --processors 8
+"""
+
+import argparse
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+
+smiles = ['CCO', 'CCCO', 'CCCCO', 'CC(C)O', 'CC(=O)C', 'CCOC', 'CC(=O)O', 'CCN', 'CCCN', 'c1ccccc1',
+          'Cc1ccccc1', 'Oc1ccccc1', 'Nc1ccccc1', 'CC#N', 'C1CCCCC1', 'C1CCOC1', 'CCCl', 'CCBr', 'OCCO', 'CC=C']
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--molecules", type=int, default=10, help="number of molecules")
+    parser.add_argument("--conformers", type=int, default=1, help="maximum number of conformers per molecule")
+    parser.add_argument("--delay", type=float, default=1., help="simulated run time of a job in seconds")
+    parser.add_argument("--processors", type=int, default=0, help="processors of the process pool, 0 for all")
+    parser.add_argument("--poll", type=float, default=0.5, help="minimum poll interval of the job daemon in seconds")
+    args = parser.parse_args()
+
+    # isolated work directory of the local manager
+    os.environ['XDG_DATA_HOME'] = tempfile.mkdtemp(prefix="autoqchem_benchmark_")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    logging.basicConfig(level=logging.WARNING)
+
+    from autoqchem.job_daemon import job_daemon
+    from autoqchem.molecule import molecule
+    from autoqchem.queue_manager import local_manager
+
+    replay = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_gaussian.py")
+    manager = local_manager(command=f"{sys.executable} {replay} --delay {args.delay}",
+                            max_processors=args.processors or None)
+    manager.poll_interval = min(manager.poll_interval, args.poll)
+
+    start = time.perf_counter()
+    molecules = [molecule(smiles[i % len(smiles)], max_num_conformers=args.conformers)
+                 for i in range(args.molecules)]
+    manager.create_jobs_for_molecules(molecules, "benchmark")
+    created = time.perf_counter()
+
+    job_daemon(manager, min_poll_interval=args.poll, max_poll_interval=args.poll).start()
+    finished = time.perf_counter()
+
+    jobs = list(manager.jobs.values())
+    run_time = sum(job.elapsed or 0. for job in jobs)
+    processors = [int(open(f"{manager.remote_dir}/{job.base_name}.gjf").read().split("%nprocshared=")[1].split()[0])
+                  for job in jobs]
+    ideal = math.ceil(sum(processors) / manager.max_processors) * args.delay
+
+    print(f"jobs                 {len(jobs)}")
+    print(f"status               {manager.get_job_stats().to_dict('records')}")
+    print(f"create               {created - start:.2f}s")
+    print(f"submit and retrieve  {finished - created:.2f}s")
+    print(f"simulated run time   {run_time:.2f}s on {manager.max_processors} processors, ideal {ideal:.2f}s")
+    print(f"overhead             {finished - created - ideal:.2f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
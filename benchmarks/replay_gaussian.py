@@ -0,0 +1,45 @@
+"""Stand-in for the Gaussian executable that replays recorded log files, for running the job pipeline without Gaussian.
+
+The log file of an input is copied from the directory of recorded logs (same base name) or from a template log. Without
+a recorded log a synthetic log that terminates normally once per Gaussian task of the input is written, which is
+enough for the jobs to be retrieved as done. Use it as the command of the local manager::
+
+    python benchmarks/replay_gaussian.py --logs recorded_logs/ --delay 2 input.gjf
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="Gaussian input file")
+    parser.add_argument("--logs", help="directory of recorded log files named after the inputs")
+    parser.add_argument("--template", help="log file replayed for inputs without a recorded log")
+    parser.add_argument("--delay", type=float, default=0., help="simulated run time in seconds")
+    args = parser.parse_args()
+
+    base_name = os.path.splitext(os.path.basename(args.input))[0]
+    log_file = f"{base_name}.log"
+    time.sleep(args.delay)
+
+    recorded = os.path.join(args.logs, log_file) if args.logs else None
+    if recorded is not None and os.path.exists(recorded):
+        shutil.copy(recorded, log_file)
+    elif args.template is not None:
+        shutil.copy(args.template, log_file)
+    else:
+        with open(args.input) as f:
+            n_tasks = f.read().count("--Link1--") + 1
+        with open(log_file, "w") as f:
+            f.write(f" Replayed log of {args.input}\n")
+            f.write(" Normal termination of Gaussian\n" * n_tasks)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
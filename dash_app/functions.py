@@ -8,7 +8,7 @@ def image(can):
     hash_str = hashlib.md5(can.encode()).hexdigest()
 
     if not os.path.exists(f"{app_path}/static/{hash_str}.svg"):
-        mol = input_to_OBMol(can, input_type="string", input_format="can")
+        mol = OBMol_from_can(can)
         OBMol_to_file(mol, "svg", f"{app_path}/static/{hash_str}.svg")
     return f"/static/{hash_str}.svg"
 